@@ -1,19 +1,20 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, g
 from flask_cors import CORS
+import json
 import os
 import sys
 
 # Add current directory to Python path to import our ML modules
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from naive_bayes_solution import naive_bayes_model, ve
+from naive_bayes_solution import infer, batch_posterior
 from bnetbase import Variable
+from posterior_cache import cache_key
+from model_service import CORS_RESOURCES, ModelService, install
 
 app = Flask(__name__)
-CORS(app)  # Enable CORS for all routes
+CORS(app, resources=CORS_RESOURCES)  # Enable CORS for all routes but the model update
 
-# Global variables to store the trained model
-trained_model = None
 variable_domains = {
     "Age": ['Under 18', '18-24', '25-34', '35-44', '45-54', '55-64', '65+'],
     "Education": ['High School or Less', 'Some College', 'Associate', 'Professional/PhD', 'Other'],
@@ -26,14 +27,24 @@ variable_domains = {
     "Salary": ['<50K', '50K-75K', '75K-100K', '100K-150K', '150K+']
 }
 
-def load_model():
-    """Load the trained Naive Bayes model"""
-    global trained_model
-    if trained_model is None:
-        print("Loading Stack Overflow developer survey model...")
-        trained_model = naive_bayes_model('data/stackoverflow-train.csv', variable_domains)
-        print("Model loaded successfully!")
-    return trained_model
+# Fields every profile must provide
+required_fields = ['Age', 'Education', 'Employment', 'RemoteWork',
+                   'Experience', 'DevType', 'CompanySize', 'Country']
+
+# Salary ranges formatted for display
+salary_display = {
+    '<50K': 'Less than $50,000',
+    '50K-75K': '$50,000 - $75,000', 
+    '75K-100K': '$75,000 - $100,000',
+    '100K-150K': '$100,000 - $150,000',
+    '150K+': '$150,000 or more'
+}
+
+# The model with its cache and metrics; also times every request and
+# serves /metrics, /api/cache/stats and, if enabled, /api/model/update
+model_service = ModelService(variable_domains)
+install(app, model_service)
+load_model = model_service.load_model
 
 @app.route('/', methods=['GET'])
 def home():
@@ -50,107 +61,96 @@ def get_domains():
     features = {k: v for k, v in variable_domains.items() if k != 'Salary'}
     return jsonify(features)
 
+def validate_profile(profile):
+    """Return an error message for an invalid profile, or None if it is valid"""
+    if not isinstance(profile, dict):
+        return "Profile must be a JSON object"
+    missing_fields = [field for field in required_fields if field not in profile]
+    if missing_fields:
+        return f"Missing required fields: {missing_fields}"
+    for field, value in profile.items():
+        if field in variable_domains and value not in variable_domains[field]:
+            return f"Invalid value '{value}' for field '{field}'. Valid values: {variable_domains[field]}"
+    return None
+
 @app.route('/api/predict', methods=['POST'])
 def predict_salary():
     """Predict salary based on input features"""
     try:
         # Get input data from request
         data = request.get_json()
+        g.timer.lap("parse")
         
         if not data:
             return jsonify({"error": "No data provided"}), 400
         
-        # Validate required fields
-        required_fields = ['Age', 'Education', 'Employment', 'RemoteWork', 
-                          'Experience', 'DevType', 'CompanySize', 'Country']
-        
-        missing_fields = [field for field in required_fields if field not in data]
-        if missing_fields:
-            return jsonify({"error": f"Missing required fields: {missing_fields}"}), 400
-        
-        # Validate field values
-        for field, value in data.items():
-            if field in variable_domains and value not in variable_domains[field]:
-                return jsonify({"error": f"Invalid value '{value}' for field '{field}'. Valid values: {variable_domains[field]}"}), 400
+        # Validate required fields and field values
+        error = validate_profile(data)
+        if error:
+            return jsonify({"error": error}), 400
+        g.timer.lap("validate")
         
         # Load model if not loaded
-        model = load_model()
+        load_model()
+        g.timer.lap("model")
+        
+        # Repeated profiles are answered from the cache. The version is
+        # read before the model, so a result is never cached under a newer
+        # version than the model that computed it.
+        key = cache_key(model_service.model_version, data, variable_domains)
+        cached = model_service.prediction_cache.get(key)
+        g.timer.lap("cache")
+        if cached is not None:
+            response = jsonify({**cached, "input_data": data})
+            g.timer.lap("serialize")
+            return response
+        model, table = model_service.trained_model, model_service.posterior_table
+        training_stats = model_service.training_stats
         
         # Calculate similar developer counts for transparency
-        import pandas as pd
-        training_data = pd.read_csv('data/stackoverflow-train.csv')
+        total_training_size = training_stats.total
         
-        # Count developers with similar characteristics
-        similar_devs = training_data.copy()
-        total_training_size = len(training_data)
-        
-        # Filter by each input characteristic and count matches
-        match_counts = {}
-        for field, value in data.items():
-            if field in training_data.columns:
-                matches = len(training_data[training_data[field] == value])
-                match_counts[field] = matches
+        # Count developers sharing each input characteristic
+        match_counts = training_stats.feature_matches(data)
         
         # Count developers with exact same profile (all features match)
-        exact_matches = training_data
-        for field, value in data.items():
-            if field in training_data.columns:
-                exact_matches = exact_matches[exact_matches[field] == value]
-        exact_match_count = len(exact_matches)
+        exact_match_count = training_stats.exact_matches(data)
         
         # Count developers in each salary bracket for context
-        salary_distribution = training_data['Salary'].value_counts().to_dict()
+        salary_distribution = training_stats.distribution('Salary')
+        g.timer.lap("insights")
         
         # Create variable dictionary for the model
         variables = {var.name: var for var in model.variables()}
         
-        # Set evidence for all input variables
-        evidence_vars = []
-        for field, value in data.items():
-            if field in variables:
-                var = variables[field]
-                var.set_evidence(value)
-                evidence_vars.append(var)
-        
         # Query the salary variable
         salary_var = variables['Salary']
         
-        # Perform variable elimination to get probability distribution
-        result_factor = ve(model, salary_var, evidence_vars)
-        
-        # Extract probabilities
-        probabilities = {}
-        salary_values = salary_var.domain()
-        
-        for i, salary_value in enumerate(salary_values):
-            # Get probability for this salary value
-            salary_var.set_assignment_index(i)
-            prob = result_factor.get_value_at_current_assignments()
-            probabilities[salary_value] = prob
+        # Complete profiles are read from the precomputed posterior table
+        row = table.lookup(data) if table is not None else None
+        if row is not None:
+            probabilities = dict(zip(salary_var.domain(), row.tolist()))
+        else:
+            # Build the evidence from the input variables. It is passed to the
+            # model explicitly, so concurrent requests never share state.
+            evidence = {variables[field]: value for field, value in data.items() if field in variables}
+            
+            # Perform variable elimination to get probability distribution
+            result_factor = infer(model, salary_var, evidence)
+            
+            # Extract probabilities (the factor's scope is [salary_var])
+            probabilities = dict(zip(salary_var.domain(), result_factor.values.tolist()))
+        g.timer.lap("inference")
         
         # Determine prediction (highest probability)
         predicted_salary = max(probabilities.keys(), key=lambda k: probabilities[k])
         confidence = probabilities[predicted_salary]
         
-        # Format salary range for display
-        salary_display = {
-            '<50K': 'Less than $50,000',
-            '50K-75K': '$50,000 - $75,000', 
-            '75K-100K': '$75,000 - $100,000',
-            '100K-150K': '$100,000 - $150,000',
-            '150K+': '$150,000 or more'
-        }
-        
-        # Reset evidence for all variables
-        for var in evidence_vars:
-            var.evidence_index = None
-        
-        return jsonify({
+        result = {
             "prediction": predicted_salary,
             "prediction_display": salary_display.get(predicted_salary, predicted_salary),
             "confidence": confidence,
             "probabilities": probabilities,
-            "input_data": data,
             "data_insights": {
                 "total_training_samples": total_training_size,
                 "exact_profile_matches": exact_match_count,
@@ -158,15 +158,94 @@ def predict_salary():
                 "salary_distribution": salary_distribution,
                 "similar_developers_note": f"This prediction is based on analyzing patterns from {total_training_size:,} real developer profiles from Stack Overflow's 2023 survey."
             }
-        })
+        }
+        model_service.prediction_cache.put(key, result)
+        
+        response = jsonify({**result, "input_data": data})
+        g.timer.lap("serialize")
+        return response
         
     except Exception as e:
         print(f"Error in prediction: {str(e)}")
         return jsonify({"error": f"Prediction failed: {str(e)}"}), 500
 
+@app.route('/api/predict/batch', methods=['POST'])
+def predict_salary_batch():
+    """Predict salaries for many profiles in one request.
+
+    Accepts a JSON array of profiles (or {"profiles": [...]}), or an NDJSON
+    body with one profile per line (Content-Type: application/x-ndjson).
+    Results are returned in input order; invalid rows get an "error" entry
+    instead of a prediction. NDJSON requests get an NDJSON response.
+    """
+    try:
+        ndjson = request.mimetype == 'application/x-ndjson'
+        errors = []
+        if ndjson:
+            profiles = []
+            for line in request.get_data(as_text=True).splitlines():
+                if not line.strip():
+                    continue
+                try:
+                    profiles.append(json.loads(line))
+                    errors.append(None)
+                except ValueError as e:
+                    profiles.append(None)
+                    errors.append(f"Invalid JSON: {str(e)}")
+        else:
+            data = request.get_json(silent=True)
+            profiles = data.get('profiles') if isinstance(data, dict) else data
+            if not isinstance(profiles, list):
+                return jsonify({"error": "Expected a JSON array of profiles"}), 400
+            errors = [None] * len(profiles)
+
+        model = load_model()
+        variables = {var.name: var for var in model.variables()}
+        salary_var = variables['Salary']
+        feature_vars = [variables[field] for field in required_fields]
+        lookups = [{value: index for index, value in enumerate(var.domain())} for var in feature_vars]
+
+        # Validate and encode every profile in one pass
+        codes = []
+        valid_rows = []
+        for i, profile in enumerate(profiles):
+            if errors[i] is None:
+                errors[i] = validate_profile(profile)
+            if errors[i] is None:
+                codes.append([lookup[profile[field]] for field, lookup in zip(required_fields, lookups)])
+                valid_rows.append(i)
+
+        # Score all valid profiles with one vectorized posterior computation
+        salary_values = salary_var.domain()
+        results = [{"error": error} for error in errors]
+        if valid_rows:
+            posteriors = batch_posterior(model, salary_var, feature_vars, codes).tolist()
+            for i, row in zip(valid_rows, posteriors):
+                probabilities = dict(zip(salary_values, row))
+                predicted_salary = max(salary_values, key=lambda k: probabilities[k])
+                results[i] = {
+                    "prediction": predicted_salary,
+                    "prediction_display": salary_display.get(predicted_salary, predicted_salary),
+                    "confidence": probabilities[predicted_salary],
+                    "probabilities": probabilities
+                }
+
+        if ndjson:
+            body = "".join(json.dumps(result) + "\n" for result in results)
+            return Response(body, mimetype='application/x-ndjson')
+        return jsonify({
+            "results": results,
+            "count": len(results),
+            "error_count": len(results) - len(valid_rows)
+        })
+
+    except Exception as e:
+        print(f"Error in batch prediction: {str(e)}")
+        return jsonify({"error": f"Batch prediction failed: {str(e)}"}), 500
+
 if __name__ == '__main__':
     print("Starting Developer Salary Prediction API...")
     print("Loading Stack Overflow developer survey model on startup...")
     load_model()
     print("API ready!")
-    app.run(debug=True, host='0.0.0.0', port=5001)
\ No newline at end of file
+    app.run(debug=True, host='0.0.0.0', port=5001, threaded=True)
\ No newline at end of file
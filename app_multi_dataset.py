@@ -4,29 +4,36 @@ Enhanced Multi-Dataset Salary Prediction API
 Leverages Stack Overflow, Glassdoor, Remote Jobs, and LinkedIn data
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g
 from flask_cors import CORS
 import pandas as pd
 import numpy as np
 import os
 import sys
+import threading
 from collections import defaultdict
 
 # Add current directory to Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from naive_bayes_solution import naive_bayes_model, ve
+from naive_bayes_solution import infer
 from bnetbase import Variable
+from posterior_cache import cache_key
+from model_service import CORS_RESOURCES, ModelService, install
+from data_store import read_frame
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, resources=CORS_RESOURCES)
 
 # Global variables
-trained_model = None
 unified_data = None
 glassdoor_data = None
 remote_jobs_data = None
 linkedin_data = None
+# Set once the datasets have been read (or failed to); the lock keeps
+# concurrent first requests from reading them twice
+datasets_loaded = False
+datasets_lock = threading.Lock()
 
 # Original Stack Overflow variable domains
 variable_domains = {
@@ -41,35 +48,40 @@ variable_domains = {
     "Salary": ['<50K', '50K-75K', '75K-100K', '100K-150K', '150K+']
 }
 
+# The Stack Overflow model with its cache and metrics; also times every
+# request and serves /metrics, /api/cache/stats and, if enabled,
+# /api/model/update
+model_service = ModelService(variable_domains)
+install(app, model_service)
+load_model = model_service.load_model
+
 def load_all_datasets():
-    """Load all salary datasets"""
-    global unified_data, glassdoor_data, remote_jobs_data, linkedin_data
-    
-    print("📊 Loading multi-dataset salary information...")
+    """Load all salary datasets, once"""
+    global unified_data, glassdoor_data, remote_jobs_data, linkedin_data, datasets_loaded
     
-    try:
-        unified_data = pd.read_csv('data/unified_salary_dataset.csv')
-        glassdoor_data = pd.read_csv('data/glassdoor_salaries.csv')
-        remote_jobs_data = pd.read_csv('data/remote_jobs_salaries.csv') 
-        linkedin_data = pd.read_csv('data/linkedin_salaries.csv')
+    if datasets_loaded:
+        return
+    with datasets_lock:
+        if datasets_loaded:
+            return
         
-        print(f"✅ Loaded {len(unified_data):,} unified salary records")
-        print(f"   • Glassdoor: {len(glassdoor_data):,} company records")
-        print(f"   • Remote Jobs: {len(remote_jobs_data):,} remote records")
-        print(f"   • LinkedIn: {len(linkedin_data):,} professional records")
+        print("📊 Loading multi-dataset salary information...")
         
-    except Exception as e:
-        print(f"⚠️ Could not load additional datasets: {e}")
-        print("Falling back to Stack Overflow data only")
-
-def load_model():
-    """Load the trained Naive Bayes model"""
-    global trained_model
-    if trained_model is None:
-        print("🧠 Loading Stack Overflow developer survey model...")
-        trained_model = naive_bayes_model('data/stackoverflow-train.csv', variable_domains)
-        print("Model loaded successfully!")
-    return trained_model
+        try:
+            unified_data = read_frame('data/unified_salary_dataset.csv')
+            glassdoor_data = read_frame('data/glassdoor_salaries.csv')
+            remote_jobs_data = read_frame('data/remote_jobs_salaries.csv')
+            linkedin_data = read_frame('data/linkedin_salaries.csv')
+            
+            print(f"✅ Loaded {len(unified_data):,} unified salary records")
+            print(f"   • Glassdoor: {len(glassdoor_data):,} company records")
+            print(f"   • Remote Jobs: {len(remote_jobs_data):,} remote records")
+            print(f"   • LinkedIn: {len(linkedin_data):,} professional records")
+            
+        except Exception as e:
+            print(f"⚠️ Could not load additional datasets: {e}")
+            print("Falling back to Stack Overflow data only")
+        datasets_loaded = True
 
 def get_company_insights(profile):
     """Get company-specific salary insights from Glassdoor data"""
@@ -239,11 +251,9 @@ def get_data_sources():
 def predict_salary():
     """Enhanced salary prediction using multiple datasets"""
     try:
-        # Load all datasets if not already loaded
-        load_all_datasets()
-        
         # Get input data
         data = request.get_json()
+        g.timer.lap("parse")
         
         if not data:
             return jsonify({"error": "No data provided"}), 400
@@ -260,53 +270,57 @@ def predict_salary():
         for field, value in data.items():
             if field in variable_domains and value not in variable_domains[field]:
                 return jsonify({"error": f"Invalid value '{value}' for field '{field}'. Valid values: {variable_domains[field]}"}), 400
+        g.timer.lap("validate")
         
         # Load Stack Overflow model for base prediction
-        model = load_model()
+        load_model()
+        g.timer.lap("model")
         
-        # Original Stack Overflow prediction logic
-        import pandas as pd
-        training_data = pd.read_csv('data/stackoverflow-train.csv')
+        # Repeated profiles are answered from the cache. The version is
+        # read before the model, so a result is never cached under a newer
+        # version than the model that computed it.
+        key = cache_key(model_service.model_version, data, variable_domains)
+        cached = model_service.prediction_cache.get(key)
+        g.timer.lap("cache")
+        if cached is not None:
+            response = jsonify({**cached, "input_data": data})
+            g.timer.lap("serialize")
+            return response
+        model, table = model_service.trained_model, model_service.posterior_table
+        training_stats = model_service.training_stats
         
-        # Calculate similar developer counts
-        total_training_size = len(training_data)
-        match_counts = {}
-        for field, value in data.items():
-            if field in training_data.columns:
-                matches = len(training_data[training_data[field] == value])
-                match_counts[field] = matches
+        # Load all datasets if not already loaded
+        load_all_datasets()
+        g.timer.lap("datasets")
         
-        # Count exact matches
-        exact_matches = training_data
-        for field, value in data.items():
-            if field in training_data.columns:
-                exact_matches = exact_matches[exact_matches[field] == value]
-        exact_match_count = len(exact_matches)
+        # Original Stack Overflow prediction logic
+        total_training_size = training_stats.total
         
-        # Get salary distribution
-        salary_distribution = training_data['Salary'].value_counts().to_dict()
+        # Count developers sharing each input characteristic
+        match_counts = training_stats.feature_matches(data)
         
-        # Run ML model prediction
-        variables = {var.name: var for var in model.variables()}
+        # Count developers with exact same profile (all features match)
+        exact_match_count = training_stats.exact_matches(data)
         
-        evidence_vars = []
-        for field, value in data.items():
-            if field in variables:
-                var = variables[field]
-                var.set_evidence(value)
-                evidence_vars.append(var)
+        # Count developers in each salary bracket for context
+        salary_distribution = training_stats.distribution('Salary')
+        g.timer.lap("insights")
         
+        # Run ML model prediction with explicit evidence (no shared state),
+        # reading complete profiles from the precomputed posterior table
+        variables = {var.name: var for var in model.variables()}
         salary_var = variables['Salary']
-        result_factor = ve(model, salary_var, evidence_vars)
-        
-        # Extract probabilities
-        probabilities = {}
-        salary_values = salary_var.domain()
         
-        for i, salary_value in enumerate(salary_values):
-            salary_var.set_assignment_index(i)
-            prob = result_factor.get_value_at_current_assignments()
-            probabilities[salary_value] = prob
+        row = table.lookup(data) if table is not None else None
+        if row is not None:
+            probabilities = dict(zip(salary_var.domain(), row.tolist()))
+        else:
+            evidence = {variables[field]: value for field, value in data.items() if field in variables}
+            result_factor = infer(model, salary_var, evidence)
+            
+            # Extract probabilities (the factor's scope is [salary_var])
+            probabilities = dict(zip(salary_var.domain(), result_factor.values.tolist()))
+        g.timer.lap("inference")
         
         # Determine prediction
         predicted_salary = max(probabilities.keys(), key=lambda k: probabilities[k])
@@ -321,19 +335,15 @@ def predict_salary():
             '150K+': '$150,000 or more'
         }
         
-        # Reset evidence
-        for var in evidence_vars:
-            var.evidence_index = None
-        
         # Get multi-source insights
         multi_source_insights = get_multi_source_insights(data)
+        g.timer.lap("multi_source")
         
-        return jsonify({
+        result = {
             "prediction": predicted_salary,
             "prediction_display": salary_display.get(predicted_salary, predicted_salary),
             "confidence": confidence,
             "probabilities": probabilities,
-            "input_data": data,
             "data_insights": {
                 "total_training_samples": total_training_size,
                 "exact_profile_matches": exact_match_count,
@@ -342,7 +352,12 @@ def predict_salary():
                 "similar_developers_note": f"Base prediction from {total_training_size:,} Stack Overflow survey responses."
             },
             "multi_source_insights": multi_source_insights
-        })
+        }
+        model_service.prediction_cache.put(key, result)
+        
+        response = jsonify({**result, "input_data": data})
+        g.timer.lap("serialize")
+        return response
         
     except Exception as e:
         print(f"Error in prediction: {str(e)}")
@@ -356,4 +371,4 @@ if __name__ == '__main__':
     load_model()
     
     print("🎯 API ready with multi-source salary insights!")
-    app.run(debug=True, host='0.0.0.0', port=5001)
\ No newline at end of file
+    app.run(debug=True, host='0.0.0.0', port=5001, threaded=True)
\ No newline at end of file
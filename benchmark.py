@@ -0,0 +1,514 @@
+'''
+Benchmarks for the training and inference hot paths.
+
+    python benchmark.py                      # run every section
+    python benchmark.py ve api               # run some sections
+    python benchmark.py --json results.json  # also write the results as JSON
+    python benchmark.py --save-baseline      # store the results as the local baseline
+    python benchmark.py --baseline old.json  # fail on regressions against old.json
+
+Each section reports latency percentiles (p50/p90/p99, in milliseconds)
+and throughput for the operations it times:
+
+train       -- naive_bayes_model on the Adult and Stack Overflow training data
+ve          -- single ve calls for Salary with 0 to 8 evidence variables
+explore     -- explore_all end to end on the Adult model, serially and sharded
+               over a process pool
+api         -- POST /api/predict through the Flask test client, for distinct
+               profiles and for repeated (cached) profiles
+log_space   -- general variable elimination (feature queries on the Stack
+               Overflow model) with probability-space and log-space
+               factors, and a wide synthetic network whose evidence
+               probability underflows in probability space
+sparse      -- memory and query time of a synthetic chain over high
+               cardinality variables (180 countries, 2,000 skill tags)
+               with dense and with sparse CPTs, and the cost of get_value
+               on its largest sparse CPT
+lookups     -- cost of Variable.value_index and Factor.get_value against
+               the original list-scan and slicing implementations
+storage     -- size of the training data and the time to load it as
+               domain codes, from the CSV and from its Parquet twin
+               (python data_store.py; needs pyarrow)
+
+Timings depend on the machine, so baselines are not checked in. With
+--baseline, every latency (p50) and cost metric is compared with the
+given results, and the script exits with status 1 when one is slower
+than the baseline by more than --threshold. Without it, a local
+benchmark_baseline.json (see --save-baseline) is compared with for
+information only.
+'''
+
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import sys
+import time
+import numpy as np
+
+from bnetbase import Variable, Factor, SparseFactor, BN
+from naive_bayes_solution import naive_bayes_model, infer, ve, explore_all, encode_columns, read_code_chunks
+from data_store import columnar_path, read_headers
+
+# Training data used by the benchmarks
+TRAINING_DATA = 'data/stackoverflow-train.csv'
+ADULT_TRAINING_DATA = 'data/adult-train.csv'
+
+# Local results that new runs are compared with, for information only
+BASELINE_FILE = 'benchmark_baseline.json'
+
+# Default slowdown (new / baseline) reported as a regression
+REGRESSION_THRESHOLD = 1.25
+
+
+def stackoverflow_domains():
+    '''
+    Return the Stack Overflow variable domains, as served by app.py.
+    '''
+    from app import variable_domains
+    return variable_domains
+
+
+def time_calls(fn, args_list):
+    '''
+    Call fn once per argument tuple and return the calls per second.
+
+    :param fn: the function to time.
+    :param args_list: a list of argument tuples.
+    '''
+    start = time.perf_counter()
+    for args in args_list:
+        fn(*args)
+    return len(args_list) / (time.perf_counter() - start)
+
+
+def latency_stats(durations):
+    '''
+    Summarize call durations as latency percentiles and throughput.
+
+    :param durations: a list of call durations in seconds.
+    :return: a dict with the call count, mean/p50/p90/p99/max latency in
+             milliseconds and the calls per second.
+    '''
+    milliseconds = np.array(durations, dtype=np.float64) * 1000.0
+    p50, p90, p99 = np.percentile(milliseconds, [50, 90, 99])
+    return {
+        "count": len(durations),
+        "mean_ms": float(milliseconds.mean()),
+        "p50_ms": float(p50),
+        "p90_ms": float(p90),
+        "p99_ms": float(p99),
+        "max_ms": float(milliseconds.max()),
+        "throughput_per_s": float(len(durations) / (milliseconds.sum() / 1000.0)),
+    }
+
+
+def measure(fn, args_list, warmup=1):
+    '''
+    Time fn once per argument tuple and return latency_stats of the calls.
+
+    :param fn: the function to time.
+    :param args_list: a list of argument tuples.
+    :param warmup: number of untimed calls made first, with the first arguments.
+    '''
+    for _ in range(warmup):
+        fn(*args_list[0])
+    durations = []
+    for args in args_list:
+        start = time.perf_counter()
+        fn(*args)
+        durations.append(time.perf_counter() - start)
+    return latency_stats(durations)
+
+
+def bench_training(repeat=3):
+    '''
+    Time naive_bayes_model on the Adult and the Stack Overflow training data.
+    '''
+    domains = stackoverflow_domains()
+    return {
+        "adult": measure(lambda: naive_bayes_model(ADULT_TRAINING_DATA), [()] * repeat, warmup=0),
+        "stackoverflow": measure(lambda: naive_bayes_model(TRAINING_DATA, domains), [()] * repeat, warmup=0),
+    }
+
+
+def bench_ve(calls=300, seed=0):
+    '''
+    Time ve for Salary on the Stack Overflow model with 0 to 8 evidence
+    variables, using random evidence values.
+    '''
+    domains = stackoverflow_domains()
+    model = naive_bayes_model(TRAINING_DATA, domains)
+    variables = {var.name: var for var in model.variables()}
+    salary = variables['Salary']
+    features = [name for name in domains if name != 'Salary']
+    rng = random.Random(seed)
+
+    def query(evidence):
+        for var, value in evidence:
+            var.set_evidence(value)
+        return ve(model, salary, [var for var, _ in evidence])
+
+    results = {}
+    for count in range(len(features) + 1):
+        args_list = [([(variables[name], rng.choice(domains[name])) for name in rng.sample(features, count)],)
+                     for _ in range(calls)]
+        results["evidence_{}".format(count)] = measure(query, args_list)
+    return results
+
+
+def bench_explore(repeat=3):
+    '''
+    Time explore_all on the Adult model (the model is trained once, untimed),
+    serially and with one worker process per CPU.
+    '''
+    model = naive_bayes_model(ADULT_TRAINING_DATA)
+    workers = os.cpu_count() or 1
+    return {"explore_all": measure(lambda: explore_all(model), [()] * repeat),
+            "explore_all_parallel": measure(lambda: explore_all(model, workers=workers), [()] * repeat),
+            "workers": workers}
+
+
+def bench_api(requests=500, repeated=50, seed=0):
+    '''
+    Time POST /api/predict through the Flask test client: first for
+    distinct random profiles, then for a few profiles asked repeatedly,
+    which are answered from the prediction cache.
+    '''
+    import app as api
+    api.load_model()
+    api.model_service.prediction_cache.clear()
+    client = api.app.test_client()
+    rng = random.Random(seed)
+    features = {name: domain for name, domain in api.variable_domains.items() if name != 'Salary'}
+    profiles = [({name: rng.choice(domain) for name, domain in features.items()},) for _ in range(requests)]
+
+    def predict(profile):
+        response = client.post('/api/predict', json=profile)
+        if response.status_code != 200:
+            raise RuntimeError("/api/predict returned {}: {}".format(response.status_code, response.get_json()))
+
+    return {
+        "predict": measure(predict, profiles),
+        "predict_repeated": measure(predict, profiles[:repeated] * (requests // repeated)),
+    }
+
+
+def random_queries(bayes_net, domains, count, seed=0):
+    '''
+    Return count random (query variable, evidence) pairs whose query is a
+    feature, so they go through general elimination.
+
+    :param bayes_net: a BN whose variables are named as in domains.
+    :param domains: a dict mapping variable names to their domains.
+    :param count: the number of queries.
+    :param seed: seed for the random generator.
+    '''
+    rng = random.Random(seed)
+    variables = {var.name: var for var in bayes_net.variables()}
+    features = [name for name in domains if name != 'Salary']
+    queries = []
+    for _ in range(count):
+        query = rng.choice(features)
+        observed = rng.sample([name for name in domains if name != query], rng.randint(0, 4))
+        queries.append((variables[query], {variables[name]: rng.choice(domains[name]) for name in observed}))
+    return queries
+
+
+def wide_network(feature_count, domain_size=10, seed=0):
+    '''
+    Return a Naive Bayes shaped BN with feature_count features, each with
+    a random CPT over domain_size values, and one observation per feature.
+    Observing them all has probability around domain_size ** -feature_count,
+    which underflows float64 for a few hundred features.
+
+    :return: a (BN, class Variable, list of features, evidence dict) tuple.
+    '''
+    rng = np.random.default_rng(seed)
+    class_var = Variable("Class", ['a', 'b', 'c'])
+    prior = Factor("P(Class)", [class_var])
+    prior.values[:] = rng.dirichlet(np.ones(3))
+    features, factors = [], [prior]
+    for i in range(feature_count):
+        feature = Variable("F{}".format(i), list(range(domain_size)))
+        cpt = Factor("P(F{}|Class)".format(i), [feature, class_var])
+        cpt.set_table(rng.dirichlet(np.ones(domain_size), size=3).T)
+        features.append(feature)
+        factors.append(cpt)
+    evidence = {feature: int(rng.integers(domain_size)) for feature in features[1:]}
+    return BN("Wide", [class_var] + features, factors), class_var, features, evidence
+
+
+def bench_log_space(queries=2000):
+    '''
+    Time infer with probability-space and log-space factors on random
+    feature queries, and run underflow_check.
+    '''
+    domains = stackoverflow_domains()
+    model = naive_bayes_model(TRAINING_DATA, domains)
+    query_list = random_queries(model, domains, queries)
+    return {
+        "linear": measure(lambda var, ev: infer(model, var, ev), query_list),
+        "log": measure(lambda var, ev: infer(model, var, ev, log_space=True), query_list),
+        "underflow_check": underflow_check(),
+    }
+
+
+def underflow_check(feature_count=400):
+    '''
+    Query the first feature of a wide network given all the others and
+    return both answers. The probability-space answer underflows to the
+    uniform fallback; the log-space answer does not.
+    '''
+    bayes_net, _, features, evidence = wide_network(feature_count)
+    return {
+        "linear": infer(bayes_net, features[0], evidence).values.round(4).tolist(),
+        "log": infer(bayes_net, features[0], evidence, log_space=True).values.round(4).tolist(),
+    }
+
+
+def sparse_network(density=0.02, seed=0):
+    '''
+    Return a chain Salary -> Country -> Skill -> Tag over high-cardinality
+    domains, where each Country (and Skill) value has non-zero probability
+    for only a density fraction of the children's values, as a pair of
+    BNs with the same CPTs: one dense and one with SparseFactors.
+
+    :return: a (dense BN, sparse BN, Salary, Tag) tuple.
+    '''
+    rng = np.random.default_rng(seed)
+    salary = Variable("Salary", ['<50K', '50K-75K', '75K-100K', '100K-150K', '150K+'])
+    country = Variable("Country", ["C{}".format(i) for i in range(180)])
+    skill = Variable("Skill", ["S{}".format(i) for i in range(2000)])
+    tag = Variable("Tag", ["T{}".format(i) for i in range(2000)])
+
+    def cpt(child, parent):
+        table = rng.random((child.domain_size(), parent.domain_size()))
+        table *= rng.random(table.shape) < density
+        table[rng.integers(child.domain_size(), size=parent.domain_size()), np.arange(parent.domain_size())] += 1.0
+        factor = Factor("P({}|{})".format(child.name, parent.name), [child, parent])
+        factor.set_table(table / table.sum(axis=0))
+        return factor
+
+    prior = Factor("P(Salary)", [salary])
+    prior.values[:] = rng.dirichlet(np.ones(salary.domain_size()))
+    factors = [prior, cpt(country, salary), cpt(skill, country), cpt(tag, skill)]
+    variables = [salary, country, skill, tag]
+    sparse = [SparseFactor.from_dense(factor) if factor.values.size > 10000 else factor for factor in factors]
+    return BN("DenseChain", variables, factors), BN("SparseChain", variables, sparse), salary, tag
+
+
+def factor_bytes(bayes_net):
+    '''
+    Return the number of bytes used by the value storage of a BN's factors.
+    '''
+    return sum(f.coords.nbytes + f.data.nbytes if isinstance(f, SparseFactor) else f.values.nbytes
+               for f in bayes_net.factors())
+
+
+def bench_sparse(queries=50, lookups=20000):
+    '''
+    Return the factor memory and the latency of P(Salary | Tag) on
+    sparse_network, with dense and with sparse CPTs, and the nanoseconds
+    per get_value call on P(Tag|Skill) in both forms.
+    '''
+    dense_net, sparse_net, salary, tag = sparse_network()
+    rng = random.Random(0)
+    evidence = [(salary, {tag: rng.choice(tag.domain())}) for _ in range(queries)]
+    dense_cpt, sparse_cpt = dense_net.factors()[-1], sparse_net.factors()[-1]
+    rows = [[rng.choice(var.domain()) for var in dense_cpt.get_scope()] for _ in range(lookups)]
+    # Build the sparse coordinate index before timing
+    sparse_cpt.get_value(rows[0])
+    return {
+        "dense_bytes": factor_bytes(dense_net),
+        "sparse_bytes": factor_bytes(sparse_net),
+        "dense": measure(lambda var, ev: infer(dense_net, var, ev), evidence),
+        "sparse": measure(lambda var, ev: infer(sparse_net, var, ev), evidence),
+        "dense_get_value_ns": 1e9 / time_calls(lambda row: dense_cpt.get_value(row), [(row,) for row in rows]),
+        "sparse_get_value_ns": 1e9 / time_calls(lambda row: sparse_cpt.get_value(row), [(row,) for row in rows]),
+    }
+
+
+def legacy_value_index(var, value):
+    '''
+    The original Variable.value_index: a scan of the domain list.
+    '''
+    return var.dom.index(value)
+
+
+def legacy_get_value(factor, variable_values):
+    '''
+    The original Factor.get_value: slices variable_values at every step.
+    '''
+    index = 0
+    for v in factor.scope:
+        index = index * v.domain_size() + legacy_value_index(v, variable_values[0])
+        variable_values = variable_values[1:]
+    return factor.values[index]
+
+
+def bench_lookups(lookups=200000, seed=0):
+    '''
+    Return the nanoseconds per call of value_index and get_value, and of
+    their original implementations, on random values of a factor over
+    the Stack Overflow Country, DevType, Experience and Salary domains.
+    '''
+    domains = stackoverflow_domains()
+    scope = [Variable(name, domains[name]) for name in ['Country', 'DevType', 'Experience', 'Salary']]
+    factor = Factor("Lookup", scope)
+    rng = random.Random(seed)
+    rows = [[rng.choice(var.domain()) for var in scope] for _ in range(lookups)]
+    country = scope[0]
+    values = [row[0] for row in rows]
+
+    def per_call(fn, args_list):
+        return 1e9 / time_calls(fn, args_list)
+
+    return {
+        "value_index_ns": per_call(lambda value: country.value_index(value), [(value,) for value in values]),
+        "legacy_value_index_ns": per_call(lambda value: legacy_value_index(country, value), [(value,) for value in values]),
+        "get_value_ns": per_call(lambda row: factor.get_value(row), [(row,) for row in rows]),
+        "legacy_get_value_ns": per_call(lambda row: legacy_get_value(factor, row), [(row,) for row in rows]),
+    }
+
+
+def bench_storage(repeat=5):
+    '''
+    Return the size of the Adult and Stack Overflow training data and the
+    latency of loading it as domain codes, from the CSV and, when it
+    exists, from its Parquet twin.
+    '''
+    results = {}
+    for name, data_file, domains in [("adult", ADULT_TRAINING_DATA, None), ("stackoverflow", TRAINING_DATA, stackoverflow_domains())]:
+        if domains is None:
+            domains = {var.name: var.domain() for var in naive_bayes_model(data_file).variables()}
+        columns = [Variable(header, domains[header]) for header in read_headers(data_file)]
+
+        def load_csv():
+            with open(data_file, newline='') as csvfile:
+                reader = csv.reader(csvfile)
+                next(reader)
+                return encode_columns(columns, list(reader))
+
+        results[name + "_csv_bytes"] = os.path.getsize(data_file)
+        results[name + "_csv"] = measure(load_csv, [()] * repeat)
+        path = columnar_path(data_file, as_text=True)
+        if path is not None:
+            results[name + "_parquet_bytes"] = os.path.getsize(path)
+            results[name + "_parquet"] = measure(lambda: list(read_code_chunks(data_file, columns)), [()] * repeat)
+    return results
+
+
+# Benchmark sections by name, in the order they run
+SECTIONS = {
+    "train": bench_training,
+    "ve": bench_ve,
+    "explore": bench_explore,
+    "api": bench_api,
+    "log_space": bench_log_space,
+    "sparse": bench_sparse,
+    "lookups": bench_lookups,
+    "storage": bench_storage,
+}
+
+
+def comparable_metrics(results):
+    '''
+    Yield (section, metric, value) for every metric where lower is better:
+    the p50 latency of timed operations, and *_ns and *_bytes costs.
+    '''
+    for section, metrics in results.items():
+        for metric, value in metrics.items():
+            if isinstance(value, dict) and "p50_ms" in value:
+                yield section, metric, value["p50_ms"]
+            elif isinstance(value, (int, float)) and metric.endswith(("_ns", "_bytes")):
+                yield section, metric, value
+
+
+def compare_to_baseline(results, baseline, threshold=REGRESSION_THRESHOLD):
+    '''
+    Compare results with baseline results.
+
+    :param results: the "results" of a run, {section: {metric: value}}.
+    :param baseline: the "results" of the baseline run.
+    :param threshold: the new / baseline ratio above which a metric regressed.
+    :return: a list of (section, metric, baseline value, new value, ratio)
+             for every metric present in both, and the list of regressions.
+    '''
+    base = {(section, metric): value for section, metric, value in comparable_metrics(baseline)}
+    comparisons = []
+    for section, metric, value in comparable_metrics(results):
+        if (section, metric) in base and base[(section, metric)] > 0:
+            comparisons.append((section, metric, base[(section, metric)], value, value / base[(section, metric)]))
+    return comparisons, [row for row in comparisons if row[4] > threshold]
+
+
+def print_section(section, metrics):
+    '''
+    Print the metrics of one section as a table.
+    '''
+    print("{}:".format(section))
+    for metric, value in metrics.items():
+        if isinstance(value, dict) and "p50_ms" in value:
+            print("  {:<22} p50 {:>9.3f} ms  p90 {:>9.3f} ms  p99 {:>9.3f} ms  {:>10.1f}/s".format(
+                metric, value["p50_ms"], value["p90_ms"], value["p99_ms"], value["throughput_per_s"]))
+        elif isinstance(value, float):
+            print("  {:<22} {:>12.1f}".format(metric, value))
+        else:
+            print("  {:<22} {}".format(metric, value))
+
+
+def run(sections):
+    '''
+    Run the named sections and return the results document.
+    '''
+    results = {}
+    for section in sections:
+        results[section] = SECTIONS[section]()
+        print_section(section, results[section])
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "results": results,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark training and inference.")
+    parser.add_argument("sections", nargs="*", help="sections to run (default: all): {}".format(", ".join(SECTIONS)))
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="baseline results to compare with; exit with status 1 on a regression")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="store the results as the baseline (default file: {})".format(BASELINE_FILE))
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="new / baseline ratio reported as a regression")
+    args = parser.parse_args()
+    unknown = [section for section in args.sections if section not in SECTIONS]
+    if unknown:
+        parser.error("unknown sections {}; choose from {}".format(unknown, list(SECTIONS)))
+
+    document = run(args.sections or list(SECTIONS))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(document, f, indent=2)
+    baseline_file = args.baseline or BASELINE_FILE
+    if args.save_baseline:
+        with open(baseline_file, 'w') as f:
+            json.dump(document, f, indent=2)
+        print("Baseline written to {}".format(baseline_file))
+    elif args.baseline or os.path.exists(baseline_file):
+        with open(baseline_file) as f:
+            baseline = json.load(f)
+        comparisons, regressions = compare_to_baseline(document["results"], baseline["results"], args.threshold)
+        print("Compared with {} ({}, {}):".format(baseline_file, baseline.get("created"), baseline.get("machine")))
+        for section, metric, old, new, ratio in comparisons:
+            flag = "  REGRESSION" if ratio > args.threshold else ""
+            print("  {:<10} {:<22} {:>12.4g} -> {:<12.4g} x{:.2f}{}".format(section, metric, old, new, ratio, flag))
+        if regressions and args.baseline:
+            sys.exit(1)
+        if regressions:
+            print("Report only: pass --baseline {} to fail on regressions".format(baseline_file))
@@ -6,6 +6,8 @@
 #   
 # 
 
+import numpy as np
+
 class Variable:
     '''
     Class for defining a variable.
@@ -17,7 +19,11 @@ class Variable:
 
     When this variable is used in a Factor, it keeps track of 
     the index of the assigned value in its domain using assignment_index.
+
+    Variables use __slots__ and keep a value -> index dict next to the
+    domain list, so value_index is a dict lookup instead of a list scan.
     '''
+    __slots__ = ('name', 'dom', 'evidence_index', 'assignment_index', '_index')
 
     def __init__(self, name, domain=[]):
         '''
@@ -29,6 +35,12 @@ class Variable:
         self.name = name                
         self.dom = list(domain)         
 
+        # Index of each domain value. setdefault keeps the first position
+        # of a repeated value, as list.index did.
+        self._index = {}
+        for index, val in enumerate(self.dom):
+            self._index.setdefault(val, index)
+
         # If this variable is an evidence variable
         # This is the index of the observed value in its domain.
         self.evidence_index = 0         
@@ -44,6 +56,7 @@ class Variable:
         :param values: a list of values to be added to the domain
         '''
         for val in values: 
+            self._index.setdefault(val, len(self.dom))
             self.dom.append(val)
 
     def value_index(self, value):
@@ -51,8 +64,12 @@ class Variable:
         Return the index of the given value in the domain.
         :param value: the value to look up in the domain
         :return index of the given value in the domain
+        Raises ValueError if value is not in the domain.
         '''
-        return self.dom.index(value)
+        try:
+            return self._index[value]
+        except KeyError:
+            raise ValueError("{!r} is not in the domain of {}".format(value, self.name)) from None
 
     def domain_size(self):
         '''
@@ -116,6 +133,24 @@ class Variable:
         return("{}, Dom = {}".format(self.name, self.dom))
 
 
+def _value_axes(scope, strides):
+    '''
+    Return the (value -> domain index dict, stride) pair of each variable
+    of a scope, for Factor._index_of.
+    '''
+    return tuple((v._index, stride) for v, stride in zip(scope, strides))
+
+
+def _row_major_strides(shape):
+    '''
+    Return the step in a flat row-major array of each axis of shape.
+    '''
+    strides = [1] * len(shape)
+    for axis in range(len(shape) - 2, -1, -1):
+        strides[axis] = strides[axis + 1] * shape[axis + 1]
+    return tuple(strides)
+
+
 class Factor: 
     '''
     Class for defining a a factor.
@@ -140,7 +175,24 @@ class Factor:
     The disadvantage of the latter approach is that you may have to 
     save and restore the values of the variables. 
 
+    The values are stored in a contiguous float64 ndarray. self.values is
+    the flat (row-major) view used by the per-cell interface above, and
+    get_table returns the same memory shaped by the domain sizes of the
+    scope, with one axis per variable in scope order. Array code should
+    work on get_table/set_table instead of looping over assignments.
+    self.strides holds the step in self.values of each scope variable, and
+    the per-cell interface computes an index from a tuple of (value ->
+    domain index dict, stride) pairs cached at construction, with one
+    dict lookup per variable and no method calls.
+
+    self.version counts the changes made through the methods above, so
+    results derived from the values can tell when they are stale. Code
+    that writes to self.values or to get_table() directly must call
+    touch() afterwards.
+
     '''
+    __slots__ = ('name', 'scope', 'shape', 'strides', 'values', 'version', '_axes')
+
     def __init__(self, name, scope):
         '''
         Create a Factor object.
@@ -151,10 +203,18 @@ class Factor:
         self.name = name
         self.scope = list(scope)
 
-        size = 1
-        for v in scope:
-            size = size * v.domain_size()
-        self.values = [0] * size  #initialize values to be a list of zeros.
+        self.shape = tuple(v.domain_size() for v in self.scope)
+        self.strides = _row_major_strides(self.shape)
+        self._axes = _value_axes(self.scope, self.strides)
+        #initialize values to be a flat array of zeros.
+        self.values = np.zeros(int(np.prod(self.shape, dtype=np.int64)), dtype=np.float64)
+        self.version = 0
+
+    def touch(self):
+        '''
+        Record that the factor's values have changed.
+        '''
+        self.version += 1
 
     def get_scope(self):
         '''
@@ -173,6 +233,28 @@ class Factor:
                 return v
         return None        
 
+    def get_table(self):
+        '''
+        Return the factor's values as an ndarray with one axis per variable
+        in the scope (in scope order). The returned array is a view, so
+        writing to it modifies the factor.
+        :return an ndarray of shape (|dom(v1)|, |dom(v2)|, ...)
+        '''
+        return self.values.reshape(self.shape)
+
+    def set_table(self, table):
+        '''
+        Initialize the factor from an array shaped like get_table().
+        The values are copied, so later changes to table do not affect
+        this factor.
+        :param table: an array-like of shape (|dom(v1)|, |dom(v2)|, ...)
+        '''
+        table = np.asarray(table, dtype=np.float64)
+        if table.shape != self.shape:
+            raise ValueError("Table shape {} does not match factor {} with shape {}".format(table.shape, self.name, self.shape))
+        self.values[:] = table.ravel()
+        self.touch()
+
     def add_values(self, values):
         '''
         We can use this function to initialize the factor. 
@@ -203,11 +285,8 @@ class Factor:
         For example, the value of (A=1,B='b',C='light') is 0.80.
          '''
         for t in values:
-            index = 0
-            for v in self.scope:
-                index = index * v.domain_size() + v.value_index(t[0])
-                t = t[1:]
-            self.values[index] = t[0]
+            self.values[self._index_of(t[:-1])] = t[-1]
+        self.touch()
          
 
     def get_value(self, variable_values):
@@ -222,11 +301,45 @@ class Factor:
         equal to the value of this factor on the assignment (A=1,
         B='b', C='light')
         '''
+        return self.values[self._index_of(variable_values)]
+
+    def _index_of(self, variable_values):
+        '''
+        Return the position in self.values of an ordered list of values,
+        one for every variable in self.scope.
+        Raises ValueError if the number of values is wrong or a value is
+        not in the domain of its variable.
+        '''
+        if len(variable_values) != len(self._axes):
+            raise ValueError("Factor {} has {} variables, got {} values".format(
+                self.name, len(self._axes), len(variable_values)))
         index = 0
-        for v in self.scope:
-            index = index * v.domain_size() + v.value_index(variable_values[0])
-            variable_values = variable_values[1:]
-        return self.values[index]
+        try:
+            for (positions, stride), val in zip(self._axes, variable_values):
+                index += stride * positions[val]
+        except KeyError:
+            self._indexes_of(variable_values)
+        return index
+
+    def _indexes_of(self, variable_values):
+        '''
+        Return the domain index of each of an ordered list of values, one
+        for every variable in self.scope.
+        Raises ValueError like _index_of.
+        '''
+        if len(variable_values) != len(self.scope):
+            raise ValueError("Factor {} has {} variables, got {} values".format(
+                self.name, len(self.scope), len(variable_values)))
+        return [v.value_index(val) for v, val in zip(self.scope, variable_values)]
+
+    def _current_index(self):
+        '''
+        Return the position in self.values of the current assignment.
+        '''
+        index = 0
+        for v, stride in zip(self.scope, self.strides):
+            index += stride * v.assignment_index
+        return index
 
 
     def add_value_at_current_assignment(self, number): 
@@ -262,10 +375,8 @@ class Factor:
         See recursive_print_values called by print_table to see an example of 
         where the current_assignment interface to the factor values comes in handy.
         '''
-        index = 0
-        for v in self.scope:
-            index = index * v.domain_size() + v.get_assignment_index()
-        self.values[index] = number
+        self.values[self._current_index()] = number
+        self.touch()
 
 
     def get_value_at_current_assignments(self):
@@ -282,11 +393,7 @@ class Factor:
         function would return the value of the factor on the
         assigments (A=1, B='1', C='heavy')
         '''
-        
-        index = 0
-        for v in self.scope:
-            index = index * v.domain_size() + v.get_assignment_index()
-        return self.values[index]
+        return self.values[self._current_index()]
 
     def print_table(self):
         '''
@@ -321,6 +428,238 @@ class Factor:
         return("{}".format(self.name))
 
 
+class SparseFactor(Factor):
+    '''
+    A factor that stores only the assignments whose value differs from a
+    default value (usually 0), in coordinate (COO) form:
+
+        coords  -- an N x len(scope) integer array; row i holds the domain
+                   indexes of the i-th stored assignment, in scope order.
+                   Rows are unique and sorted.
+        data    -- a length-N float64 array with the value of each row.
+        default -- the value of every assignment that is not stored.
+
+    Memory is proportional to the number of stored assignments instead of
+    the product of the domain sizes, which suits CPTs over large domains
+    where most combinations are never seen.
+
+    The per-cell interface of Factor (add_values, get_value, print_table,
+    ...) works unchanged. The first per-cell call after the entries change
+    builds a dict from coordinates to rows, so later reads, and writes to
+    assignments that are already stored, take constant time; storing new
+    assignments rebuilds the arrays, so add them in one add_values or
+    set_entries call rather than cell by cell. get_table and values build
+    a dense copy, so use them only on factors that are small enough to
+    materialize; writing to that copy does not change the factor. The
+    operations in factor_algebra accept SparseFactors and mix them with
+    dense factors.
+    '''
+    __slots__ = ('default', 'coords', 'data', '_positions')
+
+    def __init__(self, name, scope, default=0.0):
+        '''
+        Create a SparseFactor with every value equal to default.
+
+        :param name: the name of the factor as a string.
+        :param scope: an ordered list of Variables in the factor.
+        :param default: the value of assignments that are not stored.
+        '''
+        self.name = name
+        self.scope = list(scope)
+        self.shape = tuple(v.domain_size() for v in self.scope)
+        self.strides = _row_major_strides(self.shape)
+        self._axes = _value_axes(self.scope, self.strides)
+        self.default = float(default)
+        self.coords = np.zeros((0, len(self.scope)), dtype=np.intp)
+        self.data = np.zeros(0, dtype=np.float64)
+        self._positions = None
+        self.version = 0
+
+    def __getstate__(self):
+        # values is a property here, so the default pickling of the
+        # Factor slots would fail to restore it
+        return {'name': self.name, 'scope': self.scope, 'default': self.default,
+                'coords': self.coords, 'data': self.data, 'version': self.version}
+
+    def __setstate__(self, state):
+        self.name = state['name']
+        self.scope = state['scope']
+        self.shape = tuple(v.domain_size() for v in self.scope)
+        self.strides = _row_major_strides(self.shape)
+        self._axes = _value_axes(self.scope, self.strides)
+        self.default = state['default']
+        self.coords = state['coords']
+        self.data = state['data']
+        self._positions = None
+        self.version = state['version']
+
+    @classmethod
+    def from_dense(cls, factor, default=0.0):
+        '''
+        Return a SparseFactor with the same name, scope and values as a
+        dense factor, storing the entries that differ from default.
+        '''
+        new_factor = cls(factor.name, factor.get_scope(), default)
+        new_factor.set_table(factor.get_table())
+        return new_factor
+
+    def to_dense(self):
+        '''
+        Return a dense Factor with the same name, scope and values.
+        '''
+        factor = Factor(self.name, self.scope)
+        factor.set_table(self.get_table())
+        return factor
+
+    def nnz(self):
+        '''
+        Return the number of stored assignments.
+        '''
+        return len(self.data)
+
+    def set_entries(self, coords, data, unique_sorted=False):
+        '''
+        Replace the stored assignments. Repeated rows keep their last value
+        and rows whose value equals the default are dropped.
+
+        :param coords: an N x len(scope) array of domain indexes.
+        :param data: a length-N array of values.
+        :param unique_sorted: if True, the caller guarantees that the rows
+                              of coords are in range, unique and sorted, and
+                              they are stored without checking.
+        '''
+        data = np.asarray(data, dtype=np.float64).reshape(-1)
+        coords = np.asarray(coords, dtype=np.intp).reshape(len(data), len(self.scope))
+        if unique_sorted:
+            keep = data != self.default
+            self.coords, self.data = coords[keep], data[keep]
+            self.touch()
+            return
+        if len(coords) and ((coords < 0).any() or (coords >= np.array(self.shape, dtype=np.intp)).any()):
+            raise ValueError("Coordinates out of range for factor {} with shape {}".format(self.name, self.shape))
+        # Keep the last value given for each row. Rows are compared by
+        # their flat index when the full table could be indexed by int64.
+        coords, data = coords[::-1], data[::-1]
+        if np.prod(np.array(self.shape, dtype=np.float64)) < 2 ** 62:
+            _, first = np.unique(self._flat_index(coords), return_index=True)
+            coords = coords[first]
+        else:
+            coords, first = np.unique(coords, axis=0, return_index=True)
+        data = data[first]
+        keep = data != self.default
+        self.coords, self.data = coords[keep], data[keep]
+        self.touch()
+
+    def get_table(self):
+        '''
+        Return a dense copy of the factor's values, shaped like
+        Factor.get_table(). Changes to the copy do not affect the factor.
+        '''
+        table = np.full(int(np.prod(self.shape, dtype=np.int64)), self.default, dtype=np.float64)
+        table[self.flat_index()] = self.data
+        return table.reshape(self.shape)
+
+    def set_table(self, table):
+        '''
+        Initialize the factor from a dense array shaped like get_table(),
+        storing the entries that differ from the default.
+        '''
+        table = np.asarray(table, dtype=np.float64)
+        if table.shape != self.shape:
+            raise ValueError("Table shape {} does not match factor {} with shape {}".format(table.shape, self.name, self.shape))
+        flat = np.flatnonzero(table.ravel() != self.default)
+        self.data = table.ravel()[flat]
+        self.coords = np.zeros((len(flat), len(self.scope)), dtype=np.intp)
+        for axis, size in reversed(list(enumerate(self.shape))):
+            flat, self.coords[:, axis] = np.divmod(flat, size)
+        self.touch()
+
+    def touch(self):
+        '''
+        Record that the factor's entries have changed.
+        '''
+        self._positions = None
+        self.version += 1
+
+    def flat_index(self):
+        '''
+        Return the row-major index into get_table().ravel() of every
+        stored assignment, as a length-N integer array.
+        '''
+        return self._flat_index(self.coords)
+
+    def _flat_index(self, coords):
+        index = np.zeros(len(coords), dtype=np.int64)
+        for axis, size in enumerate(self.shape):
+            index = index * size + coords[:, axis]
+        return index
+
+    @property
+    def values(self):
+        '''
+        A dense, flat copy of the factor's values (see get_table).
+        '''
+        return self.get_table().ravel()
+
+    def _position_index(self):
+        '''
+        Return a dict mapping the domain indexes of each stored assignment,
+        as a tuple, to its row in coords and data.
+        '''
+        if self._positions is None:
+            self._positions = {tuple(row): i for i, row in enumerate(self.coords.tolist())}
+        return self._positions
+
+    def _lookup(self, indexes):
+        '''
+        Return the value stored for one assignment, given as domain indexes.
+        '''
+        position = self._position_index().get(tuple(indexes))
+        return self.default if position is None else self.data[position]
+
+    def _store(self, rows):
+        '''
+        Set the values of several assignments, given as (indexes, value) pairs.
+        '''
+        rows = [(tuple(indexes), value) for indexes, value in rows]
+        positions = self._position_index()
+        # Overwrite stored assignments in place, unless one is new or
+        # becomes the default and the arrays must be rebuilt
+        if all(indexes in positions and value != self.default for indexes, value in rows):
+            for indexes, value in rows:
+                self.data[positions[indexes]] = value
+            self.version += 1
+            return
+        coords = [indexes for indexes, _ in rows]
+        data = [value for _, value in rows]
+        self.set_entries(np.vstack([self.coords, np.array(coords, dtype=np.intp).reshape(len(rows), len(self.scope))]),
+                         np.concatenate([self.data, np.array(data, dtype=np.float64)]))
+
+    def add_values(self, values):
+        '''
+        Initialize the factor from a list of lists of values; see Factor.add_values.
+        '''
+        self._store((self._indexes_of(t[:-1]), t[-1]) for t in values)
+
+    def get_value(self, variable_values):
+        '''
+        Retrieve the value for an ordered list of values; see Factor.get_value.
+        '''
+        return self._lookup(self._indexes_of(variable_values))
+
+    def add_value_at_current_assignment(self, number):
+        '''
+        Set the value at the current assignment; see Factor.add_value_at_current_assignment.
+        '''
+        self._store([([v.get_assignment_index() for v in self.scope], number)])
+
+    def get_value_at_current_assignments(self):
+        '''
+        Retrieve the value at the current assignment; see Factor.get_value_at_current_assignments.
+        '''
+        return self._lookup([v.get_assignment_index() for v in self.scope])
+
+
 
 class BN:
     '''Class for defining a Bayes Net.
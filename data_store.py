@@ -0,0 +1,267 @@
+'''
+Columnar Parquet copies of the CSV datasets.
+
+Any CSV file under data/ can have a Parquet twin next to it
+(data/x.csv -> data/x.parquet) whose text columns are dictionary-encoded:
+each column holds its distinct values once, plus one small integer code
+per row. The twin records the size and SHA-256 fingerprint of the CSV it
+was written from, and readers use it instead of the CSV only while the
+CSV still matches, so categorical columns load as integer codes without
+any text parsing. Otherwise, or when pyarrow is not installed, they read
+the CSV as before.
+
+pyarrow is optional. When it is available, preprocess_stackoverflow.py
+and integrate_datasets.py write the Parquet twins next to the CSVs they
+produce. Convert the existing CSVs with
+
+    python data_store.py
+'''
+
+import csv
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pc = pq = None
+
+# The CSV datasets the project reads
+DATASETS = [
+    'data/adult-train.csv',
+    'data/adult-test.csv',
+    'data/stackoverflow-train.csv',
+    'data/stackoverflow-test.csv',
+    'data/glassdoor_salaries.csv',
+    'data/remote_jobs_salaries.csv',
+    'data/linkedin_salaries.csv',
+    'data/unified_salary_dataset.csv',
+]
+
+# Keys of the Parquet schema metadata that tie a twin to its CSV
+CSV_SIZE_KEY = b'csv_size'
+CSV_FINGERPRINT_KEY = b'csv_sha256'
+
+# Fingerprints already computed, by (path, size, mtime)
+_fingerprints = {}
+
+
+def file_fingerprint(path):
+    '''
+    Return the SHA-256 hex digest of a file. It is computed once for each
+    size and modification time of the file.
+
+    :param path: path to the file.
+    '''
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if key not in _fingerprints:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        _fingerprints[key] = digest.hexdigest()
+    return _fingerprints[key]
+
+
+def parquet_path(csv_path):
+    '''
+    Return the path of the Parquet twin of a CSV file.
+    '''
+    return os.path.splitext(csv_path)[0] + '.parquet'
+
+
+def _is_text(data_type):
+    if pa.types.is_dictionary(data_type):
+        data_type = data_type.value_type
+    return pa.types.is_string(data_type) or pa.types.is_large_string(data_type)
+
+
+def columnar_path(csv_path, as_text=False):
+    '''
+    Return the Parquet twin of csv_path if it can be read in place of the
+    CSV, or None: pyarrow must be installed, the twin must exist, and if
+    the CSV exists, the twin must have been written from its current
+    contents (the size and fingerprint it records must match).
+
+    :param csv_path: path to a CSV file (which need not exist).
+    :param as_text: if true, the twin must also store every column as
+                    text, so its values read back exactly as the CSV
+                    spells them (a float column would print 4.0 as 4).
+    '''
+    if pq is None:
+        return None
+    path = parquet_path(csv_path)
+    if not os.path.exists(path):
+        return None
+    schema = pq.read_schema(path)
+    if os.path.exists(csv_path):
+        metadata = schema.metadata or {}
+        if metadata.get(CSV_SIZE_KEY) != str(os.path.getsize(csv_path)).encode():
+            return None
+        if metadata.get(CSV_FINGERPRINT_KEY) != file_fingerprint(csv_path).encode():
+            return None
+    if as_text and not all(_is_text(field.type) for field in schema):
+        return None
+    return path
+
+
+def write_parquet(frame, csv_path):
+    '''
+    Write frame as the Parquet twin of csv_path, with its text columns
+    dictionary-encoded. The file is replaced atomically. The twin records
+    the size and fingerprint of the CSV as it is now (see columnar_path),
+    so write the CSV first.
+
+    :param frame: a DataFrame with the same contents and column types as
+                  read_frame gives for the CSV (else use convert_csv).
+    :param csv_path: path to the CSV file the twin belongs to.
+    :return: the path written, or None if pyarrow is not installed.
+    '''
+    if pq is None:
+        return None
+    text_columns = [column for column in frame.columns
+                    if frame[column].dtype == object or pd.api.types.is_string_dtype(frame[column].dtype)]
+    frame = frame.astype({column: 'category' for column in text_columns})
+    path = parquet_path(csv_path)
+    tmp_path = path + ".tmp"
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    if os.path.exists(csv_path):
+        table = table.replace_schema_metadata({
+            **(table.schema.metadata or {}),
+            CSV_SIZE_KEY: str(os.path.getsize(csv_path)).encode(),
+            CSV_FINGERPRINT_KEY: file_fingerprint(csv_path).encode(),
+        })
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _read_csv(csv_path):
+    '''
+    Read a CSV file with its text cells kept verbatim: "NA", "None" and
+    empty cells of text columns are strings, not missing values. Columns
+    with numbers in every other cell are read as pd.read_csv reads them,
+    with such cells as NaN.
+    '''
+    frame = pd.read_csv(csv_path, keep_default_na=False)
+    text_columns = [column for column in frame.columns
+                    if frame[column].dtype == object or pd.api.types.is_string_dtype(frame[column].dtype)]
+    if text_columns:
+        parsed = pd.read_csv(csv_path, usecols=text_columns)
+        for column in text_columns:
+            if pd.api.types.is_numeric_dtype(parsed[column].dtype) and parsed[column].notna().any():
+                frame[column] = parsed[column]
+    return frame
+
+
+def convert_csv(csv_path):
+    '''
+    Write the Parquet twin of an existing CSV file. Text cells are stored
+    verbatim (see read_frame), so the twin reads back as the CSV text.
+
+    :return: the path written, or None if pyarrow is not installed.
+    '''
+    return write_parquet(_read_csv(csv_path), csv_path)
+
+
+def read_headers(csv_path):
+    '''
+    Return the column names of a CSV file (or of its Parquet twin).
+    '''
+    path = columnar_path(csv_path)
+    if path is not None:
+        return pq.read_schema(path).names
+    with open(csv_path, newline='') as csvfile:
+        return next(csv.reader(csvfile), [])
+
+
+def read_frame(csv_path):
+    '''
+    Return a CSV file (or its Parquet twin) as a DataFrame, with the same
+    column types pd.read_csv gives. Unlike pd.read_csv, "NA", "None" and
+    empty cells of text columns are read as strings, so the CSV and the
+    twin give the same frame.
+    '''
+    path = columnar_path(csv_path)
+    if path is None:
+        return _read_csv(csv_path)
+    frame = pq.read_table(path).to_pandas()
+    categorical = frame.select_dtypes(include='category').columns
+    return frame.astype({column: frame[column].cat.categories.dtype for column in categorical})
+
+
+def read_rows(csv_path):
+    '''
+    Return the header and the rows of a CSV file (or of its Parquet twin,
+    if it stores only text) as lists of strings, like csv.reader.
+
+    :return: a (headers, rows) tuple.
+    Raises ValueError if a column of the twin has missing values.
+    '''
+    path = columnar_path(csv_path, as_text=True)
+    if path is None:
+        with open(csv_path, newline='') as csvfile:
+            reader = csv.reader(csvfile)
+            headers = next(reader, [])
+            return headers, list(reader)
+    table = pq.read_table(path)
+    columns = []
+    for name, column in zip(table.column_names, table.columns):
+        if column.null_count:
+            raise ValueError("Column {} of {} has missing values".format(name, path))
+        column = column.combine_chunks()
+        if not pa.types.is_dictionary(column.type):
+            column = pc.dictionary_encode(column)
+        # Gather the row values from the dictionary instead of converting each cell
+        columns.append(np.array(column.dictionary.to_pylist(), dtype=object)[column.indices.to_numpy()].tolist())
+    return table.column_names, [list(row) for row in zip(*columns)]
+
+
+def iter_dictionary_batches(path, names, batch_size):
+    '''
+    Yield the given columns of a Parquet file in batches of at most
+    batch_size rows, each column dictionary-encoded.
+
+    :param path: a Parquet file that stores the columns as text (see
+                 columnar_path).
+    :param names: the columns to read.
+    :param batch_size: the number of rows per batch.
+    :return: an iterator of lists with one (values, codes) pair per column,
+             where values is the list of the column's distinct values as
+             strings and codes an integer ndarray indexing it, one per row.
+    Raises ValueError if a column has missing values.
+    '''
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size, columns=list(names)):
+        columns = []
+        for name, column in zip(names, batch.columns):
+            if column.null_count:
+                raise ValueError("Column {} of {} has missing values".format(name, path))
+            if not pa.types.is_dictionary(column.type):
+                column = pc.dictionary_encode(column)
+            values = column.dictionary.to_pylist()
+            columns.append((values, column.indices.to_numpy()))
+        yield columns
+
+
+if __name__ == '__main__':
+    # Write the Parquet twin of every CSV dataset
+    import time
+
+    if pq is None:
+        raise SystemExit("pyarrow is not installed (pip install pyarrow)")
+    for csv_path in filter(os.path.exists, DATASETS):
+        path = convert_csv(csv_path)
+        start = time.perf_counter()
+        pd.read_csv(csv_path)
+        csv_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        pq.read_table(path)
+        parquet_seconds = time.perf_counter() - start
+        print("{:<36} {:>9,} -> {:>9,} bytes   load {:7.2f} -> {:6.2f} ms".format(
+            csv_path, os.path.getsize(csv_path), os.path.getsize(path), csv_seconds * 1000, parquet_seconds * 1000))
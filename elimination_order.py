@@ -0,0 +1,198 @@
+'''
+Elimination orderings for variable elimination.
+
+The cost of variable elimination is dominated by its largest intermediate
+factor, and that size depends on the order the variables are summed out
+in. These heuristics pick the order greedily from the interaction graph
+of the factors (an edge joins two variables that share a factor):
+
+    given             -- the order the variables were passed in
+    min_degree        -- the variable with the fewest neighbours
+    min_fill          -- the variable whose elimination adds the fewest
+                         new edges between its neighbours
+    weighted_min_fill -- like min_fill, but each new edge costs the product
+                         of the domain sizes of the variables it joins
+
+Ties are broken by the order the variables were passed in, so orderings
+are deterministic. elimination_plan reports the chosen order for a query
+together with the size of the largest factor it will create and the
+number of factors pruned beforehand.
+'''
+
+import math
+
+from factor_pruning import prune_factors
+
+
+def interaction_graph(scopes, variables):
+    '''
+    Return the interaction graph of a set of factor scopes, restricted
+    to variables.
+
+    :param scopes: an iterable of factor scopes (lists of Variables).
+    :param variables: the Variables to keep in the graph.
+    :return: a dict mapping each Variable in variables to the set of
+             Variables it shares a scope with.
+    '''
+    keep = set(variables)
+    graph = {var: set() for var in variables}
+    for scope in scopes:
+        members = [var for var in scope if var in keep]
+        for var in members:
+            graph[var].update(members)
+    for var, neighbours in graph.items():
+        neighbours.discard(var)
+    return graph
+
+
+def _fill_edges(graph, var):
+    '''
+    Return the pairs of neighbours of var that are not yet adjacent.
+    '''
+    neighbours = list(graph[var])
+    return [(a, b) for i, a in enumerate(neighbours) for b in neighbours[i + 1:] if b not in graph[a]]
+
+
+def min_degree(graph, var):
+    '''
+    Score var by its number of neighbours.
+    '''
+    return len(graph[var])
+
+
+def min_fill(graph, var):
+    '''
+    Score var by the number of edges its elimination adds.
+    '''
+    return len(_fill_edges(graph, var))
+
+
+def weighted_min_fill(graph, var):
+    '''
+    Score var by the total weight of the edges its elimination adds,
+    where an edge weighs the product of its endpoints' domain sizes.
+    '''
+    return sum(a.domain_size() * b.domain_size() for a, b in _fill_edges(graph, var))
+
+
+# Heuristics by name, for the ordering argument of ve
+ORDERINGS = {
+    "given": None,
+    "min_degree": min_degree,
+    "min_fill": min_fill,
+    "weighted_min_fill": weighted_min_fill,
+}
+
+
+def _eliminate(graph, var):
+    '''
+    Remove var from graph, connecting its neighbours to each other.
+    Returns the scope of the factor created by eliminating var.
+    '''
+    neighbours = graph.pop(var)
+    for neighbour in neighbours:
+        graph[neighbour].discard(var)
+        graph[neighbour].update(neighbours - {neighbour})
+    return [var] + list(neighbours)
+
+
+def elimination_order(scopes, variables, ordering="min_fill"):
+    '''
+    Return the order to eliminate variables in.
+
+    :param scopes: the scopes of the factors being eliminated over.
+    :param variables: the Variables to eliminate.
+    :param ordering: a name from ORDERINGS, a scoring function
+                     heuristic(graph, var) (lowest score is eliminated
+                     first), or an explicit list of the Variables.
+    :return: a list holding every Variable of variables once.
+    '''
+    variables = list(variables)
+    if isinstance(ordering, (list, tuple)):
+        if sorted(map(id, ordering)) != sorted(map(id, variables)):
+            raise ValueError("An explicit elimination order must list each eliminated variable once")
+        return list(ordering)
+    if isinstance(ordering, str):
+        if ordering not in ORDERINGS:
+            raise ValueError("Unknown elimination ordering '{}'. Valid orderings: {}".format(ordering, list(ORDERINGS)))
+        ordering = ORDERINGS[ordering]
+    if ordering is None:
+        return variables
+
+    # The full graph is needed so fill edges through non-eliminated
+    # variables (the query) are counted too
+    graph = interaction_graph(scopes, {var for scope in scopes for var in scope} | set(variables))
+    remaining = list(variables)
+    order = []
+    while remaining:
+        best = min(remaining, key=lambda var: ordering(graph, var))
+        remaining.remove(best)
+        _eliminate(graph, best)
+        order.append(best)
+    return order
+
+
+def query_elimination_order(bayes_net, factors, var_query, evidence=(), ordering="min_fill"):
+    '''
+    Return the order ve eliminates variables in for a query, over the
+    factors left after pruning.
+
+    Only variables that appear in one of the factors, once the evidence
+    variables are restricted away, are eliminated. An explicit order may
+    still name variables that pruning removed; they are skipped.
+
+    :param bayes_net: a BN object.
+    :param factors: the factors of bayes_net that the query uses.
+    :param var_query: the query variable.
+    :param evidence: the evidence Variables (a list, or a mapping keyed
+                     by Variable).
+    :param ordering: see elimination_order.
+    :return: an (order, scopes) tuple, where scopes are the scopes of
+             factors without the evidence variables.
+    '''
+    scopes = [[var for var in factor.get_scope() if var not in evidence] for factor in factors]
+    in_scope = {var for scope in scopes for var in scope}
+    candidates = [var for var in bayes_net.variables() if var is not var_query and var not in evidence]
+    if isinstance(ordering, (list, tuple)):
+        pruned = {var for var in candidates if var not in in_scope}
+        ordering = [var for var in ordering if var not in pruned]
+    variables = [var for var in candidates if var in in_scope]
+    return elimination_order(scopes, variables, ordering), scopes
+
+
+def max_factor_size(scopes, order):
+    '''
+    Return the number of entries in the largest factor variable
+    elimination creates when it eliminates the variables in order.
+
+    :param scopes: the scopes of the factors being eliminated over.
+    :param order: the Variables to eliminate, in order.
+    '''
+    graph = interaction_graph(scopes, {var for scope in scopes for var in scope} | set(order))
+    largest = max([math.prod(var.domain_size() for var in scope) for scope in scopes], default=1)
+    for var in order:
+        largest = max(largest, math.prod(v.domain_size() for v in _eliminate(graph, var)))
+    return largest
+
+
+def elimination_plan(bayes_net, var_query, evidence=(), ordering="min_fill", prune=True):
+    '''
+    Return the elimination order ve would use for a query, the size of
+    the largest factor that order creates, and how many factors are
+    pruned before elimination.
+
+    :param bayes_net: a BN object.
+    :param var_query: the query variable.
+    :param evidence: the evidence Variables (a list, or a mapping keyed
+                     by Variable); they are restricted away before elimination.
+    :param ordering: see elimination_order.
+    :param prune: whether barren and irrelevant factors are pruned first
+                  (see factor_pruning).
+    :return: an (order, max_factor_size, pruned) tuple.
+    '''
+    factors, pruned = bayes_net.factors(), 0
+    if prune and var_query not in evidence:
+        factors, pruned = prune_factors(factors, var_query, evidence)
+    order, scopes = query_elimination_order(bayes_net, factors, var_query, evidence, ordering)
+    return order, max_factor_size(scopes, order), pruned
+
@@ -0,0 +1,234 @@
+'''
+Evaluate a Naive Bayes classifier on a labelled test CSV.
+
+The test file (or its Parquet twin, see data_store) is streamed in
+chunks of CHUNK_SIZE rows. Each chunk is encoded, scored with one
+batch_posterior call, and folded into running totals, so memory stays
+bounded however large the file is. One pass gives:
+
+    accuracy          -- the fraction of rows whose most probable class
+                         is the true one
+    precision/recall  -- per class, from the confusion matrix
+    confusion matrix  -- counts of (true class, predicted class) pairs
+    log-loss          -- the mean of -log P(true class | evidence), with
+                         probabilities clipped to LOG_LOSS_EPSILON
+    calibration bins  -- rows grouped by the probability of their
+                         predicted class, with the mean confidence and the
+                         accuracy of each bin, and the expected
+                         calibration error (their weighted gap)
+
+The class is the last column of the CSV unless another one is named.
+Evaluate the Adult and Stack Overflow models with
+
+    python evaluate.py
+
+or a saved model artifact on any test split with
+
+    python evaluate.py --model data/stackoverflow-model.npz data/stackoverflow-test.csv
+'''
+
+import argparse
+
+import numpy as np
+
+from data_store import read_headers
+from naive_bayes_solution import batch_posterior, read_code_chunks, CHUNK_SIZE
+
+# Number of equal-width confidence bins for calibration
+CALIBRATION_BINS = 10
+
+# Probabilities are clipped to [LOG_LOSS_EPSILON, 1] before taking logs,
+# so a confident mistake costs a finite amount
+LOG_LOSS_EPSILON = 1e-15
+
+
+class Evaluation:
+    '''
+    Running classification metrics over batches of predicted distributions.
+    '''
+
+    def __init__(self, classes, bins=CALIBRATION_BINS):
+        '''
+        :param classes: the class values, in the order of the columns of
+                        the probabilities passed to add.
+        :param bins: the number of calibration bins.
+        '''
+        self.classes = list(classes)
+        self.bins = bins
+        self.confusion = np.zeros((len(self.classes), len(self.classes)), dtype=np.int64)
+        self.log_loss_sum = 0.0
+        self.bin_counts = np.zeros(bins, dtype=np.int64)
+        self.bin_confidence = np.zeros(bins)
+        self.bin_correct = np.zeros(bins, dtype=np.int64)
+
+    def add(self, true_codes, probabilities):
+        '''
+        Add a batch of predictions.
+
+        :param true_codes: a length-N integer array of true class indexes.
+        :param probabilities: an N x len(classes) array of predicted
+                              distributions.
+        '''
+        size = len(self.classes)
+        true_codes = np.asarray(true_codes, dtype=np.intp)
+        predicted = probabilities.argmax(axis=1)
+        self.confusion += np.bincount(true_codes * size + predicted, minlength=size * size).reshape(size, size)
+
+        true_probability = probabilities[np.arange(len(true_codes)), true_codes]
+        self.log_loss_sum += float(-np.log(np.clip(true_probability, LOG_LOSS_EPSILON, 1.0)).sum())
+
+        confidence = probabilities[np.arange(len(true_codes)), predicted]
+        bins = np.minimum((confidence * self.bins).astype(np.intp), self.bins - 1)
+        self.bin_counts += np.bincount(bins, minlength=self.bins)
+        self.bin_confidence += np.bincount(bins, weights=confidence, minlength=self.bins)
+        self.bin_correct += np.bincount(bins, weights=predicted == true_codes, minlength=self.bins).astype(np.int64)
+
+    def count(self):
+        '''
+        Return the number of rows added.
+        '''
+        return int(self.confusion.sum())
+
+    def accuracy(self):
+        count = self.count()
+        return 0.0 if count == 0 else int(np.trace(self.confusion)) / count
+
+    def precision(self):
+        '''
+        Return a dict mapping each class to the fraction of the rows
+        predicted as that class that truly are (0 if it is never predicted).
+        '''
+        predicted = self.confusion.sum(axis=0)
+        return {value: 0.0 if predicted[i] == 0 else int(self.confusion[i, i]) / int(predicted[i])
+                for i, value in enumerate(self.classes)}
+
+    def recall(self):
+        '''
+        Return a dict mapping each class to the fraction of its rows that
+        are predicted as it (0 if it never occurs).
+        '''
+        actual = self.confusion.sum(axis=1)
+        return {value: 0.0 if actual[i] == 0 else int(self.confusion[i, i]) / int(actual[i])
+                for i, value in enumerate(self.classes)}
+
+    def log_loss(self):
+        count = self.count()
+        return 0.0 if count == 0 else self.log_loss_sum / count
+
+    def calibration(self):
+        '''
+        Return one dict per non-empty bin with its confidence range, the
+        number of rows, their mean confidence and their accuracy.
+        '''
+        return [{"low": i / self.bins, "high": (i + 1) / self.bins, "count": int(count),
+                 "confidence": self.bin_confidence[i] / count, "accuracy": int(self.bin_correct[i]) / int(count)}
+                for i, count in enumerate(self.bin_counts) if count > 0]
+
+    def expected_calibration_error(self):
+        '''
+        Return the mean gap between confidence and accuracy over the bins,
+        weighted by the number of rows in each.
+        '''
+        count = self.count()
+        return 0.0 if count == 0 else sum(row["count"] * abs(row["confidence"] - row["accuracy"])
+                                          for row in self.calibration()) / count
+
+    def report(self):
+        '''
+        Return every metric as a JSON-serializable dict.
+        '''
+        return {
+            "count": self.count(),
+            "accuracy": self.accuracy(),
+            "precision": self.precision(),
+            "recall": self.recall(),
+            "confusion_matrix": {"classes": self.classes, "counts": self.confusion.tolist()},
+            "log_loss": self.log_loss(),
+            "calibration": self.calibration(),
+            "expected_calibration_error": self.expected_calibration_error(),
+        }
+
+    def summary(self):
+        '''
+        Return the metrics formatted as a human-readable table.
+        '''
+        width = max(len(str(value)) for value in self.classes) + 2
+        lines = ["rows {:,}  accuracy {:.4f}  log-loss {:.4f}  ECE {:.4f}".format(
+                     self.count(), self.accuracy(), self.log_loss(), self.expected_calibration_error()),
+                 "",
+                 "{:<{w}}{:>10}{:>10}".format("class", "precision", "recall", w=width)]
+        precision, recall = self.precision(), self.recall()
+        lines += ["{:<{w}}{:>10.4f}{:>10.4f}".format(value, precision[value], recall[value], w=width)
+                  for value in self.classes]
+        lines += ["", "confusion matrix (rows: true, columns: predicted)",
+                  " " * width + "".join("{:>{w}}".format(value, w=width) for value in self.classes)]
+        lines += ["{:<{w}}".format(value, w=width) + "".join("{:>{w}}".format(count, w=width) for count in row)
+                  for value, row in zip(self.classes, self.confusion.tolist())]
+        lines += ["", "calibration  {:>10}{:>8}{:>12}{:>10}".format("bin", "rows", "confidence", "accuracy")]
+        lines += ["             {:>10}{:>8}{:>12.4f}{:>10.4f}".format(
+                      "{:.1f}-{:.1f}".format(row["low"], row["high"]), row["count"], row["confidence"], row["accuracy"])
+                  for row in self.calibration()]
+        return "\n".join(lines)
+
+
+def evaluate(bayes_net, test_file, class_name=None, chunk_size=CHUNK_SIZE, bins=CALIBRATION_BINS):
+    '''
+    Stream a labelled test CSV through batch_posterior and measure how well
+    bayes_net predicts its class column.
+
+    :param bayes_net: a BN object (see batch_posterior).
+    :param test_file: a CSV file with a header row naming the BN's variables.
+                      Columns that are not variables of the BN are ignored.
+                      Its Parquet twin is read instead when there is one.
+    :param class_name: the class column; the last column if not given.
+    :param chunk_size: the number of rows held in memory at once.
+    :param bins: the number of calibration bins.
+    :return: an Evaluation.
+    '''
+    variables = {var.name: var for var in bayes_net.variables()}
+    headers = read_headers(test_file)
+    class_name = headers[-1] if class_name is None else class_name
+    if class_name not in headers or class_name not in variables:
+        raise ValueError("Class column {} is not both a column of {} and a variable of the BN".format(class_name, test_file))
+
+    # Encode the evidence columns and the class (last) in one pass
+    columns = [variables[header] for header in headers if header in variables and header != class_name]
+    columns.append(variables[class_name])
+    evaluation = Evaluation(columns[-1].domain(), bins)
+    for codes in read_code_chunks(test_file, columns, chunk_size):
+        evaluation.add(codes[:, -1], batch_posterior(bayes_net, columns[-1], columns[:-1], codes[:, :-1]))
+    return evaluation
+
+
+if __name__ == '__main__':
+    import json
+    from model_store import load_model_artifact
+    from naive_bayes_solution import naive_bayes_model
+
+    parser = argparse.ArgumentParser(description="Evaluate a Naive Bayes model on a labelled test CSV.")
+    parser.add_argument("test_file", nargs="?", help="the test CSV (default: the Adult and Stack Overflow test splits)")
+    parser.add_argument("--model", help="a model artifact written by model_store.py")
+    parser.add_argument("--class", dest="class_name", help="the class column (default: the last column)")
+    parser.add_argument("--bins", type=int, default=CALIBRATION_BINS, help="the number of calibration bins")
+    parser.add_argument("--json", action="store_true", help="print the metrics as JSON")
+    args = parser.parse_args()
+    if (args.test_file is None) != (args.model is None):
+        parser.error("give both a test file and --model, or neither")
+
+    if args.model is not None:
+        runs = [(args.test_file, lambda: load_model_artifact(args.model)[0])]
+    else:
+        from app import variable_domains
+        runs = [('data/adult-test.csv', lambda: naive_bayes_model('data/adult-train.csv')),
+                ('data/stackoverflow-test.csv', lambda: naive_bayes_model('data/stackoverflow-train.csv', variable_domains))]
+
+    reports = {}
+    for test_file, load in runs:
+        evaluation = evaluate(load(), test_file, args.class_name, bins=args.bins)
+        reports[test_file] = evaluation.report()
+        if not args.json:
+            print("== {}".format(test_file))
+            print(evaluation.summary())
+            print()
+    if args.json:
+        print(json.dumps(reports, indent=2))
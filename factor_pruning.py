@@ -0,0 +1,88 @@
+'''
+Remove factors that cannot affect a query before variable elimination.
+
+Two kinds of factors are dropped:
+
+    barren factors     -- the CPT of a variable that is neither the query,
+                          nor evidence, nor an ancestor of either. Summing
+                          out such a variable turns its CPT into all ones.
+    irrelevant factors -- factors that, once the evidence variables are
+                          restricted away, share no variable with the
+                          query, directly or through other factors. They
+                          only scale the result by a constant, which
+                          normalization removes. Factors over evidence
+                          variables only are kept: they cost one lookup
+                          and still reveal evidence of probability zero.
+
+The network structure is read from the factors themselves: a factor is
+taken to be the CPT of the first variable of its scope given the rest,
+as in P(X|Salary) with scope [X, Salary].
+
+In a Naive Bayes model queried on the class variable, this leaves the
+prior and the CPTs of the observed features only, so a partial profile
+costs no more than the evidence it gives.
+'''
+
+
+def _ancestral_set(factors, variables):
+    '''
+    Return variables together with all their ancestors.
+    '''
+    parents = {}
+    for factor in factors:
+        scope = factor.get_scope()
+        if scope:
+            parents.setdefault(scope[0], set()).update(scope[1:])
+    ancestors = set(variables)
+    frontier = list(ancestors)
+    while frontier:
+        for parent in parents.get(frontier.pop(), ()):
+            if parent not in ancestors:
+                ancestors.add(parent)
+                frontier.append(parent)
+    return ancestors
+
+
+def _query_component(factors, var_query, evidence):
+    '''
+    Return the factors connected to var_query through shared variables
+    that are not evidence, and the factors over evidence variables only.
+    '''
+    reached = {var_query}
+    remaining = list(factors)
+    connected = []
+    grew = True
+    while grew:
+        grew = False
+        for factor in remaining[:]:
+            scope = [var for var in factor.get_scope() if var not in evidence]
+            if not scope or any(var in reached for var in scope):
+                reached.update(scope)
+                connected.append(factor)
+                remaining.remove(factor)
+                grew = True
+    # Keep the original factor order
+    kept = set(map(id, connected))
+    return [factor for factor in factors if id(factor) in kept]
+
+
+def prune_factors(factors, var_query, evidence):
+    '''
+    Return the factors needed to answer a query, and how many were pruned.
+
+    The distribution over var_query computed from the kept factors equals
+    the one computed from all of them whenever the evidence has non-zero
+    probability. (With impossible evidence the full computation falls back
+    to a uniform distribution; the pruned one does too unless the zero
+    comes from a pruned factor.)
+
+    :param factors: the factors of a BN, each the CPT of its first variable.
+    :param var_query: the query variable.
+    :param evidence: the evidence Variables (a list, or a mapping keyed by Variable).
+    :return: a (kept factors, number of pruned factors) tuple.
+    '''
+    factors = list(factors)
+    relevant = _ancestral_set(factors, [var_query] + list(evidence))
+    not_barren = [factor for factor in factors if not factor.get_scope() or factor.get_scope()[0] in relevant]
+    kept = _query_component(not_barren, var_query, evidence)
+    return kept, len(factors) - len(kept)
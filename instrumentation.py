@@ -0,0 +1,181 @@
+'''
+Per-stage latency instrumentation for the Flask apps.
+
+A StageTimer is started for every request. Handlers call lap(stage) at
+the end of each stage (parsing, validation, inference, ...) to record
+the time since the previous lap. When the response is sent:
+
+    - the stage durations and the total are added as a Server-Timing
+      header, which browser dev tools show next to the request, and
+    - they are added to Metrics, which keeps cumulative Prometheus
+      histograms per endpoint and stage, served as text by /metrics.
+
+A lap costs one perf_counter call and a list append, and recording a
+request takes one short lock, so the hot path stays unaffected.
+'''
+
+import bisect
+import threading
+import time
+
+# Upper bounds of the histogram buckets, in seconds
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+           0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class StageTimer:
+    '''
+    Records the duration of the consecutive stages of one request.
+    '''
+    __slots__ = ('start', 'last', 'stages')
+
+    def __init__(self):
+        self.start = self.last = time.perf_counter()
+        self.stages = []
+
+    def lap(self, stage):
+        '''
+        Record the time since the previous lap (or the start) as stage.
+        '''
+        now = time.perf_counter()
+        self.stages.append((stage, now - self.last))
+        self.last = now
+
+    def total(self):
+        '''
+        Return the seconds since the timer started.
+        '''
+        return time.perf_counter() - self.start
+
+    def server_timing(self, total=None):
+        '''
+        Return the stages as a Server-Timing header value (durations in ms).
+
+        :param total: the request duration to report as "total"; measured
+                      now if not given.
+        '''
+        total = self.total() if total is None else total
+        entries = ["{};dur={:.3f}".format(stage, seconds * 1000.0) for stage, seconds in self.stages]
+        entries.append("total;dur={:.3f}".format(total * 1000.0))
+        return ", ".join(entries)
+
+
+class Histogram:
+    '''
+    A cumulative latency histogram with fixed buckets.
+    '''
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+
+def _labels(**labels):
+    return ",".join('{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                    for name, value in labels.items())
+
+
+class Metrics:
+    '''
+    Request counts and latency histograms, rendered in the Prometheus
+    text exposition format.
+
+    :param prefix: the prefix of every metric name.
+    '''
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._requests = {}        # (endpoint, status) -> count
+        self._request_seconds = {} # endpoint -> Histogram
+        self._stage_seconds = {}   # (endpoint, stage) -> Histogram
+
+    def observe(self, endpoint, status, timer, total):
+        '''
+        Record one finished request.
+
+        :param endpoint: the Flask endpoint name.
+        :param status: the HTTP status code of the response.
+        :param timer: the request's StageTimer.
+        :param total: the request duration in seconds.
+        '''
+        with self._lock:
+            self._requests[(endpoint, status)] = self._requests.get((endpoint, status), 0) + 1
+            self._request_seconds.setdefault(endpoint, Histogram()).observe(total)
+            for stage, seconds in timer.stages:
+                self._stage_seconds.setdefault((endpoint, stage), Histogram()).observe(seconds)
+
+    def render(self):
+        '''
+        Return every metric in the Prometheus text exposition format.
+        '''
+        with self._lock:
+            requests = sorted(self._requests.items())
+            request_seconds = sorted((endpoint, self._copy(h)) for endpoint, h in self._request_seconds.items())
+            stage_seconds = sorted((key, self._copy(h)) for key, h in self._stage_seconds.items())
+
+        name = self.prefix + "_requests_total"
+        lines = ["# HELP {} Requests handled, by endpoint and status.".format(name),
+                 "# TYPE {} counter".format(name)]
+        lines += ["{}{{{}}} {}".format(name, _labels(endpoint=endpoint, status=status), count)
+                  for (endpoint, status), count in requests]
+
+        name = self.prefix + "_request_seconds"
+        lines += ["# HELP {} Request latency, by endpoint.".format(name),
+                  "# TYPE {} histogram".format(name)]
+        for endpoint, histogram in request_seconds:
+            lines += self._histogram_lines(name, histogram, endpoint=endpoint)
+
+        name = self.prefix + "_stage_seconds"
+        lines += ["# HELP {} Latency of each stage of a request, by endpoint and stage.".format(name),
+                  "# TYPE {} histogram".format(name)]
+        for (endpoint, stage), histogram in stage_seconds:
+            lines += self._histogram_lines(name, histogram, endpoint=endpoint, stage=stage)
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _copy(histogram):
+        copy = Histogram()
+        copy.counts, copy.sum, copy.count = list(histogram.counts), histogram.sum, histogram.count
+        return copy
+
+    @staticmethod
+    def _histogram_lines(name, histogram, **labels):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(BUCKETS + (float("inf"),), histogram.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append("{}_bucket{{{}}} {}".format(name, _labels(**labels, le=le), cumulative))
+        lines.append("{}_sum{{{}}} {!r}".format(name, _labels(**labels), histogram.sum))
+        lines.append("{}_count{{{}}} {}".format(name, _labels(**labels), histogram.count))
+        return lines
+
+
+def instrument(app, metrics):
+    '''
+    Time every request of a Flask app: start a StageTimer as flask.g.timer
+    before the request, and afterwards add the Server-Timing header and
+    record the request in metrics.
+    '''
+    from flask import g, request
+
+    @app.before_request
+    def start_timer():
+        g.timer = StageTimer()
+
+    @app.after_request
+    def record_timing(response):
+        timer = g.get('timer')
+        if timer is not None:
+            total = timer.total()
+            response.headers['Server-Timing'] = timer.server_timing(total)
+            metrics.observe(request.endpoint or 'unknown', response.status_code, timer, total)
+        return response
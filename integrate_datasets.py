@@ -9,6 +9,8 @@ import numpy as np
 import random
 from datetime import datetime, timedelta
 
+from data_store import convert_csv, read_frame
+
 # Set random seed for reproducibility
 np.random.seed(42)
 random.seed(42)
@@ -186,7 +188,7 @@ def integrate_datasets():
     linkedin_df = generate_linkedin_dataset()
     
     # Load existing Stack Overflow data
-    stackoverflow_df = pd.read_csv('data/stackoverflow-train.csv')
+    stackoverflow_df = read_frame('data/stackoverflow-train.csv')
     
     # Add data source column to Stack Overflow data
     stackoverflow_df['data_source'] = 'stackoverflow'
@@ -255,11 +257,13 @@ def integrate_datasets():
     
     unified_df = pd.DataFrame(unified_data)
     
-    # Save datasets
-    glassdoor_df.to_csv('data/glassdoor_salaries.csv', index=False)
-    remote_df.to_csv('data/remote_jobs_salaries.csv', index=False)
-    linkedin_df.to_csv('data/linkedin_salaries.csv', index=False)
-    unified_df.to_csv('data/unified_salary_dataset.csv', index=False)
+    # Save datasets, with Parquet twins when pyarrow is installed
+    for df, path in [(glassdoor_df, 'data/glassdoor_salaries.csv'),
+                     (remote_df, 'data/remote_jobs_salaries.csv'),
+                     (linkedin_df, 'data/linkedin_salaries.csv'),
+                     (unified_df, 'data/unified_salary_dataset.csv')]:
+        df.to_csv(path, index=False)
+        convert_csv(path)
     
     print(f"\n✅ Dataset Integration Complete!")
     print(f"📊 Total unified records: {len(unified_df):,}")
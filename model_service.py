@@ -0,0 +1,232 @@
+'''
+The trained model behind the Flask apps, and the routes that manage it.
+
+app.py and app_multi_dataset.py serve the same Stack Overflow model. A
+ModelService holds it together with everything derived from it:
+
+    trained_model    -- the NaiveBayesNet, loaded from the model artifact
+                        (python model_store.py) or trained on the data
+    training_stats   -- the TrainingStatistics of the training data, for
+                        the data-insights block of /api/predict
+    posterior_table  -- the posteriors of every complete profile
+                        (python posterior_table.py), or None
+    prediction_cache -- recent /api/predict results
+    model_version    -- bumped whenever the model is loaded or updated;
+                        it is part of every cache key, so results of an
+                        older model are never served
+    metrics          -- request counts and per-stage latency histograms
+
+Request handlers read model_version before the model, so a result is
+never cached under a newer version than the model that computed it.
+The first load and every update are serialized by a lock, and swap in a
+new model in one step.
+
+install(app, service) times every request of an app (see
+instrumentation) and adds the routes both apps share:
+
+    GET  /metrics           -- the metrics in Prometheus text format
+    GET  /api/cache/stats   -- the prediction cache counters
+    POST /api/model/update  -- add or remove labelled profiles
+
+/api/model/update changes the served model, so it is only added when a
+shared secret is configured (the SALARY_API_UPDATE_TOKEN environment
+variable), and every request must send it in the X-Model-Update-Token
+header. The apps leave it out of CORS (see CORS_RESOURCES), so browsers
+on other origins cannot call it.
+'''
+
+import hmac
+import os
+import re
+import threading
+
+from flask import Response, jsonify, request
+
+from naive_bayes_solution import naive_bayes_model
+from training_stats import TrainingStatistics
+from model_store import load_model_artifact
+from posterior_cache import PosteriorCache
+from posterior_table import PosteriorTable
+from instrumentation import Metrics, instrument
+
+# Training data and the compiled model artifact built from it offline
+# (python model_store.py)
+TRAINING_DATA = 'data/stackoverflow-train.csv'
+MODEL_ARTIFACT = 'data/stackoverflow-model.npz'
+# Posteriors of every complete profile (python posterior_table.py)
+POSTERIOR_TABLE = 'data/stackoverflow-posteriors.npy'
+
+# The model update route, and the shared secret that enables it
+UPDATE_ROUTE = '/api/model/update'
+UPDATE_TOKEN_ENV = 'SALARY_API_UPDATE_TOKEN'
+UPDATE_TOKEN_HEADER = 'X-Model-Update-Token'
+# flask_cors resources: every route but the model update
+CORS_RESOURCES = {r'^(?!{}$).*'.format(re.escape(UPDATE_ROUTE)): {}}
+
+
+class ModelService:
+    '''
+    The model an app serves, loaded on first use and updated in place.
+    '''
+
+    def __init__(self, variable_domains, training_data=TRAINING_DATA, model_artifact=MODEL_ARTIFACT,
+                 table_file=POSTERIOR_TABLE):
+        '''
+        :param variable_domains: a dict mapping each variable of the model,
+                                 the class Salary included, to its domain.
+        :param training_data: the CSV the model is trained on.
+        :param model_artifact: the artifact to load instead of training,
+                               if it is current (see load_model_artifact).
+        :param table_file: the precomputed posterior table, if it exists.
+        '''
+        self.variable_domains = variable_domains
+        self.training_data = training_data
+        self.model_artifact = model_artifact
+        self.table_file = table_file
+        self.trained_model = None
+        self.training_stats = None
+        self.posterior_table = None
+        self.prediction_cache = PosteriorCache()
+        self.model_version = 0
+        self.metrics = Metrics('salary_api')
+        # Serializes the first load and model updates; readers just use the
+        # current trained_model. Reentrant, as update_model loads the model.
+        self.lock = threading.RLock()
+
+    def load_model(self):
+        '''
+        Load the model if it is not loaded yet, and return it. Concurrent
+        first calls load it once.
+        '''
+        if self.trained_model is not None:
+            return self.trained_model
+        with self.lock:
+            if self.trained_model is not None:
+                return self.trained_model
+            print("Loading Stack Overflow developer survey model...")
+            model, stats = None, None
+            if os.path.exists(self.model_artifact):
+                try:
+                    model, stats = load_model_artifact(self.model_artifact, self.training_data, self.variable_domains)
+                except ValueError as e:
+                    print(f"Ignoring model artifact: {str(e)}")
+            if model is None:
+                model = naive_bayes_model(self.training_data, self.variable_domains)
+            if stats is None:
+                # Index the training data once for the data-insights block
+                stats = TrainingStatistics.from_csv(self.training_data)
+            table = None
+            if os.path.exists(self.table_file):
+                try:
+                    table = PosteriorTable(self.table_file, model)
+                except ValueError as e:
+                    print(f"Ignoring posterior table: {str(e)}")
+            self.posterior_table = table
+            self.trained_model, self.training_stats = model, stats
+            self.model_version += 1
+            self.prediction_cache.clear()
+            print("Model loaded successfully!")
+        return self.trained_model
+
+    def update_model(self, profiles, remove=False):
+        '''
+        Fold labelled profiles into (or out of) the model and hot-swap it.
+
+        The update is applied to a copy, so requests in flight keep using
+        the old model; the new model and statistics replace it in one step.
+
+        :param profiles: dicts with a value for every model variable.
+        :param remove: if True, the profiles are removed instead of added.
+        :return: the new model.
+        '''
+        with self.lock:
+            model = self.load_model().copy()
+            rows = [[profile[var.name] for var in model.columns] for profile in profiles]
+            if remove:
+                model.remove(rows)
+            else:
+                model.update(rows)
+            stats = self.training_stats.updated(rows, -1 if remove else 1)
+            # The precomputed posteriors describe the old model. Drop them
+            # before the swap, so no request pairs the new model with them.
+            self.posterior_table = None
+            self.trained_model, self.training_stats = model, stats
+            self.model_version += 1
+            self.prediction_cache.clear()
+        return model
+
+    def profile_error(self, profile):
+        '''
+        Return an error message if profile is not a labelled profile with a
+        valid value for every variable (Salary included), else None.
+        '''
+        if not isinstance(profile, dict):
+            return "Profile must be a JSON object"
+        for field, domain in self.variable_domains.items():
+            if profile.get(field) not in domain:
+                return f"Invalid or missing '{field}'. Valid values: {domain}"
+        return None
+
+
+def install(app, service, update_token=None):
+    '''
+    Time every request of a Flask app in service.metrics and add the
+    /metrics and /api/cache/stats routes for service, and the
+    /api/model/update route if an update token is configured.
+
+    :param update_token: the secret /api/model/update requests must send;
+                         defaults to the SALARY_API_UPDATE_TOKEN
+                         environment variable. If it is empty, the route
+                         is not added.
+    '''
+    instrument(app, service.metrics)
+    if update_token is None:
+        update_token = os.environ.get(UPDATE_TOKEN_ENV, '')
+
+    @app.route('/metrics', methods=['GET'])
+    def prometheus_metrics():
+        """Request counts and per-stage latency histograms in Prometheus text format"""
+        return Response(service.metrics.render(), mimetype='text/plain; version=0.0.4')
+
+    @app.route('/api/cache/stats', methods=['GET'])
+    def cache_stats():
+        """Report the size and hit/miss/eviction counters of the prediction cache"""
+        return jsonify({**service.prediction_cache.stats(), "model_version": service.model_version})
+
+    if not update_token:
+        return
+
+    @app.route(UPDATE_ROUTE, methods=['POST'])
+    def update_model_endpoint():
+        """Add labelled profiles to the model, or remove them, without a restart.
+
+        Body: {"profiles": [{<profile fields>, "Salary": "..."}, ...], "remove": false}
+        """
+        token = request.headers.get(UPDATE_TOKEN_HEADER, '')
+        if not hmac.compare_digest(token.encode(), update_token.encode()):
+            return jsonify({"error": f"Missing or invalid {UPDATE_TOKEN_HEADER} header"}), 401
+
+        try:
+            data = request.get_json(silent=True)
+            profiles = data.get('profiles') if isinstance(data, dict) else None
+            if not isinstance(profiles, list) or not profiles:
+                return jsonify({"error": "Expected {\"profiles\": [...]} with at least one labelled profile"}), 400
+
+            for i, profile in enumerate(profiles):
+                error = service.profile_error(profile)
+                if error:
+                    return jsonify({"error": f"Profile {i}: {error}"}), 400
+
+            remove = bool(data.get('remove', False))
+            service.update_model(profiles, remove)
+            return jsonify({
+                "status": "updated",
+                "removed" if remove else "added": len(profiles),
+                "total_training_samples": service.training_stats.total
+            })
+
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        except Exception as e:
+            print(f"Error in model update: {str(e)}")
+            return jsonify({"error": f"Model update failed: {str(e)}"}), 500
@@ -0,0 +1,166 @@
+'''
+Save and load trained Bayes nets as versioned .npz artifacts.
+
+An artifact holds everything needed to rebuild a BN without retraining:
+
+    metadata        -- a JSON string with the format version, the BN name,
+                       each variable's domain, each factor's name and scope,
+                       and the SHA-256 fingerprint of the training data
+    factor_<i>      -- the table of the i-th factor (Factor.get_table())
+    class_counts    -- for a NaiveBayesNet: the raw class counts and ...
+    attribute_counts_<j> -- ... the count table of its j-th attribute, so
+                       the loaded model can still be updated incrementally
+    stats_profiles  -- optional: the distinct training rows, as codes into
+                       the per-column values listed in metadata, and ...
+    stats_counts    -- ... how often each row occurs (TrainingStatistics)
+
+The file is written uncompressed, so loading it is a few small array
+reads. Train offline with
+
+    python model_store.py
+
+which writes the Stack Overflow artifact that app.py starts from.
+'''
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from bnetbase import Variable, Factor, BN
+from data_store import file_fingerprint
+from naive_bayes_solution import NaiveBayesNet
+from training_stats import TrainingStatistics
+
+# Bump when the layout of the artifact changes
+ARTIFACT_VERSION = 2
+
+
+def data_fingerprint(data_file):
+    '''
+    Return the SHA-256 hex digest of a training data file.
+
+    :param data_file: path to the file.
+    '''
+    return file_fingerprint(data_file)
+
+
+def model_fingerprint(bayes_net):
+    '''
+    Return a SHA-256 hex digest of a BN's variables and factor tables.
+    Two BNs with the same fingerprint answer every query the same way.
+
+    :param bayes_net: a BN object.
+    '''
+    digest = hashlib.sha256()
+    digest.update(json.dumps([[var.name, var.domain()] for var in bayes_net.variables()]).encode())
+    for factor in bayes_net.factors():
+        digest.update(json.dumps([var.name for var in factor.get_scope()]).encode())
+        digest.update(np.ascontiguousarray(factor.values, dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+def save_model_artifact(path, bayes_net, data_file=None, statistics=None):
+    '''
+    Write bayes_net to path as an .npz artifact. The file is replaced
+    atomically, so readers never see a partially written artifact.
+
+    :param path: the artifact file to write.
+    :param bayes_net: a BN object.
+    :param data_file: the training data the BN was built from; its
+                      fingerprint is stored so stale artifacts can be detected.
+    :param statistics: an optional TrainingStatistics to store with the model.
+    '''
+    metadata = {
+        "version": ARTIFACT_VERSION,
+        "name": bayes_net.name,
+        "variables": [[var.name, var.domain()] for var in bayes_net.variables()],
+        "factors": [[factor.name, [var.name for var in factor.get_scope()]] for factor in bayes_net.factors()],
+        "fingerprint": data_fingerprint(data_file) if data_file else None,
+        "columns": [var.name for var in bayes_net.columns] if isinstance(bayes_net, NaiveBayesNet) else None,
+        "stats_columns": statistics.columns if statistics is not None else None,
+        "stats_values": statistics.values if statistics is not None else None,
+    }
+    arrays = {"metadata": np.array(json.dumps(metadata))}
+    for i, factor in enumerate(bayes_net.factors()):
+        arrays["factor_{}".format(i)] = factor.get_table()
+    if isinstance(bayes_net, NaiveBayesNet):
+        arrays["class_counts"] = bayes_net.class_counts
+        for j, counts in enumerate(bayes_net.attribute_counts):
+            arrays["attribute_counts_{}".format(j)] = counts
+    if statistics is not None:
+        largest_domain = max([len(values) for values in statistics.values], default=1)
+        arrays["stats_profiles"] = statistics.codes.astype(np.min_scalar_type(largest_domain))
+        arrays["stats_counts"] = statistics.counts
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+
+
+def load_model_artifact(path, data_file=None, variable_domains=None):
+    '''
+    Rebuild a BN from an artifact written by save_model_artifact.
+
+    :param path: the artifact file.
+    :param data_file: if given and present, the artifact must have been
+                      trained on a file with the same fingerprint.
+    :param variable_domains: if given, a dict mapping variable names to
+                             domains; the artifact must have exactly these
+                             variables, with the same domains in the same order.
+    :return: a (BN, TrainingStatistics or None) tuple.
+    Raises ValueError if the artifact has an unknown version or is stale.
+    '''
+    with np.load(path, allow_pickle=False) as archive:
+        metadata = json.loads(str(archive["metadata"]))
+        if metadata.get("version") != ARTIFACT_VERSION:
+            raise ValueError("{} has artifact version {}, expected {}".format(path, metadata.get("version"), ARTIFACT_VERSION))
+        if data_file and os.path.exists(data_file) and metadata["fingerprint"] != data_fingerprint(data_file):
+            raise ValueError("{} was not trained on the current {}".format(path, data_file))
+        if variable_domains is not None:
+            domains = dict(metadata["variables"])
+            changed = sorted(name for name in set(domains) | set(variable_domains)
+                             if list(domains.get(name, [])) != list(variable_domains.get(name, [])))
+            if changed:
+                raise ValueError("{} was trained with other domains for {}".format(path, ", ".join(changed)))
+
+        variables = {name: Variable(name, domain) for name, domain in metadata["variables"]}
+        if metadata["columns"] is not None:
+            # Naive Bayes models are rebuilt from their counts
+            columns = [variables[name] for name in metadata["columns"]]
+            attribute_counts = [archive["attribute_counts_{}".format(j)] for j in range(len(columns) - 1)]
+            bayes_net = NaiveBayesNet(metadata["name"], list(variables.values()), columns,
+                                      archive["class_counts"], attribute_counts)
+        else:
+            factors = []
+            for i, (name, scope) in enumerate(metadata["factors"]):
+                factor = Factor(name, [variables[var_name] for var_name in scope])
+                factor.set_table(archive["factor_{}".format(i)])
+                factors.append(factor)
+            bayes_net = BN(metadata["name"], list(variables.values()), factors)
+
+        statistics = None
+        if metadata["stats_columns"] is not None:
+            statistics = TrainingStatistics(metadata["stats_columns"], metadata["stats_values"],
+                                            archive["stats_profiles"], archive["stats_counts"])
+    return bayes_net, statistics
+
+
+if __name__ == '__main__':
+    # Train the Stack Overflow model offline and write the artifact app.py starts from
+    from app import variable_domains
+    from model_service import TRAINING_DATA, MODEL_ARTIFACT
+    from naive_bayes_solution import naive_bayes_model
+    from evaluate import evaluate
+
+    print("Training model on {}...".format(TRAINING_DATA))
+    model = naive_bayes_model(TRAINING_DATA, variable_domains)
+    save_model_artifact(MODEL_ARTIFACT, model, TRAINING_DATA, TrainingStatistics.from_csv(TRAINING_DATA))
+    print("Model artifact written to {}".format(MODEL_ARTIFACT))
+
+    # Check the retrained model on the held-out split before it is served
+    evaluation = evaluate(model, 'data/stackoverflow-test.csv')
+    print("Test accuracy {:.4f}, log-loss {:.4f} (python evaluate.py for the full report)".format(
+        evaluation.accuracy(), evaluation.log_loss()))
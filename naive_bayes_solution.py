@@ -1,214 +1,18 @@
-from bnetbase import Variable, Factor, BN
+from bnetbase import Variable, Factor, SparseFactor, BN
+from factor_algebra import normalize, restrict, sum_out, multiply, to_log, from_log, log_normalize, log_sum_out, log_multiply
+from elimination_order import query_elimination_order
+from factor_pruning import prune_factors
+from data_store import columnar_path, iter_dictionary_batches, read_headers, read_rows
 import csv
 import itertools
-import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 
+# Number of CSV rows held in memory at once by the streaming readers
+CHUNK_SIZE = 50000
 
-def normalize(factor: Factor) -> Factor:
-    '''
-    Normalize the factor such that its values sum to 1.
-    Do not modify the input factor.
-
-    :param factor: a Factor object. 
-    :return: a new Factor object resulting from normalizing factor.
-    '''
-    # Step 1: Create a new factor with the same scope
-    new_factor = Factor(f"{factor.name}_normalized", factor.get_scope())
-
-    # Step 2: Calculate the total sum of the factor's values
-    total_sum = sum(factor.values)
-
-    # Step 3: Prepare variables and their domains
-    variables = factor.get_scope()
-    domains = [var.domain() for var in variables]
-
-    # Step 4: Save current assignments
-    saved_assignments = [var.get_assignment_index() for var in variables]
-
-    # Step 5: Iterate over all possible assignments
-    for assignment in itertools.product(*domains):
-        # Set variable assignments
-        for var, value in zip(variables, assignment):
-            var.set_assignment(value)
-
-        # Retrieve the original value
-        original_value = factor.get_value_at_current_assignments()
-
-        # Compute the normalized value
-        if total_sum != 0:
-            normalized_value = original_value / total_sum
-        else:
-            normalized_value = 0  # Handle zero total sum appropriately
-
-        # Set the normalized value in the new factor
-        new_factor.add_value_at_current_assignment(normalized_value)
-
-    # Step 6: Restore original assignments
-    for var, index in zip(variables, saved_assignments):
-        var.set_assignment_index(index)
-
-    return new_factor
-
-
-def restrict(factor: Factor, variable: Variable, value: str) -> Factor:
-    '''
-    Restrict a factor by assigning value to variable.
-    Do not modify the input factor.
-
-    :param factor: a Factor object.
-    :param variable: the variable to restrict.
-    :param value: the value to restrict the variable to
-    :return: a new Factor object resulting from restricting variable to value.
-             This new factor no longer has variable in it.
-
-    '''
-    # Step 1: Identify the new scope (exclude the restricted variable)
-    new_scope = [var for var in factor.get_scope() if var != variable]
 
-    # Step 2: Create a new factor with the new scope
-    new_factor = Factor(f"{factor.name}_restricted_{variable.name}_{value}", new_scope)
-
-    # Step 3: Prepare variables and their domains
-    variables = factor.get_scope()
-    domains = [var.domain() for var in variables]
-
-    # Step 4: Save current assignments
-    saved_assignments = [var.get_assignment_index() for var in variables]
-
-    # Step 5: Iterate over all possible assignments
-    for assignment in itertools.product(*domains):
-        # Create a mapping of variables to their assigned values
-        assignment_dict = dict(zip(variables, assignment))
-
-        # Check if the variable has the specified value
-        if assignment_dict[variable] == value:
-            # Set assignments for all variables
-            for var, val in assignment_dict.items():
-                var.set_assignment(val)
-
-            # Retrieve the value from the original factor
-            original_value = factor.get_value_at_current_assignments()
-
-            # Set assignments in the new factor (excluding the restricted variable)
-            for var in new_scope:
-                var.set_assignment(assignment_dict[var])
-
-            # Add the value to the new factor
-            new_factor.add_value_at_current_assignment(original_value)
-
-    # Step 6: Restore original assignments
-    for var, index in zip(variables, saved_assignments):
-        var.set_assignment_index(index)
-
-    return new_factor
-
-def sum_out(factor: Factor, variable: Variable) -> Factor:
-    '''
-    Sum out a variable variable from factor factor.
-    Do not modify the input factor.
-
-    :param factor: a Factor object.
-    :param variable: the variable to sum out.
-    :return: a new Factor object resulting from summing out variable from the factor.
-             This new factor no longer has variable in it.
-    '''
-    # Step 1: Identify the new scope (exclude the summed-out variable)
-    new_scope = [var for var in factor.get_scope() if var != variable]
-    new_factor = Factor(f"{factor.name}_sumout_{variable.name}", new_scope)
-
-    # Step 2: Prepare variables and domains
-    new_vars = new_factor.get_scope()
-    new_domains = [var.domain() for var in new_vars]
-    sumout_domain = variable.domain()
-
-    # Step 3: Save current assignments
-    all_vars = factor.get_scope()
-    saved_assignments = [var.get_assignment_index() for var in all_vars]
-
-    # Step 4: Iterate over all possible assignments of the new scope
-    for assignment in itertools.product(*new_domains):
-        total = 0  # Initialize sum accumulator
-
-        # Map variables to their assigned values
-        assignment_dict = dict(zip(new_vars, assignment))
-
-        # For each value of the summed-out variable
-        for sumout_val in sumout_domain:
-            # Build full assignment including the summed-out variable
-            full_assignment = assignment_dict.copy()
-            full_assignment[variable] = sumout_val
-
-            # Set variable assignments
-            for var, assigned_value in full_assignment.items():
-                var.set_assignment(assigned_value)
-
-            # Retrieve the original value
-            original_value = factor.get_value_at_current_assignments()
-
-            # Accumulate the sum
-            total += original_value
-
-        # Set assignments for new factor (only variables in new scope)
-        for var, assigned_value in assignment_dict.items():
-            var.set_assignment(assigned_value)
-
-        # Assign the accumulated sum to the new factor
-        new_factor.add_value_at_current_assignment(total)
-
-    # Step 5: Restore original assignments
-    for var, index in zip(all_vars, saved_assignments):
-        var.set_assignment_index(index)
-
-    return new_factor
-
-def multiply(factor_list):
-    '''
-    Multiply a list of factors together.
-    Do not modify any of the input factors. 
-
-    :param factor_list: a list of Factor objects.
-    :return: a new Factor object resulting from multiplying all the factors in factor_list.
-    '''
-    # Collect variables from all factors while preserving order
-    new_scope_vars = []
-    for factor in factor_list:
-        for var in factor.get_scope():
-            if var not in new_scope_vars:
-                new_scope_vars.append(var)
-
-    # Create the new factor
-    new_factor = Factor("ProductFactor", new_scope_vars)
-    domains = [var.domain() for var in new_scope_vars]
-    saved_assignments = {var: var.get_assignment_index() for var in new_scope_vars}
-
-    # Iterate over all possible assignments
-    for assignment in itertools.product(*domains):
-        # Map variables to their assigned values
-        assignment_dict = dict(zip(new_scope_vars, assignment))
-
-        # Set variable assignments
-        for var, value in assignment_dict.items():
-            var.set_assignment(value)
-
-        # Initialize product accumulator
-        product = 1.0
-
-        # Multiply values from each factor
-        for factor in factor_list:
-            # Retrieve value from the factor
-            factor_value = factor.get_value_at_current_assignments()
-            product *= factor_value
-
-        # Add the product to the new factor
-        new_factor.add_value_at_current_assignment(product)
-
-    # Restore original variable assignments
-    for var, index in saved_assignments.items():
-        var.set_assignment_index(index)
-
-    return new_factor
-
-def ve(bayes_net, var_query, EvidenceVars):
+def ve(bayes_net, var_query, EvidenceVars, ordering="min_fill", log_space=False, stats=None):
     '''
 
     Execute the variable elimination algorithm on the Bayesian network bayes_net
@@ -221,6 +25,14 @@ def ve(bayes_net, var_query, EvidenceVars):
     :param EvidenceVars: the evidence variables. Each evidence variable has 
                          its evidence set to a value from its domain 
                          using set_evidence.
+    :param ordering: the elimination order: a name from
+                     elimination_order.ORDERINGS, a heuristic function, or
+                     an explicit list of the variables to eliminate
+                     (see elimination_order.query_elimination_order).
+    :param log_space: if True, eliminate with log-space factors, so
+                      products of many small probabilities do not underflow.
+    :param stats: if given, a dict that receives the number of pruned
+                  factors (see infer).
     :return: a Factor object representing a distribution over the values
              of var_query. that is a list of numbers, one for every value
              in var_query's domain. These numbers sum to 1. The i-th number
@@ -237,19 +49,79 @@ def ve(bayes_net, var_query, EvidenceVars):
         Pr(A='a'|B=1, C='c') = 0.24, and 
         Pr(A='a'|B=1, C='c') = 0.26.
 
+    ve reads the evidence from EvidenceVars and then calls infer, which
+    does the actual work without touching any Variable state.
+
+    '''
+    return infer(bayes_net, var_query, {evidence: evidence.get_evidence() for evidence in EvidenceVars}, ordering,
+                 log_space=log_space, stats=stats)
+
+
+def infer(bayes_net, var_query, evidence, ordering="min_fill", prune=True, log_space=False, stats=None):
+    '''
+    Compute the distribution over the values of var_query given evidence.
+
+    Unlike ve, the evidence is passed explicitly and no evidence_index or
+    assignment_index of any Variable is read or written, so one BN can
+    answer queries from many threads at once.
+
+    Naive Bayes networks (see NaiveBayesPosterior) are answered in closed
+    form when the query variable is the class variable; every other
+    network or query goes through general elimination below.
+
+    :param bayes_net: a BN object.
+    :param var_query: the query variable.
+    :param evidence: a mapping from evidence Variables to their observed
+                     values. It is not modified.
+    :param ordering: the elimination order (see ve). Use
+                     elimination_order.elimination_plan to inspect the order
+                     and the largest factor it creates.
+    :param prune: if True, barren and irrelevant factors are dropped
+                  before elimination (see factor_pruning).
+    :param log_space: if True, factors are multiplied and summed out in
+                      log space and normalized with log-sum-exp. The closed
+                      form Naive Bayes posterior always works in log space.
+    :param stats: if given, a dict whose "pruned" entry is set to the
+                  number of factors the query did not need. For the closed
+                  form Naive Bayes posterior these are the CPTs of the
+                  unobserved features.
+    :return: a Factor object over [var_query] whose values sum to 1.
     '''
-    # Step 1: Restrict factors based on the evidence
+    # Take a private snapshot of the evidence
+    evidence = dict(evidence)
+
+    # Step 0: Use the closed-form posterior for Naive Bayes networks
+    posterior = NaiveBayesPosterior.for_bn(bayes_net)
+    if posterior is not None and posterior.answers(var_query, evidence):
+        if stats is not None:
+            stats["pruned"] = sum(var not in evidence for var in posterior.features)
+        return posterior.query({var: var.value_index(value) for var, value in evidence.items()})
+
+    # Step 1: Drop the factors that cannot affect the query, then restrict
+    # the rest based on the evidence
+    factors, pruned = bayes_net.factors(), 0
+    if prune and var_query not in evidence:
+        factors, pruned = prune_factors(factors, var_query, evidence)
+    if stats is not None:
+        stats["pruned"] = pruned
     restricted_factors = []
-    for factor in bayes_net.factors():
+    for factor in factors:
         new_factor = factor  # Start with the original factor
-        for evidence in EvidenceVars:
-            if evidence in new_factor.get_scope():
-                new_factor = restrict(new_factor, evidence, evidence.get_evidence())
+        for var, value in evidence.items():
+            if var in new_factor.get_scope():
+                new_factor = restrict(new_factor, var, value)
         restricted_factors.append(new_factor)
 
-    # Step 2: Eliminate all variables except the query variable
+    if log_space:
+        restricted_factors = [to_log(f) for f in restricted_factors]
+        multiply_factors, sum_out_factor = log_multiply, log_sum_out
+    else:
+        multiply_factors, sum_out_factor = multiply, sum_out
+
+    # Step 2: Eliminate all variables except the query variable, in the
+    # order chosen by the ordering heuristic
     remaining_factors = restricted_factors[:]
-    variables_to_eliminate = [v for v in bayes_net.variables() if v != var_query and v not in EvidenceVars]
+    variables_to_eliminate, _ = query_elimination_order(bayes_net, factors, var_query, evidence, ordering)
     for variable in variables_to_eliminate:
         # Find all factors involving the variable
         factors_to_multiply = [f for f in remaining_factors if variable in f.get_scope()]
@@ -257,32 +129,31 @@ def ve(bayes_net, var_query, EvidenceVars):
         remaining_factors = [f for f in remaining_factors if f not in factors_to_multiply]
         if factors_to_multiply:
             # Multiply all the factors involving the variable
-            product_factor = multiply(factors_to_multiply)
+            product_factor = multiply_factors(factors_to_multiply)
             # Sum out the variable
-            summed_out_factor = sum_out(product_factor, variable)
+            summed_out_factor = sum_out_factor(product_factor, variable)
             # Add the resulting factor back to the list
             remaining_factors.append(summed_out_factor)
 
     # Step 3: Multiply all remaining factors
     if remaining_factors:
-        final_factor = multiply(remaining_factors)
+        final_factor = multiply_factors(remaining_factors)
     else:
         # If there are no remaining factors, create a uniform factor over var_query
         final_factor = Factor(f"Uniform_{var_query.name}", [var_query])
-        uniform_value = 1.0 / var_query.domain_size()
-        for value in var_query.domain():
-            var_query.set_assignment(value)
-            final_factor.add_value_at_current_assignment(uniform_value)
+        final_factor.values.fill(1.0 / var_query.domain_size())
+        if log_space:
+            final_factor = to_log(final_factor)
 
     # Step 4: Normalize the resulting factor
-    total = sum(final_factor.values)
+    if log_space:
+        # Normalize before leaving log space, where the values could underflow
+        final_factor = from_log(log_normalize(final_factor))
+    total = final_factor.values.sum()
     if total == 0:
         print("Warning: Sum of final factor values is zero. Returning uniform probabilities.")
         normalized_factor = Factor(f"Normalized_{var_query.name}", [var_query])
-        uniform_value = 1.0 / var_query.domain_size()
-        for value in var_query.domain():
-            var_query.set_assignment(value)
-            normalized_factor.add_value_at_current_assignment(uniform_value)
+        normalized_factor.values.fill(1.0 / var_query.domain_size())
     else:
         normalized_factor = normalize(final_factor)
 
@@ -294,10 +165,220 @@ def ve(bayes_net, var_query, EvidenceVars):
         for variable in variables_to_eliminate:
             normalized_factor = sum_out(normalized_factor, variable)
 
+    # Callers read .values, so answer with a dense factor even when the
+    # network has sparse factors
+    if isinstance(normalized_factor, SparseFactor):
+        normalized_factor = normalized_factor.to_dense()
     return normalized_factor
 
 
-def naive_bayes_model(data_file, variable_domains = {"Work": ['Not Working', 'Government', 'Private', 'Self-emp'], "Education": ['<Gr12', 'HS-Graduate', 'Associate', 'Professional', 'Bachelors', 'Masters', 'Doctorate'], "Occupation": ['Admin', 'Military', 'Manual Labour', 'Office Labour', 'Service', 'Professional'], "MaritalStatus": ['Not-Married', 'Married', 'Separated', 'Widowed'], "Relationship": ['Wife', 'Own-child', 'Husband', 'Not-in-family', 'Other-relative', 'Unmarried'], "Race": ['White', 'Black', 'Asian-Pac-Islander', 'Amer-Indian-Eskimo', 'Other'], "Gender": ['Male', 'Female'], "Country": ['North-America', 'South-America', 'Europe', 'Asia', 'Middle-East', 'Carribean'], "Salary": ['<50K', '>=50K']}, class_var = Variable("Salary", ['<50K', '>=50K'])):
+
+class NaiveBayesPosterior:
+    '''
+    Closed-form posterior over the class variable of a Naive Bayes BN.
+
+    A BN is star-shaped when it has a single factor over the class
+    variable C (the prior) and every other factor is over exactly one
+    feature X and C, with no feature shared between factors. For such a
+    network
+
+        P(C | e) ~ P(C) * prod_{X observed} P(x|C) * prod_{X unobserved} sum_x P(x|C)
+
+    so the posterior is a sum of precomputed log-CPT columns followed by
+    a normalization instead of a restrict/multiply/sum_out pass.
+    The unobserved terms are 1 for proper CPTs; they are folded into the
+    precomputed tables so the result matches ve for any star-shaped BN.
+    '''
+
+    def __init__(self, bayes_net):
+        '''
+        Precompute the log-CPT columns of a Naive Bayes BN.
+        Raises ValueError if bayes_net is not star-shaped.
+
+        :param bayes_net: a BN object.
+        '''
+        priors = [f for f in bayes_net.factors() if len(f.get_scope()) == 1]
+        if len(priors) != 1:
+            raise ValueError("{} does not have exactly one single-variable factor".format(bayes_net.name))
+        class_var = priors[0].get_scope()[0]
+
+        features = []
+        tables = []
+        for factor in bayes_net.factors():
+            if factor is priors[0]:
+                continue
+            scope = factor.get_scope()
+            if len(scope) != 2 or class_var not in scope:
+                raise ValueError("Factor {} is not a P(X|{}) factor".format(factor.name, class_var.name))
+            feature = scope[0] if scope[1] is class_var else scope[1]
+            if feature is class_var or feature in features:
+                raise ValueError("Variable {} appears in more than one conditional factor".format(feature.name))
+            table = factor.get_table()
+            features.append(feature)
+            tables.append(table if scope[1] is class_var else table.T)
+
+        self.class_var = class_var
+        self.features = features
+        with np.errstate(divide='ignore', invalid='ignore'):
+            log_prior = np.log(priors[0].get_table())
+            # log sum_x P(x|C) is added for every feature and swapped for
+            # log P(x|C) when X is observed.
+            log_marginals = [np.log(table.sum(axis=0)) for table in tables]
+            self.log_base = log_prior + sum(log_marginals, np.zeros(class_var.domain_size()))
+            self.log_columns = {}
+            for feature, table, log_marginal in zip(features, tables, log_marginals):
+                # A class with an all-zero column is already -inf in log_base
+                self.log_columns[feature] = np.where(np.isneginf(log_marginal), 0.0, np.log(table) - log_marginal)
+
+    @classmethod
+    def for_bn(cls, bayes_net):
+        '''
+        Return the NaiveBayesPosterior for bayes_net, or None if it is not
+        a Naive Bayes BN. The result is cached on the BN and rebuilt when
+        its list of factors changes or one of them changes its values (see
+        Factor.version).
+
+        :param bayes_net: a BN object.
+        '''
+        factors = tuple(bayes_net.Factors)
+        versions = tuple(factor.version for factor in factors)
+        cached = getattr(bayes_net, '_naive_bayes_posterior', None)
+        if (cached is None or len(cached[0]) != len(factors) or any(a is not b for a, b in zip(cached[0], factors))
+                or cached[1] != versions):
+            try:
+                posterior = cls(bayes_net)
+            except ValueError:
+                posterior = None
+            cached = (factors, versions, posterior)
+            bayes_net._naive_bayes_posterior = cached
+        return cached[2]
+
+    def answers(self, var_query, EvidenceVars):
+        '''
+        Return True if the query can be answered in closed form, i.e.
+        var_query is the class variable and is not itself evidence.
+
+        :param EvidenceVars: the evidence variables (a list, or a mapping
+                             keyed by Variable).
+        '''
+        return var_query is self.class_var and self.class_var not in EvidenceVars
+
+    def log_joint(self, evidence):
+        '''
+        Return the unnormalized log posterior over the class variable.
+
+        :param evidence: a dict mapping feature Variables to the index of
+                         their observed value. Variables that are not
+                         features of the model are ignored.
+        :return: an ndarray with one entry per class value.
+        '''
+        log_joint = self.log_base.copy()
+        for var, index in evidence.items():
+            column = self.log_columns.get(var)
+            if column is not None:
+                log_joint += column[index]
+        return log_joint
+
+    def query(self, evidence):
+        '''
+        Compute P(class | evidence) as a Factor over the class variable.
+
+        :param evidence: a dict mapping feature Variables to the index of
+                         their observed value.
+        :return: a Factor object with scope [class variable].
+        '''
+        log_joint = self.log_joint(evidence)
+        factor = Factor(f"NaiveBayesPosterior_{self.class_var.name}", [self.class_var])
+        peak = log_joint.max()
+        if np.isneginf(peak):
+            print("Warning: Sum of final factor values is zero. Returning uniform probabilities.")
+            factor.values.fill(1.0 / self.class_var.domain_size())
+        else:
+            probabilities = np.exp(log_joint - peak)
+            factor.values[:] = probabilities / probabilities.sum()
+        return factor
+
+    def batch(self, evidence_vars, codes):
+        '''
+        Compute P(class | evidence) for many evidence assignments at once.
+
+        :param evidence_vars: a list of k Variables, one per column of codes.
+        :param codes: an N x k integer array; codes[i, j] is the index of the
+                      value of evidence_vars[j] observed in row i, or -1 if
+                      that variable is unobserved in row i.
+        :return: an N x |class domain| ndarray whose rows sum to 1. Rows
+                 whose evidence has probability zero are uniform.
+        '''
+        codes = np.asarray(codes, dtype=np.intp).reshape(-1, len(evidence_vars))
+        log_joint = np.tile(self.log_base, (codes.shape[0], 1))
+        for j, var in enumerate(evidence_vars):
+            column = self.log_columns.get(var)
+            if column is None or var is self.class_var:
+                continue
+            observed = codes[:, j] >= 0
+            contribution = column[np.where(observed, codes[:, j], 0)]
+            log_joint += np.where(observed[:, None], contribution, 0.0)
+
+        peak = log_joint.max(axis=1, keepdims=True)
+        impossible = np.isneginf(peak[:, 0])
+        peak[impossible] = 0.0
+        probabilities = np.exp(log_joint - peak)
+        probabilities[impossible] = 1.0
+        return probabilities / probabilities.sum(axis=1, keepdims=True)
+
+
+def encode_evidence(evidence_vars, rows):
+    '''
+    Encode rows of evidence values as an integer matrix for batch_posterior.
+
+    :param evidence_vars: a list of k Variables.
+    :param rows: an iterable of length-k sequences of values, ordered like
+                 evidence_vars. None marks an unobserved variable.
+    :return: an N x k integer ndarray of domain indexes (-1 for None).
+    '''
+    lookups = [{value: index for index, value in enumerate(var.domain())} for var in evidence_vars]
+    codes = []
+    for row in rows:
+        encoded = []
+        for var, lookup, value in zip(evidence_vars, lookups, row):
+            if value is None:
+                encoded.append(-1)
+            elif value in lookup:
+                encoded.append(lookup[value])
+            else:
+                raise ValueError("{} is not in the domain of {}".format(value, var.name))
+        codes.append(encoded)
+    return np.array(codes, dtype=np.intp).reshape(-1, len(evidence_vars))
+
+
+def batch_posterior(bayes_net, var_query, evidence_vars, codes):
+    '''
+    Compute the distribution over var_query for N evidence assignments.
+    This is the batched equivalent of calling ve once per row. Naive Bayes
+    networks queried on their class variable are answered in one
+    vectorized pass; any other network or query falls back to one infer
+    call per row.
+
+    :param bayes_net: a BN object.
+    :param var_query: the query variable.
+    :param evidence_vars: a list of k evidence Variables.
+    :param codes: an N x k integer array of observed domain indexes, with
+                  -1 for unobserved (see encode_evidence).
+    :return: an N x |dom(var_query)| ndarray; row i is the distribution of
+             var_query given the evidence in row i.
+    '''
+    posterior = NaiveBayesPosterior.for_bn(bayes_net)
+    if posterior is not None and posterior.answers(var_query, evidence_vars):
+        return posterior.batch(evidence_vars, codes)
+    codes = np.asarray(codes, dtype=np.intp).reshape(-1, len(evidence_vars))
+    probabilities = np.empty((len(codes), var_query.domain_size()))
+    for i, row in enumerate(codes.tolist()):
+        evidence = {var: var.domain()[code] for var, code in zip(evidence_vars, row) if code >= 0}
+        probabilities[i] = infer(bayes_net, var_query, evidence).values
+    return probabilities
+
+
+def naive_bayes_model(data_file, variable_domains = {"Work": ['Not Working', 'Government', 'Private', 'Self-emp'], "Education": ['<Gr12', 'HS-Graduate', 'Associate', 'Professional', 'Bachelors', 'Masters', 'Doctorate'], "Occupation": ['Admin', 'Military', 'Manual Labour', 'Office Labour', 'Service', 'Professional'], "MaritalStatus": ['Not-Married', 'Married', 'Separated', 'Widowed'], "Relationship": ['Wife', 'Own-child', 'Husband', 'Not-in-family', 'Other-relative', 'Unmarried'], "Race": ['White', 'Black', 'Asian-Pac-Islander', 'Amer-Indian-Eskimo', 'Other'], "Gender": ['Male', 'Female'], "Country": ['North-America', 'South-America', 'Europe', 'Asia', 'Middle-East', 'Carribean'], "Salary": ['<50K', '>=50K']}, class_var = Variable("Salary", ['<50K', '>=50K']), chunk_size=CHUNK_SIZE):
     '''
    NaiveBayesModel returns a BN that is a Naive Bayes model that 
    represents the joint distribution of value assignments to 
@@ -307,15 +388,10 @@ def naive_bayes_model(data_file, variable_domains = {"Work": ['Not Working', 'Go
    When you generated your Bayes bayes_net, assume that the values 
    in the SALARY column of the dataset are the CLASS that we want to predict.
    @return a BN that is a Naive Bayes model and which represents the Adult Dataset. 
-    '''
-    ### READ IN THE DATA
-    input_data = []
-    with open(data_file, newline='') as csvfile:
-        reader = csv.reader(csvfile)
-        headers = next(reader, None) #skip header row
-        for row in reader:
-            input_data.append(row)
 
+   The data file is streamed in chunks of chunk_size rows and only the
+   count tables are kept, so memory does not grow with the file size.
+    '''
     ### DOMAIN INFORMATION REFLECTS ORDER OF COLUMNS IN THE DATA SET
     #variable_domains = {
     #"Work": ['Not Working', 'Government', 'Private', 'Self-emp'],
@@ -328,68 +404,244 @@ def naive_bayes_model(data_file, variable_domains = {"Work": ['Not Working', 'Go
     #"Country": ['North-America', 'South-America', 'Europe', 'Asia', 'Middle-East', 'Carribean'],
     #"Salary": ['<50K', '>=50K']
     #}
-        ### READ IN THE DATA
-        input_data = []
-        with open(data_file, newline='') as csvfile:
-            reader = csv.reader(csvfile)
-            headers = next(reader, None)  # Skip header row
-            for row in reader:
-                input_data.append(row)
-
-        ### Initialize Variables for Each Attribute
-        variables = {}
-        for var_name, domain in variable_domains.items():
-            variables[var_name] = Variable(var_name, domain)
-
-        ### Initialize Factors for Each Variable, Conditioning on Salary
-        factors = []
+
+    ### Initialize Variables for Each Attribute
+    variables = {}
+    for var_name, domain in variable_domains.items():
+        variables[var_name] = Variable(var_name, domain)
+
+    ### READ IN THE DATA, counting one chunk at a time
+    columns, class_counts, attribute_counts = count_naive_bayes_csv(data_file, variables, chunk_size)
+
+    ### Create the Bayesian Network
+    return NaiveBayesNet("NaiveBayesAdultDataset", list(variables.values()), columns, class_counts, attribute_counts)
+
+
+def read_chunks(reader, chunk_size=CHUNK_SIZE):
+    '''
+    Yield lists of at most chunk_size rows from an iterator of rows.
+    '''
+    return iter(lambda: list(itertools.islice(reader, chunk_size)), [])
+
+
+def count_naive_bayes_csv(data_file, variables, chunk_size=CHUNK_SIZE):
+    '''
+    Stream a CSV file and compute the sufficient statistics of a Naive
+    Bayes model over its columns. At most chunk_size rows are in memory
+    at a time; only the count tables are kept between chunks.
+
+    :param data_file: a CSV file with a header row; the last column is the
+                      class. Its Parquet twin is read instead when there is
+                      one (see data_store).
+    :param variables: a dict mapping column names to Variables.
+    :param chunk_size: the number of rows to encode and count at a time.
+    :return: (columns, class_counts, attribute_counts), where columns is
+             the list of Variables in file order and the counts are as
+             returned by count_naive_bayes.
+    '''
+    # The last column (Salary) is the class; every other column is an attribute
+    columns = [variables[header] for header in read_headers(data_file)]
+    class_size = columns[-1].domain_size()
+    class_counts = np.zeros(class_size, dtype=np.int64)
+    attribute_counts = [np.zeros((var.domain_size(), class_size), dtype=np.int64) for var in columns[:-1]]
+
+    for codes in read_code_chunks(data_file, columns, chunk_size):
+        chunk_class_counts, chunk_attribute_counts = count_naive_bayes(columns, codes)
+        class_counts += chunk_class_counts
+        for counts, chunk_counts in zip(attribute_counts, chunk_attribute_counts):
+            counts += chunk_counts
+
+    return columns, class_counts, attribute_counts
+
+
+def read_code_chunks(data_file, columns, chunk_size=CHUNK_SIZE):
+    '''
+    Stream columns of a CSV file as domain indexes, chunk_size rows at a time.
+
+    A Parquet twin of the file (see data_store) stores each column as a
+    dictionary of its distinct values and a code per row, so only the
+    dictionary is looked up in the Variable's domain and the row codes are
+    remapped with one take. The CSV is encoded with encode_columns.
+
+    :param data_file: a CSV file with a header row.
+    :param columns: the Variables to read, named like their columns.
+    :param chunk_size: the number of rows per chunk.
+    :return: an iterator of N x len(columns) integer ndarrays.
+    Raises ValueError if a value is not in its Variable's domain.
+    '''
+    path = columnar_path(data_file, as_text=True)
+    if path is not None:
+        for batch in iter_dictionary_batches(path, [var.name for var in columns], chunk_size):
+            codes = np.empty((len(batch[0][1]), len(columns)), dtype=np.intp)
+            for j, (var, (values, value_codes)) in enumerate(zip(columns, batch)):
+                codes[:, j] = encode_columns([var], [[value] for value in values])[:, 0][value_codes]
+            yield codes
+        return
+
+    with open(data_file, newline='') as csvfile:
+        reader = csv.reader(csvfile)
+        headers = next(reader, None) #skip header row
+        used = [headers.index(var.name) for var in columns]
+        for chunk in read_chunks(reader, chunk_size):
+            yield encode_columns(columns, [[row[i] for i in used] for row in chunk])
+
+
+def encode_columns(columns, rows):
+    '''
+    Encode rows of raw CSV values as domain indexes.
+
+    The rows are transposed once and each column is mapped through a
+    value -> index dict with map/np.fromiter, so no Python-level loop
+    runs per cell.
+
+    :param columns: the list of Variables, one per column.
+    :param rows: a list of rows, each a list of values in column order.
+    :return: an N x len(columns) integer ndarray of domain indexes.
+    '''
+    codes = np.empty((len(rows), len(columns)), dtype=np.intp)
+    for j, (var, column) in enumerate(zip(columns, zip(*rows))):
+        lookup = {value: index for index, value in enumerate(var.domain())}
+        try:
+            codes[:, j] = np.fromiter(map(lookup.__getitem__, column), dtype=np.intp, count=len(rows))
+        except KeyError as e:
+            raise ValueError("Value {} of column {} is not in its domain {}".format(e, var.name, var.domain()))
+    return codes
+
+
+def count_naive_bayes(columns, codes):
+    '''
+    Compute the sufficient statistics of a Naive Bayes model.
+
+    All conditional count tables are computed with a single np.bincount
+    over combined (attribute, attribute value, class value) codes.
+
+    :param columns: the list of Variables, one per column; the last one
+                    is the class variable.
+    :param codes: an N x len(columns) integer array from encode_columns.
+    :return: (class_counts, attribute_counts) where class_counts has one
+             entry per class value and attribute_counts[j] is the
+             |dom(columns[j])| x |dom(class)| count table of attribute j.
+    '''
+    class_size = columns[-1].domain_size()
+    class_codes = codes[:, -1]
+    class_counts = np.bincount(class_codes, minlength=class_size)
+
+    sizes = [var.domain_size() * class_size for var in columns[:-1]]
+    offsets = np.concatenate(([0], np.cumsum(sizes)))
+    combined = (offsets[:-1] + codes[:, :-1] * class_size + class_codes[:, None]).ravel()
+    counts = np.bincount(combined, minlength=offsets[-1])
+    attribute_counts = [counts[offsets[j]:offsets[j + 1]].reshape(var.domain_size(), class_size)
+                        for j, var in enumerate(columns[:-1])]
+    return class_counts, attribute_counts
+
+
+class NaiveBayesNet(BN):
+    '''
+    A Naive Bayes BN that keeps the raw counts its CPTs were estimated from.
+
+    Because the sufficient statistics of a Naive Bayes model are counts,
+    new labelled rows can be folded in with update and old rows taken
+    out with remove. Both refresh the CPTs in place without retraining.
+    To change a model that is being served, update a copy() and swap the
+    reference, so readers never see a half-refreshed model.
+    '''
+
+    def __init__(self, name, variables, columns, class_counts, attribute_counts):
+        '''
+        Build a Naive Bayes BN from the counts returned by count_naive_bayes.
+
+        :param name: the name of the BN.
+        :param variables: all Variables of the BN.
+        :param columns: the Variables counted, with the class variable last.
+        :param class_counts: the count of each class value.
+        :param attribute_counts: one |dom(X)| x |dom(class)| table per attribute.
+        The BN has the factor P(class) followed by one P(X|class) factor
+        per attribute.
+        '''
+        self.columns = list(columns)
+        self.class_counts = np.array(class_counts, dtype=np.int64)
+        self.attribute_counts = [np.array(counts, dtype=np.int64) for counts in attribute_counts]
+
+        class_variable = self.columns[-1]
+        factors = [Factor("P({})".format(class_variable.name), [class_variable])]
+        for attribute in self.columns[:-1]:
+            factors.append(Factor(f"P({attribute.name}|{class_variable.name})", [attribute, class_variable]))
+        BN.__init__(self, name, variables, factors)
+        self.refresh()
+
+    def refresh(self):
+        '''
+        Recompute the CPTs in place from the current counts.
+        '''
+        class_counts = self.class_counts
+        factors = self.factors()
 
         # Factor for Salary (Prior Probability)
-        salary_counts = {value: 0 for value in variables['Salary'].domain()}
-        for row in input_data:
-            salary_value = row[-1]  # Assuming Salary is the last column
-            salary_counts[salary_value] += 1
-        total_count = len(input_data)
-        salary_factor = Factor("P(Salary)", [variables['Salary']])
-        factor_values = []
-        for salary_value in variables['Salary'].domain():
-            probability = salary_counts[salary_value] / total_count
-            factor_values.append([salary_value, probability])
-        salary_factor.add_values(factor_values)
-        factors.append(salary_factor)
+        total_count = class_counts.sum()
+        factors[0].set_table(class_counts / total_count if total_count > 0 else np.zeros(class_counts.shape))
 
         # Factors for other attributes, conditioning on Salary
-        for attribute in headers[:-1]:  # Exclude 'Salary'
-            attribute_counts = {}
-            for salary_value in variables['Salary'].domain():
-                attribute_counts[salary_value] = {attr_value: 0 for attr_value in variables[attribute].domain()}
-
-            for row in input_data:
-                salary_value = row[-1]
-                attribute_value = row[headers.index(attribute)]
-                attribute_counts[salary_value][attribute_value] += 1
-
-            attribute_factor = Factor(f"P({attribute}|Salary)", [variables[attribute], variables['Salary']])
-            factor_values = []
-            for attribute_value in variables[attribute].domain():
-                for salary_value in variables['Salary'].domain():
-                    count = attribute_counts[salary_value][attribute_value]
-                    salary_total = salary_counts[salary_value]
-                    if salary_total > 0:
-                        probability = count / salary_total
-                    else:
-                        probability = 0.0  # Handle division by zero
-                    factor_values.append([attribute_value, salary_value, probability])
-            attribute_factor.add_values(factor_values)
-            factors.append(attribute_factor)
-
-        ### Create the Bayesian Network
-        bayes_net = BN("NaiveBayesAdultDataset", list(variables.values()), factors)
-
-        return bayes_net
-
-
-def explore(bayes_net, question):
+        for attribute_factor, counts in zip(factors[1:], self.attribute_counts):
+            # Classes that never occur get probability 0.0 (avoid division by zero)
+            attribute_factor.set_table(np.divide(counts, class_counts, out=np.zeros(counts.shape), where=class_counts > 0))
+
+        # The CPT values changed under the same factor objects
+        self._naive_bayes_posterior = None
+
+    def update(self, rows):
+        '''
+        Add labelled rows to the counts and refresh the CPTs.
+
+        :param rows: a list of rows, each a list of values ordered like
+                     self.columns (class value last).
+        '''
+        self._add_counts(*count_naive_bayes(self.columns, encode_columns(self.columns, rows)))
+
+    def remove(self, rows):
+        '''
+        Subtract previously added rows from the counts and refresh the CPTs.
+        Raises ValueError, leaving the model unchanged, if a count would
+        become negative.
+
+        :param rows: a list of rows, each a list of values ordered like
+                     self.columns (class value last).
+        '''
+        class_counts, attribute_counts = count_naive_bayes(self.columns, encode_columns(self.columns, rows))
+        self._add_counts(-class_counts, [-counts for counts in attribute_counts])
+
+    def update_csv(self, data_file, chunk_size=CHUNK_SIZE):
+        '''
+        Add the rows of a delta CSV file (with the same header as the
+        training file) to the counts, streaming it in chunks.
+
+        :param data_file: the CSV file to add.
+        :param chunk_size: the number of rows to count at a time.
+        '''
+        variables = {var.name: var for var in self.columns}
+        columns, class_counts, attribute_counts = count_naive_bayes_csv(data_file, variables, chunk_size)
+        if columns[-1] is not self.columns[-1] or set(columns) != set(self.columns):
+            raise ValueError("{} does not have the columns {}".format(data_file, [var.name for var in self.columns]))
+        by_variable = dict(zip(columns[:-1], attribute_counts))
+        self._add_counts(class_counts, [by_variable[var] for var in self.columns[:-1]])
+
+    def _add_counts(self, class_counts, attribute_counts):
+        new_class_counts = self.class_counts + class_counts
+        new_attribute_counts = [counts + delta for counts, delta in zip(self.attribute_counts, attribute_counts)]
+        if (new_class_counts < 0).any() or any((counts < 0).any() for counts in new_attribute_counts):
+            raise ValueError("Cannot remove rows that are not part of the model's counts")
+        self.class_counts = new_class_counts
+        self.attribute_counts = new_attribute_counts
+        self.refresh()
+
+    def copy(self):
+        '''
+        Return an independent NaiveBayesNet with the same variables and
+        counts, e.g. to update a model while the original keeps serving.
+        '''
+        return NaiveBayesNet(self.name, self.variables(), self.columns, self.class_counts, self.attribute_counts)
+
+
+def explore(bayes_net, question, test_file='data/adult-test.csv'):
     '''
     Input: bayes_net --- a BN object (a Bayesian Network)
            question --- an integer indicating the question to be calculated. Options are:
@@ -399,126 +651,160 @@ def explore(bayes_net, question):
                4. What percentage of the men in the data set with P(S=">=$50K"|E1) > 0.5 actually have a salary over $50K?
                5. What percentage of the women in the data set are assigned a P(Salary=">=$50K"|E1) > 0.5, overall?
                6. What percentage of the men in the data set are assigned a P(Salary=">=$50K"|E1) > 0.5, overall?
+           test_file --- the CSV file with the test data
            @return a percentage (between 0 and 100)
+
+    Only the rows of the asked gender are scored, and P(S|E2) only for
+    questions 1 and 2. To answer all six questions use explore_all, which
+    shares one pass over the test set between them.
     '''
-    # Load the test dataset (adult-test.csv)
-    input_data = []
-    with open('data/adult-test.csv', newline='') as csvfile:
-        reader = csv.reader(csvfile)
-        headers = next(reader, None)  # Skip the header row
-        for row in reader:
-            input_data.append(row)
+    if question not in range(1, 7):
+        return 0
+    headers, input_data = read_rows(test_file)
+    gender_index = headers.index('Gender')
+    gender = 'Female' if question % 2 == 1 else 'Male'
+    rows = [row for row in input_data if row[gender_index] == gender]
+
+    prob_GE50K_E1, prob_GE50K_E2, earns_GE50K = explore_probabilities(bayes_net, headers, rows, question in (1, 2))
+    predicted_GE50K = prob_GE50K_E1 > 0.5
+    if question in (1, 2):
+        # Q1/Q2: P(Salary >= $50K | E1) > P(Salary >= $50K | E2)
+        return _percentage(np.sum(prob_GE50K_E1 > prob_GE50K_E2), len(rows))
+    if question in (3, 4):
+        # Q3/Q4: P(Salary >= $50K | E1) > 0.5 and actually earn >= $50K
+        return _percentage(np.sum(predicted_GE50K & earns_GE50K), np.sum(predicted_GE50K))
+    # Q5/Q6: assigned P(Salary >= $50K | E1) > 0.5
+    return _percentage(np.sum(predicted_GE50K), len(rows))
+
+
+def _percentage(count, total):
+    # Avoid division by zero
+    return 0 if total == 0 else (int(count) / int(total)) * 100
+
+
+def explore_all(bayes_net, test_file='data/adult-test.csv', workers=None):
+    '''
+    Answer all six explore questions with a single batched pass over the
+    test set. Naive Bayes models are scored in one batch (see
+    batch_posterior); any other BN with one infer call per row.
+
+    With workers > 1 the rows are split into that many shards and
+    counted in a process pool. The model is sent to each worker once, by
+    the pool initializer, and the per-shard counts are summed, so the
+    percentages are identical to the serial ones.
+
+    :param bayes_net: a BN object (a model of the Adult Dataset).
+    :param test_file: the CSV file with the test data.
+    :param workers: the number of worker processes; None or 1 counts in
+                    this process.
+    :return: a dict mapping each question number (1-6) to its percentage.
+    '''
+    # Load the test dataset (adult-test.csv, or its Parquet twin)
+    headers, input_data = read_rows(test_file)
+
+    if workers is None or workers <= 1 or not input_data:
+        counts = explore_counts(bayes_net, headers, input_data)
+    else:
+        shard_size = -(-len(input_data) // workers)
+        shards = [input_data[i:i + shard_size] for i in range(0, len(input_data), shard_size)]
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_explore_worker, initargs=(bayes_net,)) as pool:
+            counts = sum(pool.map(_explore_shard, itertools.repeat(headers), shards), np.zeros((2, 4), np.int64))
+
+    (women, women_E1_greater, women_predicted, women_predicted_GE50K), \
+        (men, men_E1_greater, men_predicted, men_predicted_GE50K) = counts
+    return {
+        # Q1/Q2: P(Salary >= $50K | E1) > P(Salary >= $50K | E2)
+        1: _percentage(women_E1_greater, women),
+        2: _percentage(men_E1_greater, men),
+        # Q3/Q4: P(Salary >= $50K | E1) > 0.5 and actually earn >= $50K
+        3: _percentage(women_predicted_GE50K, women_predicted),
+        4: _percentage(men_predicted_GE50K, men_predicted),
+        # Q5/Q6: assigned P(Salary >= $50K | E1) > 0.5
+        5: _percentage(women_predicted, women),
+        6: _percentage(men_predicted, men),
+    }
+
+
+def explore_counts(bayes_net, headers, rows):
+    '''
+    Count the rows of the Adult test set that the explore questions are
+    percentages of. Counts over disjoint sets of rows add up.
+
+    :param bayes_net: a BN object (a model of the Adult Dataset).
+    :param headers: the CSV header row.
+    :param rows: a list of CSV rows.
+    :return: a 2 x 4 integer ndarray, one row for women and one for men,
+             holding the number of rows, of rows with P(Salary >= $50K | E1)
+             > P(Salary >= $50K | E2), of rows with P(Salary >= $50K | E1)
+             > 0.5, and of those that actually earn >= $50K.
+    '''
+    prob_GE50K_E1, prob_GE50K_E2, earns_GE50K = explore_probabilities(bayes_net, headers, rows)
+    gender_index = headers.index('Gender')
+    gender = np.array([row[gender_index] for row in rows])
+    E1_greater = prob_GE50K_E1 > prob_GE50K_E2
+    predicted_GE50K = prob_GE50K_E1 > 0.5
 
+    return np.array([[np.sum(group), np.sum(group & E1_greater), np.sum(group & predicted_GE50K),
+                      np.sum(group & predicted_GE50K & earns_GE50K)]
+                     for group in (gender == 'Female', gender == 'Male')], dtype=np.int64)
+
+
+def explore_probabilities(bayes_net, headers, rows, with_E2=True):
+    '''
+    Score rows of the Adult test set for the explore questions.
+
+    :param bayes_net: a BN object (a model of the Adult Dataset).
+    :param headers: the CSV header row.
+    :param rows: a list of CSV rows.
+    :param with_E2: if False, P(Salary >= $50K | E2) is not computed.
+    :return: a (P(Salary >= $50K | E1), P(Salary >= $50K | E2) or None,
+             actually earns >= $50K) tuple of length-N arrays, where E1 is
+             the row's Work, Occupation, Education and Relationship, and
+             E2 is E1 plus its Gender.
+    '''
     # Map header names to indices for easy access
     header_indices = {header: index for index, header in enumerate(headers)}
 
     # Define core evidence set E1 (Work, Occupation, Education, Relationship Status)
+    # E2 extends E1 with Gender, which is stored as the last column.
     core_evidence_vars = ['Work', 'Occupation', 'Education', 'Relationship']
     extended_evidence_vars = core_evidence_vars + ['Gender']
 
     # Create a variable dictionary for quick access
     variables = {var.name: var for var in bayes_net.variables()}
+    salary_var = variables['Salary']
+    index_GE50K = salary_var.domain().index('>=50K')
+
+    # Encode the evidence of every row once
+    evidence_vars_E2 = [variables[var_name] for var_name in extended_evidence_vars]
+    columns = [header_indices[var_name] for var_name in extended_evidence_vars]
+    codes = encode_evidence(evidence_vars_E2, ([row[i] for i in columns] for row in rows))
+
+    # Compute P(Salary >= $50K | E1) and P(Salary >= $50K | E2) for every row
+    prob_GE50K_E1 = batch_posterior(bayes_net, salary_var, evidence_vars_E2[:-1], codes[:, :-1])[:, index_GE50K]
+    prob_GE50K_E2 = None
+    if with_E2:
+        prob_GE50K_E2 = batch_posterior(bayes_net, salary_var, evidence_vars_E2, codes)[:, index_GE50K]
+
+    earns_GE50K = np.array([row[header_indices['Salary']] == '>=50K' for row in rows], dtype=bool)
+    return prob_GE50K_E1, prob_GE50K_E2, earns_GE50K
+
+
+# The model of an explore_all worker process, set once by its initializer
+_explore_model = None
+
+
+def _init_explore_worker(bayes_net):
+    global _explore_model
+    _explore_model = bayes_net
 
-    # Initialize counts
-    count = 0
-    total = 0
-
-    # Lists to store results for questions 3 and 4
-    women_predicted_over_50k = []
-    men_predicted_over_50k = []
-
-    for row in input_data:
-        # Extract data for the current individual
-        data_point = {header: row[header_indices[header]] for header in headers}
-        gender = data_point['Gender']
-        salary = data_point['Salary']
-
-        # Reset evidence for all variables before setting new evidence
-        for var in variables.values():
-            var.evidence_index = None  # Unset evidence
-
-        # Set up evidence for E1
-        for var_name in core_evidence_vars:
-            var_value = data_point[var_name]
-            variables[var_name].set_evidence(var_value)
-
-        # Query variable
-        salary_var = variables['Salary']
-        salary_var.evidence_index = None  # Ensure no evidence is set on the query variable
-
-        # Evidence variables for E1
-        evidence_vars_E1 = [variables[var_name] for var_name in core_evidence_vars]
-
-        # Compute P(Salary >= $50K | E1)
-        factor_E1 = ve(bayes_net, salary_var, evidence_vars_E1)
-        index_GE50K = salary_var.domain().index('>=50K')
-        prob_GE50K_E1 = factor_E1.values[index_GE50K]
-
-        # Set up evidence for E2
-        for var_name in extended_evidence_vars:
-            var_value = data_point[var_name]
-            variables[var_name].set_evidence(var_value)
-
-        # Evidence variables for E2
-        evidence_vars_E2 = [variables[var_name] for var_name in extended_evidence_vars]
-
-        # Compute P(Salary >= $50K | E2)
-        factor_E2 = ve(bayes_net, salary_var, evidence_vars_E2)
-        prob_GE50K_E2 = factor_E2.values[index_GE50K]
-
-        # Reset evidence for all variables before next iteration
-        for var in variables.values():
-            var.evidence_index = None  # Unset evidence
-
-        # Process based on the question
-        if question == 1 and gender == 'Female':
-            # Q1: Women where P(Salary >= $50K | E1) > P(Salary >= $50K | E2)
-            if prob_GE50K_E1 > prob_GE50K_E2:
-                count += 1
-            total += 1
-
-        elif question == 2 and gender == 'Male':
-            # Q2: Men where P(Salary >= $50K | E1) > P(Salary >= $50K | E2)
-            if prob_GE50K_E1 > prob_GE50K_E2:
-                count += 1
-            total += 1
-
-        elif question == 3 and gender == 'Female':
-            # Q3: Women with P(Salary >= $50K | E1) > 0.5 who actually earn >= $50K
-            if prob_GE50K_E1 > 0.5:
-                total += 1
-                if salary == '>=50K':
-                    count += 1
-
-        elif question == 4 and gender == 'Male':
-            # Q4: Men with P(Salary >= $50K | E1) > 0.5 who actually earn >= $50K
-            if prob_GE50K_E1 > 0.5:
-                total += 1
-                if salary == '>=50K':
-                    count += 1
-
-        elif question == 5 and gender == 'Female':
-            # Q5: Percentage of women assigned P(Salary >= $50K | E1) > 0.5
-            if prob_GE50K_E1 > 0.5:
-                count += 1
-            total += 1
-
-        elif question == 6 and gender == 'Male':
-            # Q6: Percentage of men assigned P(Salary >= $50K | E1) > 0.5
-            if prob_GE50K_E1 > 0.5:
-                count += 1
-            total += 1
-
-    # Calculate the percentage
-    if total == 0:
-        percentage = 0  # Avoid division by zero
-    else:
-        percentage = (count / total) * 100
 
-    return percentage
+def _explore_shard(headers, rows):
+    return explore_counts(_explore_model, headers, rows)
 
 
 if __name__ == '__main__':
     nb = naive_bayes_model('data/adult-train.csv')
+    results = explore_all(nb)
     for i in range(1,7):
-        print("explore(nb,{}) = {}".format(i, explore(nb, i)))
\ No newline at end of file
+        print("explore(nb,{}) = {}".format(i, results[i]))
\ No newline at end of file
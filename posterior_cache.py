@@ -0,0 +1,104 @@
+'''
+A bounded, thread-safe LRU cache for prediction results.
+
+The Stack Overflow model has a finite input space and most traffic asks
+about the same few hundred profiles, so the Flask apps keep the result of
+each recent /api/predict call and answer repeats without running
+inference or computing the data insights again.
+
+Keys are built by cache_key from the model version and the profile's
+values in a fixed column order, so two requests that list the same
+fields in a different order share an entry, and entries computed for an
+older model are never returned after an update. The apps also clear the
+cache whenever they reload or update the model.
+'''
+
+import threading
+from collections import OrderedDict
+
+# Number of results kept by default
+DEFAULT_MAXSIZE = 4096
+
+
+def cache_key(model_version, profile, columns):
+    '''
+    Return the canonical cache key for profile.
+
+    :param model_version: an integer identifying the model the result
+                          was computed with.
+    :param profile: a dict mapping column names to values.
+    :param columns: the column names, in a fixed order. Fields of profile
+                    that are not columns do not affect the key.
+    '''
+    return (model_version, tuple(profile.get(column) for column in columns))
+
+
+class PosteriorCache:
+    '''
+    A least-recently-used mapping from cache keys to results, holding at
+    most maxsize entries. Cached values are shared between requests and
+    must not be modified.
+    '''
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        '''
+        :param maxsize: the maximum number of entries; 0 disables caching.
+        '''
+        if maxsize < 0:
+            raise ValueError("maxsize must be non-negative, got {}".format(maxsize))
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        '''
+        Return the value cached for key, or None if there is none.
+        A hit makes key the most recently used entry.
+        '''
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        '''
+        Cache value for key, evicting the least recently used entries
+        if the cache is full.
+        '''
+        if self.maxsize == 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        '''
+        Drop every entry. The counters are kept.
+        '''
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        '''
+        Return the cache size and its hit, miss and eviction counters.
+        '''
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
@@ -0,0 +1,133 @@
+'''
+Precomputed posteriors for every complete profile of a Naive Bayes model.
+
+The Stack Overflow model has 7*5*3*2*6*7*7*11 = 679,140 complete
+profiles and 5 salary classes, so the posterior of every profile fits
+in a 27 MB table. build_posterior_table enumerates the profiles in
+vectorized batches and writes
+
+    <path>       -- a .npy array with one row per profile, indexed by the
+                    mixed-radix code of the profile (the first evidence
+                    variable is the most significant digit)
+    <path>.json  -- the query and evidence variables with their domains,
+                    and the fingerprint of the model the table was built from
+
+PosteriorTable memory-maps the array, so a complete profile is answered
+with a single row read. Build the Stack Overflow table offline with
+
+    python posterior_table.py
+'''
+
+import json
+import os
+
+import numpy as np
+
+from model_store import model_fingerprint
+from naive_bayes_solution import batch_posterior
+
+# Bump when the layout of the table or its metadata changes
+TABLE_VERSION = 1
+
+# Number of profiles scored per batch while building
+BATCH_SIZE = 65536
+
+
+def build_posterior_table(path, bayes_net, var_query, batch_size=BATCH_SIZE):
+    '''
+    Compute P(var_query | profile) for every complete assignment to the
+    other variables of bayes_net and write the table to path.
+
+    :param path: the .npy file to write; the metadata goes to path + '.json'.
+    :param bayes_net: a BN object (see batch_posterior).
+    :param var_query: the class variable.
+    :param batch_size: number of profiles scored per vectorized batch.
+    :return: the number of profiles written.
+    '''
+    evidence_vars = [var for var in bayes_net.variables() if var is not var_query]
+    shape = tuple(var.domain_size() for var in evidence_vars)
+    profile_count = int(np.prod(shape, dtype=np.int64))
+
+    tmp_path = path + ".tmp"
+    table = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float64,
+                                      shape=(profile_count, var_query.domain_size()))
+    for start in range(0, profile_count, batch_size):
+        stop = min(start + batch_size, profile_count)
+        codes = np.stack(np.unravel_index(np.arange(start, stop), shape), axis=1)
+        table[start:stop] = batch_posterior(bayes_net, var_query, evidence_vars, codes)
+    table.flush()
+    del table
+    os.replace(tmp_path, path)
+
+    metadata = {
+        "version": TABLE_VERSION,
+        "query": [var_query.name, var_query.domain()],
+        "evidence": [[var.name, var.domain()] for var in evidence_vars],
+        "model_fingerprint": model_fingerprint(bayes_net),
+    }
+    with open(path + ".json", 'w') as f:
+        json.dump(metadata, f)
+    return profile_count
+
+
+class PosteriorTable:
+    '''
+    A memory-mapped table of posteriors built by build_posterior_table.
+    '''
+
+    def __init__(self, path, bayes_net=None):
+        '''
+        Open the table at path.
+
+        :param path: the .npy file written by build_posterior_table.
+        :param bayes_net: if given, the table must have been built from a
+                          BN with the same model_fingerprint.
+        Raises ValueError if the table has an unknown version or was built
+        from a different model.
+        '''
+        with open(path + ".json") as f:
+            metadata = json.load(f)
+        if metadata.get("version") != TABLE_VERSION:
+            raise ValueError("{} has table version {}, expected {}".format(path, metadata.get("version"), TABLE_VERSION))
+        if bayes_net is not None and metadata["model_fingerprint"] != model_fingerprint(bayes_net):
+            raise ValueError("{} was not built from the current model".format(path))
+
+        self.query, self.query_domain = metadata["query"]
+        self.columns = [name for name, _ in metadata["evidence"]]
+        self.sizes = [len(domain) for _, domain in metadata["evidence"]]
+        self._lookups = [{value: code for code, value in enumerate(domain)} for _, domain in metadata["evidence"]]
+        self.table = np.load(path, mmap_mode='r')
+        if self.table.shape != (int(np.prod(self.sizes, dtype=np.int64)), len(self.query_domain)):
+            raise ValueError("{} has shape {}, which does not match its metadata".format(path, self.table.shape))
+
+    def lookup(self, profile):
+        '''
+        Return the posterior over the query variable for profile, or None
+        if the table cannot answer it: a field is missing or has a value
+        outside its domain, or the query variable itself is given.
+
+        :param profile: a dict mapping variable names to values.
+        :return: an ndarray with one probability per query value, or None.
+        '''
+        if self.query in profile:
+            return None
+        key = 0
+        for column, size, lookup in zip(self.columns, self.sizes, self._lookups):
+            code = lookup.get(profile.get(column))
+            if code is None:
+                return None
+            key = key * size + code
+        return self.table[key]
+
+
+if __name__ == '__main__':
+    # Build the Stack Overflow table app.py answers complete profiles from
+    import time
+    from app import load_model
+    from model_service import POSTERIOR_TABLE
+
+    model = load_model()
+    salary_var = {var.name: var for var in model.variables()}['Salary']
+    start = time.time()
+    count = build_posterior_table(POSTERIOR_TABLE, model, salary_var)
+    print("Wrote posteriors for {:,} profiles to {} in {:.2f}s".format(count, POSTERIOR_TABLE, time.time() - start))
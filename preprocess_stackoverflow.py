@@ -2,6 +2,13 @@
 """
 Stack Overflow 2023 Developer Survey Data Preprocessing Script
 Converts raw survey data into clean format for ML model training
+
+The raw export is read in chunks of CHUNK_SIZE rows, keeping only the
+SURVEY_COLUMNS the model uses, with the answers as categoricals. Each
+chunk is cleaned down to the training features before the next is read,
+so several survey years can be combined with bounded memory:
+
+    python preprocess_stackoverflow.py data/survey_results_public.csv data/survey_results_2022.csv
 """
 
 import pandas as pd
@@ -9,13 +16,53 @@ import numpy as np
 import sys
 from typing import Dict, List, Tuple
 
-def clean_salary_data(df: pd.DataFrame) -> pd.DataFrame:
+from data_store import write_parquet
+
+RAW_SURVEY = 'data/survey_results_public.csv'
+
+# The raw survey columns the training features are derived from
+SURVEY_COLUMNS = ['ConvertedCompYearly', 'Age', 'EdLevel', 'Employment', 'RemoteWork',
+                  'YearsCode', 'DevType', 'OrgSize', 'Country']
+SURVEY_DTYPES = {column: 'category' for column in SURVEY_COLUMNS if column != 'ConvertedCompYearly'}
+
+# Number of raw survey rows held in memory at once
+CHUNK_SIZE = 20000
+
+# Cleaned feature columns, with the target last
+FEATURES = [
+    'Age_Clean', 'Education_Clean', 'Employment_Clean', 'RemoteWork_Clean',
+    'YearsCode_Clean', 'DevType_Clean', 'OrgSize_Clean', 'Country_Clean', 'SalaryBracket'
+]
+
+# Salary brackets: [lower bound, next bound) in USD
+SALARY_BINS = [-np.inf, 50000, 75000, 100000, 150000, np.inf]
+SALARY_BRACKETS = ["<50K", "50K-75K", "75K-100K", "100K-150K", "150K+"]
+
+def first_match(column: pd.Series, rules: List[Tuple[str, List[str]]], default: str, missing: str = 'Unknown') -> pd.Series:
+    """Label each cell with the first rule that has a substring of its lower-cased text
+
+    The rules are checked once per distinct value rather than once per row:
+    the column is factorized, the str.contains masks are computed over its
+    unique values and the labels are taken back by code. Missing cells get
+    the missing label, cells no rule matches the default.
+    """
+    codes, uniques = pd.factorize(column)
+    lower = pd.Series(uniques, dtype=object).astype(str).str.lower()
+    masks = [np.logical_or.reduce([lower.str.contains(needle, regex=False).to_numpy() for needle in needles])
+             for _, needles in rules]
+    labels = np.select(masks, [label for label, _ in rules], default) if len(uniques) else np.array([], dtype=object)
+    # Code -1 (missing) picks the label appended last
+    return pd.Series(np.append(labels.astype(object), missing)[codes], index=column.index)
+
+def clean_salary_data(df: pd.DataFrame, verbose: bool = True) -> pd.DataFrame:
     """Clean and categorize salary data"""
-    print("Cleaning salary data...")
+    if verbose:
+        print("Cleaning salary data...")
     
     # Filter for responses with salary data
     df_salary = df[df['ConvertedCompYearly'].notna()].copy()
-    print(f"Records with salary data: {len(df_salary)}")
+    if verbose:
+        print(f"Records with salary data: {len(df_salary)}")
     
     # Convert to numeric and filter realistic salaries (10k-500k USD)
     df_salary['ConvertedCompYearly'] = pd.to_numeric(df_salary['ConvertedCompYearly'], errors='coerce')
@@ -23,27 +70,18 @@ def clean_salary_data(df: pd.DataFrame) -> pd.DataFrame:
         (df_salary['ConvertedCompYearly'] >= 10000) & 
         (df_salary['ConvertedCompYearly'] <= 500000)
     ].copy()
-    print(f"Records with realistic salaries: {len(df_salary)}")
+    if verbose:
+        print(f"Records with realistic salaries: {len(df_salary)}")
     
     # Create salary brackets
-    def categorize_salary(salary):
-        if salary < 50000:
-            return "<50K"
-        elif salary < 75000:
-            return "50K-75K"
-        elif salary < 100000:
-            return "75K-100K"
-        elif salary < 150000:
-            return "100K-150K"
-        else:
-            return "150K+"
-    
-    df_salary['SalaryBracket'] = df_salary['ConvertedCompYearly'].apply(categorize_salary)
+    brackets = pd.cut(df_salary['ConvertedCompYearly'], SALARY_BINS, right=False, labels=False)
+    df_salary['SalaryBracket'] = np.array(SALARY_BRACKETS, dtype=object)[brackets.to_numpy(dtype=np.intp)]
     return df_salary
 
-def clean_categorical_features(df: pd.DataFrame) -> pd.DataFrame:
+def clean_categorical_features(df: pd.DataFrame, verbose: bool = True) -> pd.DataFrame:
     """Clean and standardize categorical features"""
-    print("Cleaning categorical features...")
+    if verbose:
+        print("Cleaning categorical features...")
     
     # Age mapping
     age_mapping = {
@@ -56,7 +94,9 @@ def clean_categorical_features(df: pd.DataFrame) -> pd.DataFrame:
         '65 years or older': '65+',
         'Prefer not to say': 'Unknown'
     }
-    df['Age_Clean'] = df['Age'].map(age_mapping).fillna('Unknown')
+    # The answers may be categoricals (see SURVEY_DTYPES); map them as plain
+    # values so the fill value does not have to be one of their categories
+    df['Age_Clean'] = df['Age'].astype(object).map(age_mapping).fillna('Unknown')
     
     # Education level mapping
     edu_mapping = {
@@ -69,120 +109,66 @@ def clean_categorical_features(df: pd.DataFrame) -> pd.DataFrame:
         'Professional degree (JD, MD, Ph.D, Ed.D, etc.)': 'Professional/PhD',
         'Something else': 'Other'
     }
-    df['Education_Clean'] = df['EdLevel'].map(edu_mapping).fillna('Other')
+    df['Education_Clean'] = df['EdLevel'].astype(object).map(edu_mapping).fillna('Other')
     
     # Employment type
-    def clean_employment(emp_str):
-        if pd.isna(emp_str):
-            return 'Unknown'
-        if 'full-time' in str(emp_str).lower():
-            return 'Full-time'
-        elif 'part-time' in str(emp_str).lower():
-            return 'Part-time'
-        elif 'contractor' in str(emp_str).lower() or 'freelance' in str(emp_str).lower():
-            return 'Contractor/Freelance'
-        elif 'student' in str(emp_str).lower():
-            return 'Student'
-        else:
-            return 'Other'
-    
-    df['Employment_Clean'] = df['Employment'].apply(clean_employment)
+    employment_rules = [
+        ('Full-time', ['full-time']),
+        ('Part-time', ['part-time']),
+        ('Contractor/Freelance', ['contractor', 'freelance']),
+        ('Student', ['student']),
+    ]
+    df['Employment_Clean'] = first_match(df['Employment'], employment_rules, 'Other')
     
     # Remote work
-    def clean_remote(remote_str):
-        if pd.isna(remote_str):
-            return 'Unknown'
-        remote_lower = str(remote_str).lower()
-        if 'fully remote' in remote_lower:
-            return 'Fully Remote'
-        elif 'hybrid' in remote_lower:
-            return 'Hybrid'
-        else:
-            return 'In-person'
-    
-    df['RemoteWork_Clean'] = df['RemoteWork'].apply(clean_remote)
+    remote_rules = [
+        ('Fully Remote', ['fully remote']),
+        ('Hybrid', ['hybrid']),
+    ]
+    df['RemoteWork_Clean'] = first_match(df['RemoteWork'], remote_rules, 'In-person')
     
     # Years of experience
-    def clean_years_code(years_str):
-        if pd.isna(years_str):
-            return 'Unknown'
-        years_str = str(years_str).lower()
-        if 'less than 1 year' in years_str or years_str == '0':
-            return '<1 year'
-        elif years_str in ['1', '2']:
-            return '1-2 years'
-        elif years_str in ['3', '4', '5']:
-            return '3-5 years'
-        elif years_str in ['6', '7', '8', '9', '10']:
-            return '6-10 years'
-        elif years_str in ['11', '12', '13', '14', '15']:
-            return '11-15 years'
-        else:
-            return '15+ years'
-    
-    df['YearsCode_Clean'] = df['YearsCode'].apply(clean_years_code)
+    years_mapping = {'0': '<1 year'}
+    years_mapping.update({str(years): '1-2 years' for years in range(1, 3)})
+    years_mapping.update({str(years): '3-5 years' for years in range(3, 6)})
+    years_mapping.update({str(years): '6-10 years' for years in range(6, 11)})
+    years_mapping.update({str(years): '11-15 years' for years in range(11, 16)})
+    codes, uniques = pd.factorize(df['YearsCode'])
+    years_lower = pd.Series(uniques, dtype=object).astype(str).str.lower()
+    years_labels = years_lower.map(years_mapping).fillna('15+ years')
+    years_labels[years_lower.str.contains('less than 1 year', regex=False)] = '<1 year'
+    df['YearsCode_Clean'] = np.append(years_labels.to_numpy(dtype=object), 'Unknown')[codes]
     
     # Developer type (simplified)
-    def clean_dev_type(dev_type_str):
-        if pd.isna(dev_type_str):
-            return 'Unknown'
-        
-        dev_type_lower = str(dev_type_str).lower()
-        if 'full-stack' in dev_type_lower:
-            return 'Full-stack'
-        elif 'back-end' in dev_type_lower:
-            return 'Backend'
-        elif 'front-end' in dev_type_lower:
-            return 'Frontend'
-        elif 'mobile' in dev_type_lower:
-            return 'Mobile'
-        elif 'data scientist' in dev_type_lower or 'data' in dev_type_lower:
-            return 'Data Science'
-        elif 'devops' in dev_type_lower or 'sre' in dev_type_lower:
-            return 'DevOps/SRE'
-        else:
-            return 'Other'
-    
-    df['DevType_Clean'] = df['DevType'].apply(clean_dev_type)
+    dev_type_rules = [
+        ('Full-stack', ['full-stack']),
+        ('Backend', ['back-end']),
+        ('Frontend', ['front-end']),
+        ('Mobile', ['mobile']),
+        ('Data Science', ['data scientist', 'data']),
+        ('DevOps/SRE', ['devops', 'sre']),
+    ]
+    df['DevType_Clean'] = first_match(df['DevType'], dev_type_rules, 'Other')
     
     # Organization size
-    def clean_org_size(org_str):
-        if pd.isna(org_str):
-            return 'Unknown'
-        org_lower = str(org_str).lower()
-        if 'just me' in org_lower or '2 to 9' in org_lower:
-            return 'Small (1-9)'
-        elif '10 to 19' in org_lower:
-            return 'Medium (10-19)'
-        elif '20 to 99' in org_lower:
-            return 'Medium (20-99)'
-        elif '100 to 499' in org_lower:
-            return 'Large (100-499)'
-        elif '500 to 999' in org_lower:
-            return 'Large (500-999)'
-        elif '1,000 to 4,999' in org_lower:
-            return 'Enterprise (1K-5K)'
-        elif '5,000 to 9,999' in org_lower or '10,000 or more' in org_lower:
-            return 'Enterprise (5K+)'
-        else:
-            return 'Unknown'
-    
-    df['OrgSize_Clean'] = df['OrgSize'].apply(clean_org_size)
+    org_size_rules = [
+        ('Small (1-9)', ['just me', '2 to 9']),
+        ('Medium (10-19)', ['10 to 19']),
+        ('Medium (20-99)', ['20 to 99']),
+        ('Large (100-499)', ['100 to 499']),
+        ('Large (500-999)', ['500 to 999']),
+        ('Enterprise (1K-5K)', ['1,000 to 4,999']),
+        ('Enterprise (5K+)', ['5,000 to 9,999', '10,000 or more']),
+    ]
+    df['OrgSize_Clean'] = first_match(df['OrgSize'], org_size_rules, 'Unknown')
     
     # Country (top countries + others)
     top_countries = ['United States of America', 'Germany', 'United Kingdom of Great Britain and Northern Ireland', 
                     'India', 'Canada', 'France', 'Netherlands', 'Australia', 'Brazil', 'Poland']
-    
-    def clean_country(country_str):
-        if pd.isna(country_str):
-            return 'Other'
-        if country_str in top_countries:
-            return country_str.replace('United States of America', 'United States') \
-                             .replace('United Kingdom of Great Britain and Northern Ireland', 'United Kingdom')
-        else:
-            return 'Other'
-    
-    df['Country_Clean'] = df['Country'].apply(clean_country)
+    country_names = {country: country.replace('United States of America', 'United States')
+                                     .replace('United Kingdom of Great Britain and Northern Ireland', 'United Kingdom')
+                     for country in top_countries}
+    df['Country_Clean'] = df['Country'].astype(object).map(country_names).fillna('Other')
     
     return df
 
@@ -191,10 +177,7 @@ def create_training_data(df: pd.DataFrame) -> pd.DataFrame:
     print("Creating training dataset...")
     
     # Select features for ML model
-    features = [
-        'Age_Clean', 'Education_Clean', 'Employment_Clean', 'RemoteWork_Clean',
-        'YearsCode_Clean', 'DevType_Clean', 'OrgSize_Clean', 'Country_Clean', 'SalaryBracket'
-    ]
+    features = FEATURES
     
     # Create clean dataset
     ml_data = df[features].copy()
@@ -215,20 +198,32 @@ def create_training_data(df: pd.DataFrame) -> pd.DataFrame:
     
     return ml_data
 
-def main():
+def clean_survey(paths: List[str], chunk_size: int = CHUNK_SIZE) -> pd.DataFrame:
+    """Read raw survey exports in chunks and clean each chunk down to FEATURES"""
+    responses = with_salary = realistic = 0
+    cleaned = []
+    for path in paths:
+        print(f"Loading raw survey data from {path}...")
+        for chunk in pd.read_csv(path, usecols=SURVEY_COLUMNS, dtype=SURVEY_DTYPES, chunksize=chunk_size):
+            responses += len(chunk)
+            with_salary += int(chunk['ConvertedCompYearly'].notna().sum())
+            chunk = clean_salary_data(chunk, verbose=False)
+            realistic += len(chunk)
+            cleaned.append(clean_categorical_features(chunk, verbose=False)[FEATURES])
+    
+    print(f"Total survey responses: {responses}")
+    print(f"Records with salary data: {with_salary}")
+    print(f"Records with realistic salaries: {realistic}")
+    if not cleaned:
+        return pd.DataFrame(columns=FEATURES)
+    return pd.concat(cleaned, ignore_index=True)
+
+def main(paths: List[str] = None):
     """Main preprocessing pipeline"""
     print("=== Stack Overflow 2023 Survey Data Preprocessing ===")
     
-    # Load raw data
-    print("Loading raw survey data...")
-    df = pd.read_csv('data/survey_results_public.csv')
-    print(f"Total survey responses: {len(df)}")
-    
-    # Clean salary data
-    df_clean = clean_salary_data(df)
-    
-    # Clean categorical features
-    df_clean = clean_categorical_features(df_clean)
+    # Load and clean the raw data chunk by chunk
+    df_clean = clean_survey(paths or [RAW_SURVEY])
     
     # Create training data
     training_data = create_training_data(df_clean)
@@ -240,9 +235,10 @@ def main():
     train_data = training_data_shuffled[:train_size]
     test_data = training_data_shuffled[train_size:]
     
-    # Save processed data
-    train_data.to_csv('data/stackoverflow-train.csv', index=False)
-    test_data.to_csv('data/stackoverflow-test.csv', index=False)
+    # Save processed data, with Parquet twins when pyarrow is installed
+    for data, path in [(train_data, 'data/stackoverflow-train.csv'), (test_data, 'data/stackoverflow-test.csv')]:
+        data.to_csv(path, index=False)
+        write_parquet(data, path)
     
     print(f"\n=== Processing Complete ===")
     print(f"Training data: {len(train_data)} records -> data/stackoverflow-train.csv")
@@ -258,4 +254,4 @@ def main():
         print(train_data[col].value_counts().head())
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main(sys.argv[1:])
\ No newline at end of file
@@ -0,0 +1,91 @@
+import json
+
+import pytest
+
+import app as salary_app
+
+PROFILES = [
+    {"Age": '25-34', "Education": 'Some College', "Employment": 'Full-time', "RemoteWork": 'Hybrid',
+     "Experience": '3-5 years', "DevType": 'Backend', "CompanySize": 'Small (1-9)', "Country": 'Germany'},
+    {"Age": '45-54', "Education": 'Professional/PhD', "Employment": 'Contractor/Freelance', "RemoteWork": 'In-person',
+     "Experience": '15+ years', "DevType": 'Data Science', "CompanySize": 'Enterprise (5K+)', "Country": 'United States'},
+]
+
+# Bad rows, each with the error /api/predict gives for it
+INVALID = [
+    ({"Age": '25-34'}, "Missing required fields"),
+    (dict(PROFILES[0], Country='Atlantis'), "Invalid value 'Atlantis' for field 'Country'"),
+    ("not a profile", "Profile must be a JSON object"),
+]
+
+
+@pytest.fixture(scope="module")
+def client():
+    return salary_app.app.test_client()
+
+
+def single(client, profile):
+    response = client.post('/api/predict', json=profile)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def assert_matches_single(client, result, profile):
+    expected = single(client, profile)
+    assert result["prediction"] == expected["prediction"]
+    assert result["confidence"] == pytest.approx(expected["confidence"])
+    assert result["probabilities"].keys() == expected["probabilities"].keys()
+    for value, probability in expected["probabilities"].items():
+        assert result["probabilities"][value] == pytest.approx(probability)
+
+
+@pytest.mark.parametrize("wrap", [lambda profiles: profiles, lambda profiles: {"profiles": profiles}])
+def test_json_array(client, wrap):
+    response = client.post('/api/predict/batch', json=wrap(PROFILES))
+    assert response.status_code == 200
+    body = response.get_json()
+    assert (body["count"], body["error_count"]) == (2, 0)
+    for result, profile in zip(body["results"], PROFILES):
+        assert_matches_single(client, result, profile)
+
+
+def test_ndjson(client):
+    lines = [json.dumps(profile) for profile in PROFILES]
+    body = "\n".join([lines[0], "", lines[1]]) + "\n"
+    response = client.post('/api/predict/batch', data=body, content_type='application/x-ndjson')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    results = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert len(results) == 2
+    for result, profile in zip(results, PROFILES):
+        assert_matches_single(client, result, profile)
+
+
+def test_invalid_rows_are_reported_in_place(client):
+    rows = [PROFILES[0]] + [row for row, _ in INVALID] + [PROFILES[1]]
+    body = client.post('/api/predict/batch', json=rows).get_json()
+    assert (body["count"], body["error_count"]) == (5, 3)
+    assert_matches_single(client, body["results"][0], PROFILES[0])
+    assert_matches_single(client, body["results"][4], PROFILES[1])
+    for result, (row, error) in zip(body["results"][1:4], INVALID):
+        assert list(result) == ["error"] and error in result["error"]
+        if isinstance(row, dict):
+            assert error in client.post('/api/predict', json=row).get_json()["error"]
+
+
+def test_invalid_ndjson_line_is_reported_in_place(client):
+    body = json.dumps(PROFILES[0]) + "\n{not json\n"
+    response = client.post('/api/predict/batch', data=body, content_type='application/x-ndjson')
+    first, second = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert_matches_single(client, first, PROFILES[0])
+    assert second["error"].startswith("Invalid JSON")
+
+
+def test_empty_bodies(client):
+    body = client.post('/api/predict/batch', json=[]).get_json()
+    assert body == {"results": [], "count": 0, "error_count": 0}
+    response = client.post('/api/predict/batch', data="", content_type='application/x-ndjson')
+    assert response.status_code == 200 and response.get_data(as_text=True) == ""
+    response = client.post('/api/predict/batch', data="", content_type='application/json')
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "Expected a JSON array of profiles"}
@@ -0,0 +1,41 @@
+import pytest
+
+import app_multi_dataset
+
+PROFILE = {
+    "Age": '25-34', "Education": 'Some College', "Employment": 'Full-time', "RemoteWork": 'Hybrid',
+    "Experience": '3-5 years', "DevType": 'Backend', "CompanySize": 'Small (1-9)', "Country": 'Germany',
+}
+
+
+@pytest.fixture
+def reads(monkeypatch):
+    '''
+    Count the dataset reads of a fresh app, which start from scratch.
+    '''
+    paths = []
+    read_frame = app_multi_dataset.read_frame
+
+    def counting_read_frame(path):
+        paths.append(path)
+        return read_frame(path)
+
+    monkeypatch.setattr(app_multi_dataset, 'read_frame', counting_read_frame)
+    monkeypatch.setattr(app_multi_dataset, 'datasets_loaded', False)
+    app_multi_dataset.model_service.prediction_cache.clear()
+    return paths
+
+
+def test_datasets_are_read_once(reads, capsys):
+    client = app_multi_dataset.app.test_client()
+    first = client.post('/api/predict', json=PROFILE)
+    assert first.status_code == 200
+    count = len(reads)
+    assert count > 0
+
+    # The cached repeat and the data sources skip the datasets
+    assert client.post('/api/predict', json=PROFILE).get_json() == first.get_json()
+    assert client.get('/api/data-sources').status_code == 200
+    other = dict(PROFILE, Country='India')
+    assert client.post('/api/predict', json=other).status_code == 200
+    assert len(reads) == count
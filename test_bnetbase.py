@@ -0,0 +1,96 @@
+import copy
+import pickle
+
+import numpy as np
+import pytest
+
+from bnetbase import BN, Factor, SparseFactor, Variable
+
+
+@pytest.fixture
+def sparse():
+    a = Variable("A", ['a0', 'a1', 'a2'])
+    b = Variable("B", ['b0', 'b1'])
+    factor = SparseFactor("P(A|B)", [a, b])
+    factor.add_values([['a0', 'b0', 0.25], ['a2', 'b1', 0.75], ['a1', 'b0', 0.5]])
+    return factor
+
+
+def test_sparse_factor_per_cell_interface(sparse):
+    a, b = sparse.get_scope()
+    assert sparse.get_value(['a2', 'b1']) == 0.75
+    assert sparse.get_value(['a0', 'b1']) == 0.0
+    a.set_assignment('a1')
+    b.set_assignment('b0')
+    assert sparse.get_value_at_current_assignments() == 0.5
+
+    # Overwrite a stored cell, add a new one and clear one
+    sparse.add_values([['a2', 'b1', 0.125]])
+    assert sparse.get_value(['a2', 'b1']) == 0.125
+    sparse.add_value_at_current_assignment(0.0)
+    sparse.add_values([['a0', 'b1', 0.5]])
+    assert sparse.nnz() == 3
+    np.testing.assert_array_equal(sparse.get_table(), [[0.25, 0.5], [0.0, 0.0], [0.0, 0.125]])
+    # The rows stay sorted
+    np.testing.assert_array_equal(sparse.coords, [[0, 0], [0, 1], [2, 1]])
+
+
+def test_sparse_factor_changes_bump_version(sparse):
+    version = sparse.version
+    sparse.get_value(['a0', 'b0'])
+    assert sparse.version == version
+    sparse.add_values([['a0', 'b0', 0.5]])
+    assert sparse.version > version
+    version = sparse.version
+    sparse.set_table(np.ones(sparse.shape))
+    assert sparse.version > version
+
+
+@pytest.mark.parametrize("clone", [copy.deepcopy, lambda factor: pickle.loads(pickle.dumps(factor))])
+def test_sparse_factor_copies(sparse, clone):
+    sparse.get_value(['a0', 'b0'])
+    other = clone(sparse)
+    assert type(other) is SparseFactor
+    assert (other.name, other.default, other.version) == (sparse.name, sparse.default, sparse.version)
+    np.testing.assert_array_equal(other.get_table(), sparse.get_table())
+
+    other.add_values([['a1', 'b1', 1.0]])
+    assert other.get_value(['a1', 'b1']) == 1.0
+    assert sparse.get_value(['a1', 'b1']) == 0.0
+
+
+def test_bn_with_sparse_factor_deepcopies(sparse):
+    a, b = sparse.get_scope()
+    prior = Factor("P(B)", [b])
+    prior.set_table([0.5, 0.5])
+    bn = copy.deepcopy(BN("net", [a, b], [prior, sparse]))
+    np.testing.assert_array_equal(bn.factors()[1].get_table(), sparse.get_table())
+    assert bn.factors()[1].get_scope() == bn.variables()
+
+
+@pytest.mark.parametrize("factor_class", [Factor, SparseFactor])
+def test_get_value_checks_the_number_of_values(factor_class):
+    a = Variable("A", ['a0', 'a1', 'a2'])
+    b = Variable("B", ['b0', 'b1'])
+    factor = factor_class("P(A|B)", [a, b])
+    factor.add_values([['a2', 'b1', 0.75]])
+    assert factor.get_value(['a2', 'b1']) == 0.75
+    for values in (['a2'], ['a2', 'b1', 'b1']):
+        with pytest.raises(ValueError, match="has 2 variables"):
+            factor.get_value(values)
+    with pytest.raises(ValueError, match="'b2' is not in the domain of B"):
+        factor.get_value(['a2', 'b2'])
+    with pytest.raises(ValueError, match="has 2 variables"):
+        factor.add_values([['a2', 0.5]])
+
+
+@pytest.mark.parametrize("clone", [copy.deepcopy, lambda factor: pickle.loads(pickle.dumps(factor))])
+def test_dense_factor_copies_look_up_values(clone):
+    a = Variable("A", ['a0', 'a1', 'a2'])
+    b = Variable("B", ['b0', 'b1'])
+    factor = Factor("P(A|B)", [a, b])
+    factor.set_table([[0.1, 0.2], [0.3, 0.4], [0.5, 0.6]])
+    other = clone(factor)
+    assert other.get_value(['a1', 'b1']) == 0.4
+    other.add_values([['a1', 'b1', 1.0]])
+    assert (other.get_value(['a1', 'b1']), factor.get_value(['a1', 'b1'])) == (1.0, 0.4)
@@ -0,0 +1,113 @@
+import os
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+import data_store
+from data_store import columnar_path, convert_csv, read_frame, read_rows, write_parquet
+
+ROWS = [
+    ['Private', 'Europe', '<50K'],
+    ['Government', 'Asia', '>=50K'],
+]
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    path = tmp_path / "data.csv"
+    path.write_text("Work,Country,Salary\n" + "".join(",".join(row) + "\n" for row in ROWS))
+    return str(path)
+
+
+def test_twin_is_read_while_the_csv_matches(csv_file):
+    twin = convert_csv(csv_file)
+    assert columnar_path(csv_file) == twin
+    assert read_rows(csv_file) == (['Work', 'Country', 'Salary'], ROWS)
+    # Touching the CSV without changing it keeps the twin
+    os.utime(csv_file, (0, 0))
+    assert columnar_path(csv_file) == twin
+
+
+@pytest.mark.parametrize("edit", [
+    lambda text: text + "Private,Asia,<50K\n",
+    # Same size, different contents
+    lambda text: text.replace("Europe", "Africa"),
+])
+def test_newer_twin_of_other_data_is_ignored(csv_file, edit):
+    convert_csv(csv_file)
+    with open(csv_file) as f:
+        text = f.read()
+    with open(csv_file, 'w') as f:
+        f.write(edit(text))
+    # The twin is newer than the CSV, but was written from other data
+    os.utime(csv_file, (0, 0))
+    assert columnar_path(csv_file) is None
+    assert read_rows(csv_file)[1][:2] == [edit(text).splitlines()[1].split(","), ROWS[1]]
+
+
+def test_twin_without_a_csv_fingerprint_is_ignored(csv_file, tmp_path):
+    # A twin written before its CSV existed does not vouch for it
+    frame = pd.read_csv(csv_file)
+    os.rename(csv_file, str(tmp_path / "moved.csv"))
+    twin = write_parquet(frame, csv_file)
+    assert columnar_path(csv_file) == twin
+    os.rename(str(tmp_path / "moved.csv"), csv_file)
+    assert columnar_path(csv_file) is None
+
+
+def test_read_rows_rejects_missing_values(csv_file):
+    frame = pd.read_csv(csv_file)
+    frame.loc[1, 'Country'] = None
+    write_parquet(frame, csv_file)
+    with pytest.raises(ValueError, match="Column Country of .* has missing values"):
+        read_rows(csv_file)
+
+
+def test_text_cells_round_trip(tmp_path, monkeypatch):
+    csv_file = str(tmp_path / "na.csv")
+    with open(csv_file, 'w') as f:
+        f.write("Work,Country,Salary\nNA,None,<50K\nPrivate,,>=50K\n")
+    assert convert_csv(csv_file) == columnar_path(csv_file, as_text=True)
+    # The cells are not missing values, so the twin can stand in for the CSV
+    assert read_rows(csv_file) == (['Work', 'Country', 'Salary'], [['NA', 'None', '<50K'], ['Private', '', '>=50K']])
+    twin = read_frame(csv_file)
+    monkeypatch.setattr(data_store, 'pq', None)
+    pd.testing.assert_frame_equal(read_frame(csv_file), twin)
+
+
+def test_number_columns_keep_their_type(tmp_path, monkeypatch):
+    csv_file = str(tmp_path / "numbers.csv")
+    with open(csv_file, 'w') as f:
+        f.write("Work,Age\nNA,30\nPrivate,\n")
+    convert_csv(csv_file)
+    twin = read_frame(csv_file)
+    assert twin['Work'].tolist() == ['NA', 'Private']
+    # A number column with an empty cell is read as pd.read_csv reads it
+    assert twin['Age'].dtype == float and twin['Age'].isna().tolist() == [False, True]
+    monkeypatch.setattr(data_store, 'pq', None)
+    pd.testing.assert_frame_equal(read_frame(csv_file), twin)
+
+
+def test_fingerprint_is_computed_once(csv_file, monkeypatch):
+    convert_csv(csv_file)
+    data_store._fingerprints.clear()
+    hashes = []
+    sha256 = data_store.hashlib.sha256
+    monkeypatch.setattr(data_store.hashlib, 'sha256', lambda: hashes.append(1) or sha256())
+    for _ in range(3):
+        assert columnar_path(csv_file) is not None
+    assert len(hashes) == 1
+    # A CSV of another size is rejected without hashing it, one of the
+    # same size is hashed again
+    with open(csv_file) as f:
+        text = f.read()
+    with open(csv_file, 'w') as f:
+        f.write(text + "Private,Asia,<50K\n")
+    assert columnar_path(csv_file) is None
+    assert len(hashes) == 1
+    with open(csv_file, 'w') as f:
+        f.write(text.replace("Europe", "Africa"))
+    assert columnar_path(csv_file) is None
+    assert len(hashes) == 2
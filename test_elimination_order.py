@@ -0,0 +1,136 @@
+import numpy as np
+import pytest
+
+from bnetbase import BN, Factor, Variable
+from elimination_order import (ORDERINGS, elimination_order, elimination_plan, interaction_graph,
+                               max_factor_size, min_degree, min_fill, weighted_min_fill)
+from naive_bayes_solution import infer
+
+
+def variables(names, size=2):
+    return [Variable(name, list(range(size))) for name in names]
+
+
+def hub_chain():
+    '''
+    Return a chain V0 - V1 - ... - V7 whose variables all share a Hub
+    variable, as a BN listing Hub first, with the Hub and the chain.
+    '''
+    hub = Variable("Hub", list(range(4)))
+    chain = [Variable("V{}".format(i), list(range(3))) for i in range(8)]
+    scopes = [[var, hub] for var in chain] + [[b, a] for a, b in zip(chain, chain[1:])]
+    net = BN("HubChain", [hub] + chain, [Factor("F{}".format(i), scope) for i, scope in enumerate(scopes)])
+    return net, hub, chain
+
+
+def test_interaction_graph():
+    a, b, c, d = variables("ABCD")
+    graph = interaction_graph([[a, b], [b, c], [d]], [a, b, c, d])
+    assert graph == {a: {b}, b: {a, c}, c: {b}, d: set()}
+    # Variables that are not kept are left out of every neighbourhood
+    assert interaction_graph([[a, b], [b, c]], [a, b]) == {a: {b}, b: {a}}
+
+
+def test_scores():
+    x, a, b, c, y, d, e = variables("XABCYDE")
+    graph = interaction_graph([[x, a, b, c], [y, d], [y, e]], [x, a, b, c, y, d, e])
+    assert (min_degree(graph, x), min_fill(graph, x)) == (3, 0)
+    assert (min_degree(graph, y), min_fill(graph, y)) == (2, 1)
+    assert weighted_min_fill(graph, y) == 4
+
+
+def test_min_degree_and_min_fill_differ():
+    # X sits in a clique (degree 3, no fill), Y joins two strangers (degree 2, one fill edge)
+    x, a, b, c, y, d, e = variables("XABCYDE")
+    scopes = [[x, a, b, c], [y, d], [y, e]]
+    assert elimination_order(scopes, [x, y], "min_degree") == [y, x]
+    assert elimination_order(scopes, [x, y], "min_fill") == [x, y]
+
+
+def test_weighted_min_fill_prefers_small_domains():
+    # Eliminating P or Q adds one edge each, between size-10 or size-2 variables
+    p, q = variables("PQ")
+    a, b = variables("AB", 10)
+    c, d = variables("CD", 2)
+    scopes = [[p, a], [p, b], [q, c], [q, d]]
+    assert elimination_order(scopes, [p, q], "min_fill") == [p, q]
+    assert elimination_order(scopes, [p, q], "weighted_min_fill") == [q, p]
+
+
+def test_given_and_explicit_orders():
+    a, b, c = variables("ABC")
+    scopes = [[a, b], [b, c]]
+    assert elimination_order(scopes, [b, a, c], "given") == [b, a, c]
+    assert elimination_order(scopes, [a, b], [b, a]) == [b, a]
+    assert elimination_order(scopes, [a, b], lambda graph, var: -len(graph[var])) == [b, a]
+
+
+def test_invalid_orderings():
+    a, b = variables("AB")
+    for ordering in ["nonsense", [], [b], [a, a]]:
+        with pytest.raises(ValueError):
+            elimination_order([[a, b]], [a], ordering)
+
+
+def test_max_factor_size():
+    a, b, c = Variable("A", [0, 1]), Variable("B", [0, 1, 2]), Variable("C", [0, 1, 2, 3])
+    scopes = [[a, b], [b, c]]
+    # Eliminating B first joins A, B and C
+    assert max_factor_size(scopes, [b, a]) == 24
+    # Eliminating A first only creates [A, B]; the largest factor is an input
+    assert max_factor_size(scopes, [a, b]) == 12
+    assert max_factor_size([], []) == 1
+
+
+@pytest.mark.parametrize("ordering", [name for name in ORDERINGS if name != "given"])
+def test_heuristics_beat_the_given_order_on_a_hub_chain(ordering):
+    net, hub, chain = hub_chain()
+    given, given_size, _ = elimination_plan(net, chain[-1], ordering="given")
+    order, size, pruned = elimination_plan(net, chain[-1], ordering=ordering)
+    assert given[0] is hub and given_size == 4 * 3 ** 8
+    assert sorted(var.name for var in order) == sorted(var.name for var in given)
+    assert size == 36
+    assert pruned == 0
+
+
+def test_plan_leaves_out_evidence_and_pruned_factors():
+    net, hub, chain = hub_chain()
+    order, _, _ = elimination_plan(net, chain[-1], evidence=[hub])
+    assert hub not in order and chain[-1] not in order
+    assert len(order) == len(chain) - 1
+
+    # A leaf below V0 is barren for a query on V7, so its CPT is pruned
+    leaf = Variable("Leaf", list(range(5)))
+    net = BN("HubChainLeaf", net.variables() + [leaf], net.factors() + [Factor("PLeaf", [leaf, chain[0]])])
+    order, size, pruned = elimination_plan(net, chain[-1])
+    assert leaf not in order and (size, pruned) == (36, 1)
+    order, _, pruned = elimination_plan(net, chain[-1], prune=False)
+    assert leaf in order and pruned == 0
+
+
+def test_explicit_order_naming_a_pruned_variable():
+    net, hub, chain = hub_chain()
+    leaf = Variable("Leaf", list(range(5)))
+    prior = Factor("PHub", [hub])
+    prior.set_table([0.1, 0.2, 0.3, 0.4])
+    factors = net.factors() + [Factor("PLeaf", [leaf, chain[0]]), prior]
+    for factor in factors[:-1]:
+        factor.set_table(np.random.default_rng(len(factor.name)).random(factor.shape))
+    # The leaf's CPT sums to one, so dropping it does not change the query
+    factors[-2].set_table(factors[-2].get_table() / factors[-2].get_table().sum(axis=0))
+    net = BN("HubChainLeaf", net.variables() + [leaf], factors)
+
+    # The leaf is pruned, so the plan and infer both skip it
+    explicit = [hub, leaf] + chain[:-1]
+    order, _, pruned = elimination_plan(net, chain[-1], ordering=explicit)
+    assert pruned == 1 and order == [hub] + chain[:-1]
+    unpruned, _, _ = elimination_plan(net, chain[-1], ordering=explicit, prune=False)
+    assert unpruned == explicit
+
+    expected = infer(net, chain[-1], {}, ordering="min_fill", prune=False).values
+    np.testing.assert_allclose(infer(net, chain[-1], {}, ordering=explicit).values, expected)
+    np.testing.assert_allclose(infer(net, chain[-1], {}, ordering=explicit, prune=False).values, expected)
+    # The planned order leaves the leaf out, which only pruning allows
+    np.testing.assert_allclose(infer(net, chain[-1], {}, ordering=order).values, expected)
+    with pytest.raises(ValueError):
+        infer(net, chain[-1], {}, ordering=order, prune=False)
@@ -0,0 +1,80 @@
+import math
+
+import numpy as np
+import pytest
+
+from bnetbase import BN, Factor, Variable
+from evaluate import LOG_LOSS_EPSILON, Evaluation, evaluate
+
+# P(C | A=a0) = [0.8, 0.2, 0, 0] and P(C | A=a1) = [0.2, 0.8, 0, 0]:
+# 'mid' and 'top' are never predicted, and 'top' never occurs
+CLASSES = ['lo', 'hi', 'mid', 'top']
+ROWS = [('a0', 'lo'), ('a0', 'hi'), ('a1', 'hi'), ('a1', 'mid')]
+
+
+@pytest.fixture
+def model():
+    c = Variable("C", CLASSES)
+    a = Variable("A", ['a0', 'a1'])
+    prior = Factor("P(C)", [c])
+    prior.set_table([0.5, 0.5, 0.0, 0.0])
+    likelihood = Factor("P(A|C)", [a, c])
+    likelihood.set_table([[0.8, 0.2, 0.5, 0.5], [0.2, 0.8, 0.5, 0.5]])
+    return BN("NB", [c, a], [prior, likelihood])
+
+
+@pytest.fixture
+def test_file(tmp_path):
+    path = tmp_path / "test.csv"
+    path.write_text("A,C\n" + "".join("{},{}\n".format(*row) for row in ROWS))
+    return str(path)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 100])
+def test_hand_computed_metrics(model, test_file, chunk_size):
+    evaluation = evaluate(model, test_file, chunk_size=chunk_size)
+    assert evaluation.count() == 4
+    assert evaluation.confusion.tolist() == [[1, 0, 0, 0], [1, 1, 0, 0], [0, 1, 0, 0], [0, 0, 0, 0]]
+    assert evaluation.accuracy() == 0.5
+    assert evaluation.precision() == {'lo': 0.5, 'hi': 0.5, 'mid': 0.0, 'top': 0.0}
+    assert evaluation.recall() == {'lo': 1.0, 'hi': 0.5, 'mid': 0.0, 'top': 0.0}
+    # The 'mid' row has probability 0, which is clipped
+    expected = -(2 * math.log(0.8) + math.log(0.2) + math.log(LOG_LOSS_EPSILON)) / 4
+    assert evaluation.log_loss() == pytest.approx(expected)
+
+    # Every row has confidence 0.8, and half of them are right
+    [row] = evaluation.calibration()
+    assert (row["low"], row["high"], row["count"]) == (0.8, 0.9, 4)
+    assert (row["confidence"], row["accuracy"]) == (pytest.approx(0.8), 0.5)
+    assert evaluation.expected_calibration_error() == pytest.approx(0.3)
+
+
+def test_chunks_add_up(model, test_file):
+    chunked, whole = evaluate(model, test_file, chunk_size=1), evaluate(model, test_file)
+    np.testing.assert_array_equal(chunked.confusion, whole.confusion)
+    np.testing.assert_array_equal(chunked.bin_counts, whole.bin_counts)
+    np.testing.assert_array_equal(chunked.bin_correct, whole.bin_correct)
+    np.testing.assert_allclose(chunked.bin_confidence, whole.bin_confidence)
+    assert chunked.log_loss_sum == pytest.approx(whole.log_loss_sum)
+
+
+def test_bin_edges():
+    evaluation = Evaluation(['x', 'y'], bins=4)
+    # Confidences 0.5, 0.75 and 1.0: a confidence on an edge goes to the
+    # bin above it, and 1.0 to the last bin
+    evaluation.add([0, 1, 0], np.array([[0.5, 0.5], [0.25, 0.75], [1.0, 0.0]]))
+    assert [(row["low"], row["count"], row["accuracy"]) for row in evaluation.calibration()] == [
+        (0.5, 1, 1.0), (0.75, 2, 1.0)]
+    assert evaluation.calibration()[1]["confidence"] == pytest.approx(0.875)
+    assert evaluation.expected_calibration_error() == pytest.approx((0.5 + 2 * 0.125) / 3)
+
+
+def test_empty_evaluation():
+    evaluation = Evaluation(CLASSES)
+    assert (evaluation.count(), evaluation.accuracy(), evaluation.log_loss()) == (0, 0.0, 0.0)
+    assert evaluation.calibration() == [] and evaluation.expected_calibration_error() == 0.0
+
+
+def test_unknown_class_column(model, test_file):
+    with pytest.raises(ValueError, match="Class column B"):
+        evaluate(model, test_file, class_name='B')
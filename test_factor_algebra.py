@@ -0,0 +1,309 @@
+import itertools
+import random
+
+import numpy as np
+import pytest
+
+from bnetbase import Variable, Factor, SparseFactor
+from factor_algebra import (normalize, restrict, sum_out, multiply, to_log, from_log,
+                            log_normalize, log_sum_out, log_multiply)
+
+
+# The original cell-by-cell implementations from naive_bayes_solution.py,
+# which the vectorized, log-space and sparse operations must reproduce.
+
+def original_normalize(factor: Factor) -> Factor:
+    '''
+    Normalize the factor such that its values sum to 1.
+    Do not modify the input factor.
+
+    :param factor: a Factor object. 
+    :return: a new Factor object resulting from normalizing factor.
+    '''
+    # Step 1: Create a new factor with the same scope
+    new_factor = Factor(f"{factor.name}_normalized", factor.get_scope())
+
+    # Step 2: Calculate the total sum of the factor's values
+    total_sum = sum(factor.values)
+
+    # Step 3: Prepare variables and their domains
+    variables = factor.get_scope()
+    domains = [var.domain() for var in variables]
+
+    # Step 4: Save current assignments
+    saved_assignments = [var.get_assignment_index() for var in variables]
+
+    # Step 5: Iterate over all possible assignments
+    for assignment in itertools.product(*domains):
+        # Set variable assignments
+        for var, value in zip(variables, assignment):
+            var.set_assignment(value)
+
+        # Retrieve the original value
+        original_value = factor.get_value_at_current_assignments()
+
+        # Compute the normalized value
+        if total_sum != 0:
+            normalized_value = original_value / total_sum
+        else:
+            normalized_value = 0  # Handle zero total sum appropriately
+
+        # Set the normalized value in the new factor
+        new_factor.add_value_at_current_assignment(normalized_value)
+
+    # Step 6: Restore original assignments
+    for var, index in zip(variables, saved_assignments):
+        var.set_assignment_index(index)
+
+    return new_factor
+
+
+def original_restrict(factor: Factor, variable: Variable, value: str) -> Factor:
+    '''
+    Restrict a factor by assigning value to variable.
+    Do not modify the input factor.
+
+    :param factor: a Factor object.
+    :param variable: the variable to restrict.
+    :param value: the value to restrict the variable to
+    :return: a new Factor object resulting from restricting variable to value.
+             This new factor no longer has variable in it.
+
+    '''
+    # Step 1: Identify the new scope (exclude the restricted variable)
+    new_scope = [var for var in factor.get_scope() if var != variable]
+
+    # Step 2: Create a new factor with the new scope
+    new_factor = Factor(f"{factor.name}_restricted_{variable.name}_{value}", new_scope)
+
+    # Step 3: Prepare variables and their domains
+    variables = factor.get_scope()
+    domains = [var.domain() for var in variables]
+
+    # Step 4: Save current assignments
+    saved_assignments = [var.get_assignment_index() for var in variables]
+
+    # Step 5: Iterate over all possible assignments
+    for assignment in itertools.product(*domains):
+        # Create a mapping of variables to their assigned values
+        assignment_dict = dict(zip(variables, assignment))
+
+        # Check if the variable has the specified value
+        if assignment_dict[variable] == value:
+            # Set assignments for all variables
+            for var, val in assignment_dict.items():
+                var.set_assignment(val)
+
+            # Retrieve the value from the original factor
+            original_value = factor.get_value_at_current_assignments()
+
+            # Set assignments in the new factor (excluding the restricted variable)
+            for var in new_scope:
+                var.set_assignment(assignment_dict[var])
+
+            # Add the value to the new factor
+            new_factor.add_value_at_current_assignment(original_value)
+
+    # Step 6: Restore original assignments
+    for var, index in zip(variables, saved_assignments):
+        var.set_assignment_index(index)
+
+    return new_factor
+
+def original_sum_out(factor: Factor, variable: Variable) -> Factor:
+    '''
+    Sum out a variable variable from factor factor.
+    Do not modify the input factor.
+
+    :param factor: a Factor object.
+    :param variable: the variable to sum out.
+    :return: a new Factor object resulting from summing out variable from the factor.
+             This new factor no longer has variable in it.
+    '''
+    # Step 1: Identify the new scope (exclude the summed-out variable)
+    new_scope = [var for var in factor.get_scope() if var != variable]
+    new_factor = Factor(f"{factor.name}_sumout_{variable.name}", new_scope)
+
+    # Step 2: Prepare variables and domains
+    new_vars = new_factor.get_scope()
+    new_domains = [var.domain() for var in new_vars]
+    sumout_domain = variable.domain()
+
+    # Step 3: Save current assignments
+    all_vars = factor.get_scope()
+    saved_assignments = [var.get_assignment_index() for var in all_vars]
+
+    # Step 4: Iterate over all possible assignments of the new scope
+    for assignment in itertools.product(*new_domains):
+        total = 0  # Initialize sum accumulator
+
+        # Map variables to their assigned values
+        assignment_dict = dict(zip(new_vars, assignment))
+
+        # For each value of the summed-out variable
+        for sumout_val in sumout_domain:
+            # Build full assignment including the summed-out variable
+            full_assignment = assignment_dict.copy()
+            full_assignment[variable] = sumout_val
+
+            # Set variable assignments
+            for var, assigned_value in full_assignment.items():
+                var.set_assignment(assigned_value)
+
+            # Retrieve the original value
+            original_value = factor.get_value_at_current_assignments()
+
+            # Accumulate the sum
+            total += original_value
+
+        # Set assignments for new factor (only variables in new scope)
+        for var, assigned_value in assignment_dict.items():
+            var.set_assignment(assigned_value)
+
+        # Assign the accumulated sum to the new factor
+        new_factor.add_value_at_current_assignment(total)
+
+    # Step 5: Restore original assignments
+    for var, index in zip(all_vars, saved_assignments):
+        var.set_assignment_index(index)
+
+    return new_factor
+
+def original_multiply(factor_list):
+    '''
+    Multiply a list of factors together.
+    Do not modify any of the input factors. 
+
+    :param factor_list: a list of Factor objects.
+    :return: a new Factor object resulting from multiplying all the factors in factor_list.
+    '''
+    # Collect variables from all factors while preserving order
+    new_scope_vars = []
+    for factor in factor_list:
+        for var in factor.get_scope():
+            if var not in new_scope_vars:
+                new_scope_vars.append(var)
+
+    # Create the new factor
+    new_factor = Factor("ProductFactor", new_scope_vars)
+    domains = [var.domain() for var in new_scope_vars]
+    saved_assignments = {var: var.get_assignment_index() for var in new_scope_vars}
+
+    # Iterate over all possible assignments
+    for assignment in itertools.product(*domains):
+        # Map variables to their assigned values
+        assignment_dict = dict(zip(new_scope_vars, assignment))
+
+        # Set variable assignments
+        for var, value in assignment_dict.items():
+            var.set_assignment(value)
+
+        # Initialize product accumulator
+        product = 1.0
+
+        # Multiply values from each factor
+        for factor in factor_list:
+            # Retrieve value from the factor
+            factor_value = factor.get_value_at_current_assignments()
+            product *= factor_value
+
+        # Add the product to the new factor
+        new_factor.add_value_at_current_assignment(product)
+
+    # Restore original variable assignments
+    for var, index in saved_assignments.items():
+        var.set_assignment_index(index)
+
+    return new_factor
+
+def random_factors(rng):
+    '''
+    Return 1 to 3 factors over 1 to 5 random variables, with some zeros so
+    the log-space operations see -inf entries.
+    '''
+    variables = [Variable("V{}".format(i), ["v{}_{}".format(i, j) for j in range(rng.randint(1, 4))])
+                 for i in range(rng.randint(1, 5))]
+    factors = []
+    for k in range(rng.randint(1, 3)):
+        factor = Factor("F{}".format(k), rng.sample(variables, rng.randint(0, len(variables))))
+        factor.set_table(np.reshape([rng.random() if rng.random() > 0.1 else 0.0 for _ in range(len(factor.values))],
+                                    factor.shape))
+        factors.append(factor)
+    return factors
+
+
+def assert_same(new, ref):
+    assert new.name == ref.name
+    assert new.get_scope() == ref.get_scope()
+    np.testing.assert_allclose(new.values, ref.values, rtol=1e-12, atol=1e-15)
+
+
+def sparse_variants(factor):
+    '''
+    Return sparse copies of factor, with a default of 0 and with one of its
+    own values.
+    '''
+    return [SparseFactor.from_dense(factor), SparseFactor.from_dense(factor, default=factor.values[0])]
+
+
+SEEDS = range(50)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_multiply(seed):
+    factors = random_factors(random.Random(seed))
+    expected = original_multiply(factors)
+    sparse = [SparseFactor.from_dense(f) for f in factors]
+    shifted = [SparseFactor.from_dense(f, default=f.values[0]) for f in factors]
+    assert_same(multiply(factors), expected)
+    assert_same(from_log(log_multiply([to_log(f) for f in factors])), expected)
+    assert_same(multiply(sparse), expected)
+    assert_same(multiply(sparse[:1] + factors[1:]), expected)
+    assert_same(multiply(factors[:1] + shifted[1:]), expected)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_normalize(seed):
+    for factor in random_factors(random.Random(seed)):
+        expected = original_normalize(factor)
+        assert_same(normalize(factor), expected)
+        assert_same(from_log(log_normalize(to_log(factor))), expected)
+        for variant in sparse_variants(factor):
+            assert_same(normalize(variant), expected)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_restrict(seed):
+    rng = random.Random(seed)
+    for factor in random_factors(rng):
+        for var in factor.get_scope():
+            value = rng.choice(var.domain())
+            expected = original_restrict(factor, var, value)
+            assert_same(restrict(factor, var, value), expected)
+            for variant in sparse_variants(factor):
+                assert_same(restrict(variant, var, value), expected)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_sum_out(seed):
+    for factor in random_factors(random.Random(seed)):
+        for var in factor.get_scope():
+            expected = original_sum_out(factor, var)
+            assert_same(sum_out(factor, var), expected)
+            assert_same(from_log(log_sum_out(to_log(factor), var)), expected)
+            for variant in sparse_variants(factor):
+                assert_same(sum_out(variant, var), expected)
+
+
+def test_operations_leave_assignments_alone():
+    factors = random_factors(random.Random(0))
+    variables = {var for factor in factors for var in factor.get_scope()}
+    for var in variables:
+        var.set_assignment_index(var.domain_size() - 1)
+    multiply(factors)
+    for factor in factors:
+        normalize(factor)
+        for var in factor.get_scope():
+            restrict(factor, var, var.domain()[0])
+            sum_out(factor, var)
+    assert all(var.get_assignment_index() == var.domain_size() - 1 for var in variables)
@@ -0,0 +1,136 @@
+import threading
+import time
+
+import pytest
+from flask import Flask
+
+import model_service
+from model_service import UPDATE_TOKEN_HEADER, ModelService, install
+
+DOMAINS = {
+    "Work": ['Private', 'Government'],
+    "Country": ['Europe', 'Asia', 'Other'],
+    "Salary": ['<50K', '>=50K'],
+}
+
+ROWS = [
+    ['Private', 'Europe', '<50K'],
+    ['Government', 'Asia', '>=50K'],
+    ['Private', 'Other', '>=50K'],
+    ['Private', 'Europe', '<50K'],
+]
+
+
+@pytest.fixture
+def service(tmp_path):
+    data_file = tmp_path / "train.csv"
+    data_file.write_text("\n".join(",".join(row) for row in [list(DOMAINS)] + ROWS) + "\n")
+    return ModelService(DOMAINS, str(data_file), str(tmp_path / "model.npz"), str(tmp_path / "posteriors.npy"))
+
+
+TOKEN = "secret"
+AUTH = {UPDATE_TOKEN_HEADER: TOKEN}
+
+
+@pytest.fixture
+def client(service):
+    app = Flask(__name__)
+    install(app, service, update_token=TOKEN)
+    return app.test_client()
+
+
+def test_model_is_loaded_once(service, capsys):
+    model = service.load_model()
+    assert service.load_model() is model
+    assert service.model_version == 1
+    assert service.training_stats.total == len(ROWS)
+    assert service.posterior_table is None
+
+
+def test_concurrent_first_calls_load_once(service, monkeypatch):
+    built = []
+
+    def slow_model(*args):
+        # Long enough for every thread to miss the model before it is set
+        time.sleep(0.05)
+        built.append(naive_bayes_model(*args))
+        return built[-1]
+
+    naive_bayes_model = model_service.naive_bayes_model
+    monkeypatch.setattr(model_service, 'naive_bayes_model', slow_model)
+    models = []
+    threads = [threading.Thread(target=lambda: models.append(service.load_model())) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(built) == 1
+    assert models == built * 4
+    assert service.model_version == 1
+
+
+def test_update_swaps_model_and_clears_cache(service, client):
+    old_model = service.load_model()
+    service.prediction_cache.put("key", {"prediction": "<50K"})
+    profile = {"Work": 'Government', "Country": 'Other', "Salary": '<50K'}
+
+    response = client.post('/api/model/update', json={"profiles": [profile]}, headers=AUTH)
+    assert response.status_code == 200
+    assert response.get_json() == {"status": "updated", "added": 1, "total_training_samples": len(ROWS) + 1}
+    assert service.trained_model is not old_model
+    assert service.model_version == 2
+    assert service.prediction_cache.get("key") is None
+    assert client.get('/api/cache/stats').get_json()["model_version"] == 2
+
+    response = client.post('/api/model/update', json={"profiles": [profile], "remove": True}, headers=AUTH)
+    assert response.get_json()["removed"] == 1
+    assert service.training_stats.total == len(ROWS)
+
+
+@pytest.mark.parametrize("body, error", [
+    ({"profiles": []}, "at least one labelled profile"),
+    ({"profiles": ["x"]}, "Profile 0: Profile must be a JSON object"),
+    ({"profiles": [{"Work": 'Private', "Country": 'Europe'}]}, "Profile 0: Invalid or missing 'Salary'"),
+    ({"profiles": [{"Work": 'Retired', "Country": 'Europe', "Salary": '<50K'}]}, "Profile 0: Invalid or missing 'Work'"),
+])
+def test_update_rejects_invalid_profiles(service, client, body, error):
+    response = client.post('/api/model/update', json=body, headers=AUTH)
+    assert response.status_code == 400
+    assert error in response.get_json()["error"]
+    assert service.model_version <= 1
+
+
+def test_update_route_is_off_without_a_token(service, monkeypatch):
+    monkeypatch.delenv('SALARY_API_UPDATE_TOKEN', raising=False)
+    app = Flask(__name__)
+    install(app, service)
+    response = app.test_client().post('/api/model/update', json={"profiles": []})
+    assert response.status_code in (404, 405)
+
+
+@pytest.mark.parametrize("headers", [{}, {UPDATE_TOKEN_HEADER: "wrong"}])
+def test_update_needs_the_token(service, headers):
+    app = Flask(__name__)
+    install(app, service, update_token=TOKEN)
+    profile = {"Work": 'Government', "Country": 'Other', "Salary": '<50K'}
+    response = app.test_client().post('/api/model/update', json={"profiles": [profile]}, headers=headers)
+    assert response.status_code == 401
+    assert service.model_version == 0
+
+
+def test_update_route_is_not_shared_with_other_origins():
+    import app as salary_app
+    client = salary_app.app.test_client()
+    headers = {'Origin': 'http://example.com', 'Access-Control-Request-Method': 'POST'}
+    update = client.open('/api/model/update', method='OPTIONS', headers=headers)
+    assert 'Access-Control-Allow-Origin' not in update.headers
+    predict = client.open('/api/predict', method='OPTIONS', headers=headers)
+    assert predict.headers['Access-Control-Allow-Origin'] == 'http://example.com'
+
+
+def test_requests_are_timed(client):
+    response = client.get('/api/cache/stats')
+    assert "total;dur=" in response.headers['Server-Timing']
+    metrics = client.get('/metrics')
+    assert metrics.mimetype == 'text/plain'
+    assert 'endpoint="cache_stats"' in metrics.get_data(as_text=True)
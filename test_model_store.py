@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from model_store import load_model_artifact, model_fingerprint, save_model_artifact
+from naive_bayes_solution import naive_bayes_model
+
+DOMAINS = {
+    "Work": ['Private', 'Government'],
+    "Country": ['Europe', 'Asia', 'Other'],
+    "Salary": ['<50K', '>=50K'],
+}
+
+ROWS = [
+    ['Private', 'Europe', '<50K'],
+    ['Government', 'Asia', '>=50K'],
+    ['Private', 'Other', '>=50K'],
+    ['Private', 'Europe', '<50K'],
+]
+
+
+@pytest.fixture
+def artifact(tmp_path):
+    data_file = tmp_path / "train.csv"
+    data_file.write_text("\n".join(",".join(row) for row in [list(DOMAINS)] + ROWS) + "\n")
+    model = naive_bayes_model(str(data_file), DOMAINS)
+    path = str(tmp_path / "model.npz")
+    save_model_artifact(path, model, str(data_file))
+    return path, str(data_file), model
+
+
+def test_round_trip(artifact):
+    path, data_file, model = artifact
+    loaded, statistics = load_model_artifact(path, data_file, DOMAINS)
+    assert model_fingerprint(loaded) == model_fingerprint(model)
+    assert statistics is None
+
+
+def test_stale_training_data_is_rejected(artifact):
+    path, data_file, _ = artifact
+    with open(data_file, 'a') as f:
+        f.write("Government,Asia,<50K\n")
+    with pytest.raises(ValueError, match="not trained on the current"):
+        load_model_artifact(path, data_file)
+
+
+@pytest.mark.parametrize("edit", [
+    lambda domains: domains["Country"].append('Africa'),
+    lambda domains: domains["Country"].reverse(),
+    lambda domains: domains.pop("Work"),
+    lambda domains: domains.update(Gender=['Male', 'Female']),
+])
+def test_changed_domains_are_rejected(artifact, edit):
+    path, data_file, _ = artifact
+    domains = {name: list(domain) for name, domain in DOMAINS.items()}
+    edit(domains)
+    with pytest.raises(ValueError, match="other domains"):
+        load_model_artifact(path, data_file, domains)
+    # Without domains to check against, the artifact still loads
+    loaded, _ = load_model_artifact(path, data_file)
+    assert np.allclose(loaded.factors()[0].values, [0.5, 0.5])
@@ -0,0 +1,161 @@
+import numpy as np
+import pytest
+
+from bnetbase import BN, Factor, SparseFactor, Variable
+from naive_bayes_solution import (NaiveBayesPosterior, batch_posterior, explore, explore_all, infer,
+                                  naive_bayes_model, ve)
+
+
+@pytest.fixture(scope="module")
+def adult(tmp_path_factory):
+    '''
+    Return the Adult model and a test CSV with the first rows of the test set.
+    '''
+    test_file = tmp_path_factory.mktemp("adult") / "adult-test.csv"
+    with open('data/adult-test.csv') as f:
+        test_file.write_text("".join(line for line, _ in zip(f, range(301))))
+    return naive_bayes_model('data/adult-train.csv'), str(test_file)
+
+
+def with_gender_edge(bn):
+    '''
+    Return a copy of bn where Gender also depends on Relationship, with
+    the same probabilities for every Relationship, so it is no longer a
+    Naive Bayes BN but has the same posteriors.
+    '''
+    gender, relationship = bn.get_variable("Gender"), bn.get_variable("Relationship")
+    old = next(f for f in bn.factors() if gender in f.get_scope())
+    edge = Factor("P(Gender|Salary,Relationship)", old.get_scope() + [relationship])
+    edge.set_table(np.repeat(old.get_table()[..., np.newaxis], relationship.domain_size(), axis=-1))
+    return BN("AdultEdge", bn.variables(), [edge if f is old else f for f in bn.factors()])
+
+
+def naive_bayes_net(tables):
+    '''
+    Return a Naive Bayes BN over a class C and features A and B, built from
+    a dict with the tables of P(C), P(A|C) and P(B|C).
+    '''
+    c = Variable("C", ['c0', 'c1'])
+    a = Variable("A", ['a0', 'a1', 'a2'])
+    b = Variable("B", ['b0', 'b1'])
+    prior = Factor("P(C)", [c])
+    prior.set_table(tables["C"])
+    fa = Factor("P(A|C)", [a, c])
+    fa.set_table(tables["A"])
+    fb = Factor("P(B|C)", [b, c])
+    fb.set_table(tables["B"])
+    return BN("NB", [c, a, b], [prior, fa, fb])
+
+
+def factor(bn, name):
+    return next(f for f in bn.factors() if f.name == name)
+
+
+TABLES = {
+    "C": [0.7, 0.3],
+    "A": [[0.5, 0.2], [0.3, 0.3], [0.2, 0.5]],
+    "B": [[0.9, 0.4], [0.1, 0.6]],
+}
+
+MUTATIONS = {
+    "set_table": lambda bn: factor(bn, "P(A|C)").set_table([[0.1, 0.6], [0.1, 0.2], [0.8, 0.2]]),
+    "add_values": lambda bn: factor(bn, "P(C)").add_values([['c0', 0.2], ['c1', 0.8]]),
+    "add_value_at_current_assignment": lambda bn: (bn.get_variable("B").set_assignment('b1'),
+                                                   bn.get_variable("C").set_assignment('c0'),
+                                                   factor(bn, "P(B|C)").add_value_at_current_assignment(0.5)),
+}
+
+
+def posterior(bn):
+    evidence = {bn.get_variable("A"): 'a2', bn.get_variable("B"): 'b1'}
+    return infer(bn, bn.get_variable("C"), evidence).values
+
+
+@pytest.mark.parametrize("mutation", sorted(MUTATIONS))
+def test_cached_posterior_follows_cpt_changes(mutation):
+    bn = naive_bayes_net(TABLES)
+    assert NaiveBayesPosterior.for_bn(bn) is not None
+    before = posterior(bn)
+
+    MUTATIONS[mutation](bn)
+    fresh = naive_bayes_net({name: factor(bn, table).get_table()
+                             for name, table in [("C", "P(C)"), ("A", "P(A|C)"), ("B", "P(B|C)")]})
+    assert not np.allclose(posterior(bn), before)
+    np.testing.assert_allclose(posterior(bn), posterior(fresh))
+
+
+def test_posterior_is_reused_while_cpts_are_unchanged():
+    bn = naive_bayes_net(TABLES)
+    cached = NaiveBayesPosterior.for_bn(bn)
+    assert NaiveBayesPosterior.for_bn(bn) is cached
+    factor(bn, "P(B|C)").touch()
+    assert NaiveBayesPosterior.for_bn(bn) is not cached
+
+
+def test_sparse_cpt_changes_reach_ve():
+    bn = naive_bayes_net(TABLES)
+    sparse = SparseFactor.from_dense(factor(bn, "P(A|C)"))
+    bn = BN("NB", bn.variables(), [factor(bn, "P(C)"), sparse, factor(bn, "P(B|C)")])
+    c, a = bn.get_variable("C"), bn.get_variable("A")
+    a.set_evidence('a0')
+    before = ve(bn, c, [a]).values
+
+    sparse.add_values([['a0', 'c1', 0.9], ['a2', 'c1', 0.0]])
+    expected = np.array([0.7 * 0.5, 0.3 * 0.9])
+    np.testing.assert_allclose(ve(bn, c, [a]).values, expected / expected.sum())
+    assert not np.allclose(before, expected / expected.sum())
+
+
+def test_infer_reports_pruned_factors():
+    bn = naive_bayes_net(TABLES)
+    c, a, b = bn.get_variable("C"), bn.get_variable("A"), bn.get_variable("B")
+    stats = {}
+    infer(bn, c, {a: 'a1'}, stats=stats)
+    assert stats == {"pruned": 1}
+    # General elimination prunes the same CPT, and nothing when told not to
+    infer(bn, a, {c: 'c0'}, stats=stats)
+    assert stats["pruned"] == 1
+    infer(bn, a, {c: 'c0'}, prune=False, stats=stats)
+    assert stats["pruned"] == 0
+    a.set_evidence('a1')
+    ve(bn, c, [a], stats=stats)
+    assert stats["pruned"] == 1
+
+
+def test_explore_answers_each_question(adult):
+    nb, test_file = adult
+    results = explore_all(nb, test_file)
+    assert [explore(nb, question, test_file) for question in range(1, 7)] == [results[q] for q in range(1, 7)]
+    assert explore(nb, 7, test_file) == 0
+
+
+@pytest.mark.parametrize("rows", [300, 0])
+def test_explore_all_workers_match_serial(adult, tmp_path, rows):
+    nb, test_file = adult
+    shard_file = tmp_path / "adult-test.csv"
+    with open(test_file) as f:
+        shard_file.write_text("".join(line for line, _ in zip(f, range(rows + 1))))
+    serial = explore_all(nb, str(shard_file))
+    assert explore_all(nb, str(shard_file), workers=2) == serial
+    if rows == 0:
+        assert serial == {question: 0 for question in range(1, 7)}
+
+
+def test_explore_falls_back_to_ve_for_other_nets(adult):
+    nb, test_file = adult
+    bn = with_gender_edge(nb)
+    assert NaiveBayesPosterior.for_bn(bn) is None
+    for question in (1, 3):
+        assert explore(bn, question, test_file) == pytest.approx(explore(nb, question, test_file))
+
+
+def test_batch_posterior_falls_back_to_infer():
+    bn = naive_bayes_net(TABLES)
+    c, a, b = bn.get_variable("C"), bn.get_variable("A"), bn.get_variable("B")
+    codes = np.array([[0, 1], [1, -1], [-1, 0]])
+    # Querying a feature is not a Naive Bayes query
+    result = batch_posterior(bn, a, [c, b], codes)
+    for row, values in zip(codes, result):
+        evidence = {var: var.domain()[code] for var, code in zip([c, b], row) if code >= 0}
+        np.testing.assert_allclose(values, infer(bn, a, evidence).values)
+    np.testing.assert_allclose(batch_posterior(bn, c, [a, b], codes[:1]), [infer(bn, c, {a: 'a0', b: 'b1'}).values])
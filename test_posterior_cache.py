@@ -0,0 +1,82 @@
+import threading
+
+import pytest
+
+from posterior_cache import PosteriorCache, cache_key
+
+COLUMNS = ["Age", "Country"]
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = PosteriorCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    # Reading a makes b the least recently used entry
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+
+    # Overwriting an entry also renews it
+    cache.put("a", 10)
+    cache.put("d", 4)
+    assert cache.get("c") is None
+    assert (cache.get("a"), cache.get("d")) == (10, 4)
+    assert cache.stats()["evictions"] == 2
+
+
+def test_counters():
+    cache = PosteriorCache(maxsize=1)
+    assert cache.stats() == {"size": 0, "maxsize": 1, "hits": 0, "misses": 0, "evictions": 0, "hit_rate": 0.0}
+    cache.get("a")
+    cache.put("a", 1)
+    cache.get("a")
+    cache.get("a")
+    cache.put("b", 2)
+    assert cache.stats() == {"size": 1, "maxsize": 1, "hits": 2, "misses": 1, "evictions": 1, "hit_rate": 2 / 3}
+
+    # Clearing drops the entries but keeps the counters
+    cache.clear()
+    assert cache.get("b") is None
+    assert cache.stats() == {"size": 0, "maxsize": 1, "hits": 2, "misses": 2, "evictions": 1, "hit_rate": 0.5}
+
+
+def test_zero_maxsize_disables_caching():
+    cache = PosteriorCache(maxsize=0)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+    assert cache.stats()["size"] == 0
+    with pytest.raises(ValueError):
+        PosteriorCache(maxsize=-1)
+
+
+def test_keys_follow_columns_and_model_version():
+    profile = {"Country": 'Germany', "Age": '25-34', "Salary": '<50K'}
+    key = cache_key(1, profile, COLUMNS)
+    # Field order and fields outside the columns do not matter
+    assert key == cache_key(1, {"Age": '25-34', "Country": 'Germany'}, COLUMNS)
+    assert key != cache_key(1, dict(profile, Age='35-44'), COLUMNS)
+
+    # A result cached for one model version is not returned for the next
+    cache = PosteriorCache()
+    cache.put(key, {"prediction": '<50K'})
+    assert cache.get(cache_key(2, profile, COLUMNS)) is None
+    assert cache.get(key) == {"prediction": '<50K'}
+
+
+def test_concurrent_use_keeps_the_bound_and_the_counts():
+    cache = PosteriorCache(maxsize=8)
+
+    def worker(offset):
+        for i in range(500):
+            if cache.get((offset + i) % 16) is None:
+                cache.put((offset + i) % 16, i)
+
+    threads = [threading.Thread(target=worker, args=(offset,)) for offset in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = cache.stats()
+    assert stats["size"] <= 8
+    assert stats["hits"] + stats["misses"] == 4 * 500
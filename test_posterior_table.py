@@ -0,0 +1,116 @@
+import itertools
+import json
+
+import numpy as np
+import pytest
+
+from model_service import ModelService
+from naive_bayes_solution import infer, naive_bayes_model
+from posterior_table import PosteriorTable, build_posterior_table
+
+DOMAINS = {
+    "Work": ['Private', 'Government'],
+    "Country": ['Europe', 'Asia', 'Other'],
+    "Age": ['Young', 'Old'],
+    "Salary": ['<50K', '>=50K'],
+}
+
+ROWS = [
+    ['Private', 'Europe', 'Young', '<50K'],
+    ['Government', 'Asia', 'Old', '>=50K'],
+    ['Private', 'Other', 'Old', '>=50K'],
+    ['Private', 'Europe', 'Old', '<50K'],
+    ['Government', 'Europe', 'Young', '<50K'],
+]
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    path = tmp_path / "train.csv"
+    path.write_text("\n".join(",".join(row) for row in [list(DOMAINS)] + ROWS) + "\n")
+    return str(path)
+
+
+@pytest.fixture
+def built(data_file, tmp_path):
+    model = naive_bayes_model(data_file, DOMAINS)
+    path = str(tmp_path / "posteriors.npy")
+    # Batches of 5 rows do not divide the 12 profiles evenly
+    count = build_posterior_table(path, model, model.get_variable("Salary"), batch_size=5)
+    return path, model, count
+
+
+def profiles():
+    features = [name for name in DOMAINS if name != "Salary"]
+    for values in itertools.product(*(DOMAINS[name] for name in features)):
+        yield dict(zip(features, values))
+
+
+def test_every_profile_matches_infer(built):
+    path, model, count = built
+    assert count == 2 * 3 * 2
+    table = PosteriorTable(path, model)
+    salary = model.get_variable("Salary")
+    for key, profile in enumerate(profiles()):
+        expected = infer(model, salary, {model.get_variable(name): value for name, value in profile.items()}).values
+        # The first evidence variable is the most significant digit
+        np.testing.assert_allclose(table.table[key], expected)
+        np.testing.assert_allclose(table.lookup(profile), expected)
+
+
+@pytest.mark.parametrize("profile", [
+    {"Work": 'Private', "Country": 'Europe'},
+    {"Work": 'Private', "Country": 'Africa', "Age": 'Old'},
+    {"Work": 'Private', "Country": 'Europe', "Age": 'Old', "Salary": '<50K'},
+])
+def test_incomplete_profiles_are_not_answered(built, profile):
+    path, model, _ = built
+    assert PosteriorTable(path, model).lookup(profile) is None
+
+
+def test_table_is_memory_mapped_and_reloaded(built):
+    path, model, _ = built
+    table = PosteriorTable(path)
+    assert isinstance(table.table, np.memmap) and not table.table.flags.writeable
+    first = next(profiles())
+    before = table.lookup(first).copy()
+
+    # Rebuilding replaces the file; a table opened afterwards maps the new one
+    model.update([['Private', 'Europe', 'Young', '>=50K']] * 3)
+    build_posterior_table(path, model, model.get_variable("Salary"))
+    np.testing.assert_allclose(table.lookup(first), before)
+    reloaded = PosteriorTable(path, model)
+    assert not np.allclose(reloaded.lookup(first), before)
+
+
+def test_stale_tables_are_rejected(built, data_file):
+    path, model, _ = built
+    updated = model.copy()
+    updated.update([['Private', 'Asia', 'Young', '>=50K']])
+    with pytest.raises(ValueError, match="not built from the current model"):
+        PosteriorTable(path, updated)
+
+    domains = dict(DOMAINS, Country=['Europe', 'Asia', 'Other', 'Africa'])
+    with pytest.raises(ValueError, match="not built from the current model"):
+        PosteriorTable(path, naive_bayes_model(data_file, domains))
+
+    with open(path + ".json") as f:
+        metadata = json.load(f)
+    with open(path + ".json", 'w') as f:
+        json.dump(dict(metadata, version=0), f)
+    with pytest.raises(ValueError, match="table version 0"):
+        PosteriorTable(path)
+
+
+def test_service_ignores_a_stale_table(built, data_file, tmp_path, capsys):
+    path, model, _ = built
+    service = ModelService(DOMAINS, data_file, str(tmp_path / "model.npz"), path)
+    service.load_model()
+    assert service.posterior_table is not None
+
+    other = naive_bayes_model(data_file, dict(DOMAINS, Age=['Old', 'Young']))
+    build_posterior_table(path, other, other.get_variable("Salary"))
+    service = ModelService(DOMAINS, data_file, str(tmp_path / "model.npz"), path)
+    service.load_model()
+    assert service.posterior_table is None
+    assert "Ignoring posterior table" in capsys.readouterr().out
@@ -0,0 +1,276 @@
+import pandas as pd
+import pytest
+
+from preprocess_stackoverflow import FEATURES, SURVEY_COLUMNS, clean_survey
+
+ROWS = [
+    # ConvertedCompYearly, Age, EdLevel, Employment, RemoteWork, YearsCode, DevType, OrgSize, Country
+    [60000, '', 'Something else', 'Employed, full-time', 'Remote', '5', 'Developer, back-end', '2 to 9 employees', 'Germany'],
+    [80000, '25-34 years old', '', 'Employed, part-time', 'Hybrid (some remote, some in-person)', 'Less than 1 year',
+     'Data scientist or machine learning specialist', '10,000 or more employees', ''],
+    [45000, '35-44 years old', "Master's degree (M.A., M.S., M.Eng., MBA, etc.)", '', '', '', '', '', 'India'],
+    [120000, '18-24 years old', 'Primary/elementary school', 'Student, full-time', 'In-person', '12',
+     'Developer, full-stack', '20 to 99 employees', 'United States of America'],
+    ['', '25-34 years old', 'Something else', 'Employed, full-time', 'Remote', '3', 'Developer, mobile', '2 to 9 employees', 'Canada'],
+    [9000, '25-34 years old', 'Something else', 'Employed, full-time', 'Remote', '3', 'Developer, mobile', '2 to 9 employees', 'Canada'],
+    [150000, '45-54 years old', 'Something else', 'Independent contractor, freelancer, or self-employed', 'Fully remote', '40',
+     'DevOps specialist', '1,000 to 4,999 employees', 'Brazil'],
+]
+
+# "NA" answers, multi-select answers and salaries on every bracket and filter bound
+EDGE_ROWS = [
+    [salary, 'NA', 'NA', 'Employed, full-time;Independent contractor, freelancer, or self-employed',
+     'NA', 'NA', 'Developer, front-end;Developer, back-end;Data scientist or machine learning specialist',
+     'NA', 'NA']
+    for salary in [9999, 10000, 49999.5, 50000, 74999, 75000, 99999, 100000, 149999, 150000, 500000, 500001]
+] + [
+    [60000, 'Prefer not to say', 'Something else', 'Student, part-time;Employed, part-time', 'Fully remote',
+     'More than 50 years', 'Senior Executive (C-Suite, VP, etc.);DevOps specialist', 'Just me - I am a freelancer',
+     'United Kingdom of Great Britain and Northern Ireland'],
+    [70000, 'Under 18 years old', 'Something else', 'Retired', 'Hybrid (some remote, some in-person)', '0',
+     'Engineer, site reliability', 'I don\'t know', 'Poland'],
+    [80000, '65 years or older', 'Something else', 'I prefer not to say', 'In-person', '15', 'Developer, mobile',
+     '5,000 to 9,999 employees', 'Netherlands'],
+    ['NA', '25-34 years old', 'Something else', 'Employed, full-time', 'Remote', '16', 'Developer, mobile',
+     '100 to 499 employees', 'France'],
+]
+
+# The original per-row cleaning from preprocess_stackoverflow.py, which
+# the vectorized cleaning in clean_survey must reproduce.
+
+def original_clean_salary_data(df: pd.DataFrame) -> pd.DataFrame:
+    """Clean and categorize salary data"""
+    print("Cleaning salary data...")
+    
+    # Filter for responses with salary data
+    df_salary = df[df['ConvertedCompYearly'].notna()].copy()
+    print(f"Records with salary data: {len(df_salary)}")
+    
+    # Convert to numeric and filter realistic salaries (10k-500k USD)
+    df_salary['ConvertedCompYearly'] = pd.to_numeric(df_salary['ConvertedCompYearly'], errors='coerce')
+    df_salary = df_salary[
+        (df_salary['ConvertedCompYearly'] >= 10000) & 
+        (df_salary['ConvertedCompYearly'] <= 500000)
+    ].copy()
+    print(f"Records with realistic salaries: {len(df_salary)}")
+    
+    # Create salary brackets
+    def categorize_salary(salary):
+        if salary < 50000:
+            return "<50K"
+        elif salary < 75000:
+            return "50K-75K"
+        elif salary < 100000:
+            return "75K-100K"
+        elif salary < 150000:
+            return "100K-150K"
+        else:
+            return "150K+"
+    
+    df_salary['SalaryBracket'] = df_salary['ConvertedCompYearly'].apply(categorize_salary)
+    return df_salary
+
+def original_clean_categorical_features(df: pd.DataFrame) -> pd.DataFrame:
+    """Clean and standardize categorical features"""
+    print("Cleaning categorical features...")
+    
+    # Age mapping
+    age_mapping = {
+        'Under 18 years old': 'Under 18',
+        '18-24 years old': '18-24',
+        '25-34 years old': '25-34', 
+        '35-44 years old': '35-44',
+        '45-54 years old': '45-54',
+        '55-64 years old': '55-64',
+        '65 years or older': '65+',
+        'Prefer not to say': 'Unknown'
+    }
+    df['Age_Clean'] = df['Age'].map(age_mapping).fillna('Unknown')
+    
+    # Education level mapping
+    edu_mapping = {
+        'Primary/elementary school': 'High School or Less',
+        'Secondary school (e.g. American high school, German Realschule or Gymnasium, etc.)': 'High School or Less',
+        'Some college/university study without earning a degree': 'Some College',
+        'Associate degree (A.A., A.S., etc.)': 'Associate',
+        "Bachelor's degree (B.A., B.S., B.Eng., etc.)": 'Bachelor',
+        "Master's degree (M.A., M.S., M.Eng., MBA, etc.)": 'Master',
+        'Professional degree (JD, MD, Ph.D, Ed.D, etc.)': 'Professional/PhD',
+        'Something else': 'Other'
+    }
+    df['Education_Clean'] = df['EdLevel'].map(edu_mapping).fillna('Other')
+    
+    # Employment type
+    def clean_employment(emp_str):
+        if pd.isna(emp_str):
+            return 'Unknown'
+        if 'full-time' in str(emp_str).lower():
+            return 'Full-time'
+        elif 'part-time' in str(emp_str).lower():
+            return 'Part-time'
+        elif 'contractor' in str(emp_str).lower() or 'freelance' in str(emp_str).lower():
+            return 'Contractor/Freelance'
+        elif 'student' in str(emp_str).lower():
+            return 'Student'
+        else:
+            return 'Other'
+    
+    df['Employment_Clean'] = df['Employment'].apply(clean_employment)
+    
+    # Remote work
+    def clean_remote(remote_str):
+        if pd.isna(remote_str):
+            return 'Unknown'
+        remote_lower = str(remote_str).lower()
+        if 'fully remote' in remote_lower:
+            return 'Fully Remote'
+        elif 'hybrid' in remote_lower:
+            return 'Hybrid'
+        else:
+            return 'In-person'
+    
+    df['RemoteWork_Clean'] = df['RemoteWork'].apply(clean_remote)
+    
+    # Years of experience
+    def clean_years_code(years_str):
+        if pd.isna(years_str):
+            return 'Unknown'
+        years_str = str(years_str).lower()
+        if 'less than 1 year' in years_str or years_str == '0':
+            return '<1 year'
+        elif years_str in ['1', '2']:
+            return '1-2 years'
+        elif years_str in ['3', '4', '5']:
+            return '3-5 years'
+        elif years_str in ['6', '7', '8', '9', '10']:
+            return '6-10 years'
+        elif years_str in ['11', '12', '13', '14', '15']:
+            return '11-15 years'
+        else:
+            return '15+ years'
+    
+    df['YearsCode_Clean'] = df['YearsCode'].apply(clean_years_code)
+    
+    # Developer type (simplified)
+    def clean_dev_type(dev_type_str):
+        if pd.isna(dev_type_str):
+            return 'Unknown'
+        
+        dev_type_lower = str(dev_type_str).lower()
+        if 'full-stack' in dev_type_lower:
+            return 'Full-stack'
+        elif 'back-end' in dev_type_lower:
+            return 'Backend'
+        elif 'front-end' in dev_type_lower:
+            return 'Frontend'
+        elif 'mobile' in dev_type_lower:
+            return 'Mobile'
+        elif 'data scientist' in dev_type_lower or 'data' in dev_type_lower:
+            return 'Data Science'
+        elif 'devops' in dev_type_lower or 'sre' in dev_type_lower:
+            return 'DevOps/SRE'
+        else:
+            return 'Other'
+    
+    df['DevType_Clean'] = df['DevType'].apply(clean_dev_type)
+    
+    # Organization size
+    def clean_org_size(org_str):
+        if pd.isna(org_str):
+            return 'Unknown'
+        org_lower = str(org_str).lower()
+        if 'just me' in org_lower or '2 to 9' in org_lower:
+            return 'Small (1-9)'
+        elif '10 to 19' in org_lower:
+            return 'Medium (10-19)'
+        elif '20 to 99' in org_lower:
+            return 'Medium (20-99)'
+        elif '100 to 499' in org_lower:
+            return 'Large (100-499)'
+        elif '500 to 999' in org_lower:
+            return 'Large (500-999)'
+        elif '1,000 to 4,999' in org_lower:
+            return 'Enterprise (1K-5K)'
+        elif '5,000 to 9,999' in org_lower or '10,000 or more' in org_lower:
+            return 'Enterprise (5K+)'
+        else:
+            return 'Unknown'
+    
+    df['OrgSize_Clean'] = df['OrgSize'].apply(clean_org_size)
+    
+    # Country (top countries + others)
+    top_countries = ['United States of America', 'Germany', 'United Kingdom of Great Britain and Northern Ireland', 
+                    'India', 'Canada', 'France', 'Netherlands', 'Australia', 'Brazil', 'Poland']
+    
+    def clean_country(country_str):
+        if pd.isna(country_str):
+            return 'Other'
+        if country_str in top_countries:
+            return country_str.replace('United States of America', 'United States') \
+                             .replace('United Kingdom of Great Britain and Northern Ireland', 'United Kingdom')
+        else:
+            return 'Other'
+    
+    df['Country_Clean'] = df['Country'].apply(clean_country)
+    
+    return df
+
+
+@pytest.fixture
+def survey(tmp_path):
+    path = tmp_path / "survey.csv"
+    frame = pd.DataFrame(ROWS, columns=SURVEY_COLUMNS)
+    frame['Unused'] = 'x'
+    frame.to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.fixture
+def edge_survey(tmp_path):
+    path = tmp_path / "edge_survey.csv"
+    pd.DataFrame(EDGE_ROWS, columns=SURVEY_COLUMNS).to_csv(path, index=False)
+    return str(path)
+
+
+def reference(path):
+    '''
+    Clean the whole file at once with the original per-row functions, read
+    as the original main() read the raw survey.
+    '''
+    frame = pd.read_csv(path)
+    cleaned = original_clean_categorical_features(original_clean_salary_data(frame))
+    return cleaned[FEATURES].reset_index(drop=True)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 100])
+def test_chunks_with_missing_values_match_whole_file(survey, chunk_size, capsys):
+    cleaned = clean_survey([survey], chunk_size=chunk_size)
+    pd.testing.assert_frame_equal(cleaned.astype(object), reference(survey).astype(object))
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 100])
+def test_edge_cases_match_original(edge_survey, chunk_size, capsys):
+    cleaned = clean_survey([edge_survey], chunk_size=chunk_size)
+    expected = reference(edge_survey)
+    assert len(expected) == 13
+    pd.testing.assert_frame_equal(cleaned.astype(object), expected.astype(object))
+
+
+def test_missing_values_get_fill_labels(survey, capsys):
+    cleaned = clean_survey([survey], chunk_size=2)
+    assert cleaned['Age_Clean'][0] == 'Unknown'
+    assert cleaned['Education_Clean'][1] == 'Other'
+    assert cleaned['Country_Clean'][1] == 'Other'
+    assert list(cleaned.iloc[2][['Employment_Clean', 'RemoteWork_Clean', 'YearsCode_Clean', 'DevType_Clean', 'OrgSize_Clean']]) == ['Unknown'] * 5
+
+
+def test_salary_brackets_and_filter(survey, capsys):
+    cleaned = clean_survey([survey], chunk_size=2)
+    # The row without a salary and the one below 10K are dropped
+    assert list(cleaned['SalaryBracket']) == ['50K-75K', '75K-100K', '<50K', '100K-150K', '150K+']
+    assert "Total survey responses: 7" in capsys.readouterr().out
+
+
+def test_several_files_are_concatenated(survey, capsys):
+    cleaned = clean_survey([survey, survey], chunk_size=3)
+    assert len(cleaned) == 10
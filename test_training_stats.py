@@ -0,0 +1,76 @@
+import random
+
+import pandas as pd
+import pytest
+
+import data_store
+from training_stats import TrainingStatistics
+
+TRAINING_DATA = 'data/stackoverflow-train.csv'
+
+
+@pytest.fixture(scope="module")
+def frame():
+    # Categoricals only speed up the comparisons of the filtering below
+    return pd.read_csv(TRAINING_DATA, dtype='category', keep_default_na=False)
+
+
+@pytest.fixture(params=["csv", "parquet"])
+def stats(request, monkeypatch):
+    if request.param == "csv":
+        monkeypatch.setattr(data_store, 'pq', None)
+    elif data_store.columnar_path(TRAINING_DATA, as_text=True) is None:
+        pytest.skip("no Parquet twin of {} (python data_store.py)".format(TRAINING_DATA))
+    return TrainingStatistics.from_csv(TRAINING_DATA)
+
+
+def sample_profiles(frame, count=80, seed=0):
+    '''
+    Return profiles of training rows, random combinations of values and
+    partial profiles, without the Salary column.
+    '''
+    rng = random.Random(seed)
+    features = list(frame.columns[:-1])
+    rows = frame[features].astype(object).to_dict('records')
+    values = {field: frame[field].cat.categories.tolist() for field in features}
+    profiles = rng.sample(rows, count // 2)
+    profiles += [{field: rng.choice(values[field]) for field in features} for _ in range(count // 4)]
+    profiles += [{field: row[field] for field in rng.sample(features, 3)} for row in rng.sample(rows, count // 4)]
+    return profiles
+
+
+@pytest.fixture(scope="module")
+def expected(frame):
+    '''
+    Return (profile, match counts, exact match count) triples computed
+    with the filtering the apps did on every request before.
+    '''
+    triples = []
+    for profile in sample_profiles(frame):
+        match_counts = {field: len(frame[frame[field] == value]) for field, value in profile.items()}
+        exact_matches = frame
+        for field, value in profile.items():
+            exact_matches = exact_matches[exact_matches[field] == value]
+        triples.append((profile, match_counts, len(exact_matches)))
+    return triples
+
+
+def test_counts_match_pandas_filtering(frame, stats, expected):
+    assert stats.total == len(frame)
+    assert stats.distribution('Salary') == frame['Salary'].value_counts().to_dict()
+    for profile, match_counts, exact_match_count in expected:
+        assert stats.feature_matches(profile) == match_counts
+        assert stats.exact_matches(profile) == exact_match_count
+
+
+def test_full_profile_table_is_built_up_front(frame, stats):
+    built = dict(stats._subset_counts)
+    assert list(built) == [tuple(range(len(frame.columns) - 1))]
+    stats.exact_matches(frame.iloc[0, :-1].to_dict())
+    assert stats._subset_counts == built
+
+
+def test_unknown_values_match_nothing(frame, stats):
+    profile = dict(frame.iloc[0, :-1].to_dict(), Country='Atlantis')
+    assert stats.exact_matches(profile) == 0
+    assert stats.feature_matches(profile)['Country'] == 0
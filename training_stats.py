@@ -0,0 +1,186 @@
+'''
+Precomputed statistics over a training CSV.
+
+The Flask apps report how many training rows share each of a profile's
+values, how many share the whole profile and how the salary classes are
+distributed. TrainingStatistics builds these counts once, when the model
+is loaded, so answering them does not touch the CSV again.
+
+The training data is kept as its distinct rows, encoded column by column
+as integer codes, together with how often each row occurs:
+
+    value_counts  -- per column, a Counter of its values
+    exact matches -- a hash table from the mixed-radix code of a row
+                     (restricted to the requested columns) to its count
+
+The hash table for profiles over every column but the last (the class),
+which is what the apps ask about, is built with the statistics. Tables
+for other sets of columns are built the first time that set is asked for,
+and are a plain dict lookup afterwards.
+'''
+
+from collections import Counter
+
+import numpy as np
+
+from data_store import columnar_path, iter_dictionary_batches, read_headers, read_rows
+
+# Rows per batch when reading a Parquet twin
+BATCH_SIZE = 65536
+
+
+class TrainingStatistics:
+    '''
+    Value and profile counts for a table of categorical training data.
+    '''
+
+    def __init__(self, columns, values, codes, counts):
+        '''
+        Create the statistics from encoded distinct rows.
+
+        :param columns: the column names, in row order.
+        :param values: for each column, the list of its distinct values.
+        :param codes: a P x len(columns) integer array; row i is the i-th
+                      distinct row, as indexes into values.
+        :param counts: a length-P integer array; how often each row occurs.
+
+        The exact-match table for profiles over every column but the last
+        is built here, so exact_matches for such a profile is a lookup.
+        '''
+        self.columns = list(columns)
+        self.values = [list(column_values) for column_values in values]
+        self.codes = np.asarray(codes, dtype=np.int64).reshape(-1, len(self.columns))
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.total = int(self.counts.sum())
+
+        self._lookups = [{value: code for code, value in enumerate(column_values)} for column_values in self.values]
+        self.value_counts = {}
+        for j, column in enumerate(self.columns):
+            column_counts = np.bincount(self.codes[:, j], weights=self.counts, minlength=len(self.values[j]))
+            self.value_counts[column] = Counter({value: count for value, count in zip(self.values[j], column_counts.astype(np.int64).tolist()) if count})
+
+        # Exact-match hash tables for sets of columns: the one for every
+        # column but the class now, others on demand
+        self._subset_counts = {}
+        self._counts_for(tuple(range(len(self.columns) - 1)))
+
+    @classmethod
+    def from_csv(cls, data_file):
+        '''
+        Build the statistics for a CSV file with a header row.
+
+        When the file has a Parquet twin (see data_store), its columns are
+        read as dictionary codes and the distinct rows are found with
+        np.unique, without building a tuple per row.
+
+        :param data_file: path to the CSV file.
+        '''
+        path = columnar_path(data_file, as_text=True)
+        if path is not None:
+            return cls._from_parquet(read_headers(data_file), path)
+
+        headers, rows = read_rows(data_file)
+        rows = Counter(tuple(row) for row in rows)
+        lookups = [{} for _ in headers]
+        codes = [[lookup.setdefault(value, len(lookup)) for lookup, value in zip(lookups, row)] for row in rows]
+        return cls(headers, [list(lookup) for lookup in lookups], codes, list(rows.values()))
+
+    @classmethod
+    def _from_parquet(cls, headers, path):
+        lookups = [{} for _ in headers]
+        batches = []
+        for batch in iter_dictionary_batches(path, headers, BATCH_SIZE):
+            # Batches may have different dictionaries; recode into one per column
+            batches.append(np.column_stack([
+                np.array([lookup.setdefault(value, len(lookup)) for value in values], dtype=np.int64)[codes]
+                for lookup, (values, codes) in zip(lookups, batch)]))
+        codes = np.vstack(batches) if batches else np.empty((0, len(headers)), dtype=np.int64)
+        sizes = [max(len(lookup), 1) for lookup in lookups]
+        if np.prod(sizes, dtype=float) < 2 ** 62:
+            # One mixed-radix key per row is much faster to unique than rows
+            keys, counts = np.unique(np.ravel_multi_index(codes.T, sizes), return_counts=True)
+            distinct = np.column_stack(np.unravel_index(keys, sizes)) if len(keys) else codes[:0]
+        else:
+            distinct, counts = np.unique(codes, axis=0, return_counts=True)
+        return cls(headers, [list(lookup) for lookup in lookups], distinct, counts)
+
+    def updated(self, rows, sign=1):
+        '''
+        Return new statistics with rows added (sign=1) or removed (sign=-1).
+        This object is left unchanged. Raises ValueError if a row would be
+        removed more often than it occurs.
+
+        :param rows: a list of rows, each a sequence of values in column order.
+        :param sign: 1 to add the rows, -1 to remove them.
+        '''
+        values = [list(column_values) for column_values in self.values]
+        lookups = [dict(lookup) for lookup in self._lookups]
+        new_codes = []
+        for row in rows:
+            encoded = []
+            for column_values, lookup, value in zip(values, lookups, row):
+                if value not in lookup:
+                    lookup[value] = len(column_values)
+                    column_values.append(value)
+                encoded.append(lookup[value])
+            new_codes.append(encoded)
+
+        codes = np.vstack([self.codes, np.array(new_codes, dtype=np.int64).reshape(-1, len(self.columns))])
+        counts = np.concatenate([self.counts, np.full(len(new_codes), sign, dtype=np.int64)])
+        distinct, inverse = np.unique(codes, axis=0, return_inverse=True)
+        summed = np.bincount(inverse.ravel(), weights=counts, minlength=len(distinct)).astype(np.int64)
+        if (summed < 0).any():
+            raise ValueError("Cannot remove rows that are not part of the training data")
+        keep = summed > 0
+        return TrainingStatistics(self.columns, values, distinct[keep], summed[keep])
+
+    def feature_matches(self, profile):
+        '''
+        Return, for each field of profile that is a column, the number of
+        rows with the same value for that field.
+
+        :param profile: a dict mapping column names to values.
+        :return: a dict mapping field names to counts, in profile order.
+        '''
+        return {field: self.value_counts[field][value]
+                for field, value in profile.items() if field in self.value_counts}
+
+    def exact_matches(self, profile):
+        '''
+        Return the number of rows that agree with profile on every field
+        of profile that is a column.
+
+        :param profile: a dict mapping column names to values.
+        '''
+        positions = tuple(j for j, column in enumerate(self.columns) if column in profile)
+        key = 0
+        for j in positions:
+            code = self._lookups[j].get(profile[self.columns[j]])
+            if code is None:
+                return 0
+            key = key * len(self.values[j]) + code
+        return self._counts_for(positions).get(key, 0)
+
+    def _counts_for(self, positions):
+        '''
+        Return the hash table from mixed-radix row codes over the columns
+        at positions to the number of rows with that code.
+        '''
+        counts = self._subset_counts.get(positions)
+        if counts is None:
+            keys = np.zeros(len(self.counts), dtype=np.int64)
+            for j in positions:
+                keys = keys * len(self.values[j]) + self.codes[:, j]
+            unique_keys, inverse = np.unique(keys, return_inverse=True)
+            summed = np.bincount(inverse, weights=self.counts, minlength=len(unique_keys))
+            counts = dict(zip(unique_keys.tolist(), summed.astype(np.int64).tolist()))
+            self._subset_counts[positions] = counts
+        return counts
+
+    def distribution(self, column):
+        '''
+        Return the value counts of column, most common first.
+
+        :param column: a column name.
+        '''
+        return dict(self.value_counts[column].most_common())